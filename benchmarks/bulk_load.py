@@ -0,0 +1,101 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares loading rows with execute_concurrent_with_args and with
+bulk_load, unbatched and with replica-grouped batches of several sizes.
+"""
+
+import logging
+from optparse import OptionParser
+import os.path
+import sys
+import time
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(dirname, '..'))
+
+from cassandra.cluster import Cluster
+from cassandra.concurrent import bulk_load, execute_concurrent_with_args
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+
+log = logging.getLogger()
+log.addHandler(logging.StreamHandler())
+log.setLevel(logging.INFO)
+
+KEYSPACE = "testkeyspace" + str(int(time.time()))
+TABLE = "load"
+
+
+def setup(session):
+    session.execute("""
+        CREATE KEYSPACE %s
+        WITH replication = { 'class': 'SimpleStrategy', 'replication_factor': '1' }
+        """ % KEYSPACE)
+    session.set_keyspace(KEYSPACE)
+    session.execute("""
+        CREATE TABLE %s (
+            k int PRIMARY KEY,
+            i bigint,
+            d double,
+            name text
+        )""" % TABLE)
+    return session.prepare("INSERT INTO %s (k, i, d, name) VALUES (?, ?, ?, ?)" % TABLE)
+
+
+def make_rows(num_rows):
+    return ((k, k * 7, k / 3.0, 'name-%d' % k) for k in range(num_rows))
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-H', '--hosts', default='127.0.0.1',
+                      help='cassandra hosts to connect to (comma-separated list) [default: %default]')
+    parser.add_option('-n', '--num-rows', type='int', default=100000,
+                      help='number of rows to load per run [default: %default]')
+    parser.add_option('-c', '--concurrency', type='int', default=100,
+                      help='number of requests in flight [default: %default]')
+    parser.add_option('-b', '--batch-sizes', default='1,10,50',
+                      help='comma separated list of bulk_load batch sizes [default: %default]')
+    parser.add_option('-r', '--max-rate', type='float', default=None,
+                      help='rows per second limit for bulk_load [default: none]')
+    options, args = parser.parse_args()
+
+    cluster = Cluster(options.hosts.split(','),
+                      load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()))
+    session = cluster.connect()
+    try:
+        insert = setup(session)
+
+        start = time.time()
+        execute_concurrent_with_args(session, insert, make_rows(options.num_rows),
+                                     concurrency=options.concurrency)
+        elapsed = time.time() - start
+        log.info("%-28s %8.2fs %10.0f rows/s", "execute_concurrent_with_args", elapsed,
+                 options.num_rows / elapsed)
+
+        for batch_size in [int(b) for b in options.batch_sizes.split(',')]:
+            max_rate = options.max_rate / batch_size if options.max_rate else None
+            stats = bulk_load(session, insert, make_rows(options.num_rows), batch_size=batch_size,
+                              concurrency=options.concurrency, max_rate=max_rate)
+            log.info("%-28s %8.2fs %10.0f rows/s", "bulk_load, batches of %d" % batch_size,
+                     stats.elapsed, stats.rows_per_second)
+            log.info("  %s", stats)
+    finally:
+        session.execute("DROP KEYSPACE " + KEYSPACE)
+        cluster.shutdown()
+
+
+if __name__ == "__main__":
+    main()
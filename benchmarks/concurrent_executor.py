@@ -0,0 +1,103 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the overhead of execute_concurrent itself, without a cluster.
+
+Requests are completed by a separate thread standing in for the event
+loop, so that completions race with the thread consuming results, as they
+do against a real cluster.  Compares the list, generator and unordered
+generator result modes at several levels of concurrency.
+"""
+
+from optparse import OptionParser
+import os.path
+import sys
+from threading import Thread
+import time
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(dirname, '..'))
+
+from cassandra.concurrent import execute_concurrent
+from six.moves import range
+from six.moves.queue import Queue
+
+
+class FakeResponseFuture(object):
+
+    has_more_pages = False
+
+    def __init__(self, loop, result):
+        self._loop = loop
+        self._result = result
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        self._loop.put((callback, self._result, callback_args))
+
+
+class FakeSession(object):
+    """
+    Completes every request on a single "event loop" thread, in the order
+    they were sent.
+    """
+
+    def __init__(self):
+        self._loop = Queue()
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def execute_async(self, statement, params, timeout=None):
+        return FakeResponseFuture(self._loop, params)
+
+    def _run(self):
+        while True:
+            callback, result, args = self._loop.get()
+            callback(result, *args)
+
+
+def run(session, num_statements, concurrency, results_generator, ordered):
+    statements = (("INSERT", (i,)) for i in range(num_statements))
+    start = time.time()
+    results = execute_concurrent(session, statements, concurrency=concurrency,
+                                 results_generator=results_generator, ordered=ordered)
+    count = sum(1 for _ in results)
+    assert count == num_statements
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--num-statements', type='int', default=100000,
+                      help='number of statements per run [default: %default]')
+    parser.add_option('-c', '--concurrency', default='10,100,1000',
+                      help='comma separated list of concurrency levels [default: %default]')
+    parser.add_option('-r', '--repeat', type='int', default=3,
+                      help='number of runs per mode [default: %default]')
+    options, args = parser.parse_args()
+
+    session = FakeSession()
+    for concurrency in [int(c) for c in options.concurrency.split(',')]:
+        print("concurrency %d, %d statements:" % (concurrency, options.num_statements))
+        for name, results_generator, ordered in (('list', False, True), ('generator', True, True),
+                                                 ('unordered', True, False)):
+            elapsed = min(run(session, options.num_statements, concurrency, results_generator, ordered)
+                          for _ in range(options.repeat))
+            print("  %-10s %8.2fs %10.0f statements/s" % (name, elapsed, options.num_statements / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares loading a full table scan into a pandas DataFrame through named
+tuples with the columnar path (ColumnarProtocolHandler and
+dataframe_factory).
+
+Requires a Cython build of the driver, NumPy and pandas.
+"""
+
+import logging
+from optparse import OptionParser
+import os.path
+import sys
+import time
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(dirname, '..'))
+
+import pandas as pd
+
+from cassandra.cluster import Cluster
+from cassandra.columnar import dataframe_factory, fetch_dataframe
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.protocol import ColumnarProtocolHandler, ProtocolHandler
+from cassandra.query import named_tuple_factory
+
+log = logging.getLogger()
+log.addHandler(logging.StreamHandler())
+log.setLevel(logging.INFO)
+
+KEYSPACE = "testkeyspace" + str(int(time.time()))
+TABLE = "scan"
+
+
+def setup(session, num_rows):
+    session.execute("""
+        CREATE KEYSPACE %s
+        WITH replication = { 'class': 'SimpleStrategy', 'replication_factor': '1' }
+        """ % KEYSPACE)
+    session.set_keyspace(KEYSPACE)
+    session.execute("""
+        CREATE TABLE %s (
+            k int PRIMARY KEY,
+            i bigint,
+            d double,
+            flag boolean,
+            ts timestamp,
+            name text
+        )""" % TABLE)
+
+    log.info("Inserting %d rows...", num_rows)
+    insert = session.prepare(
+        "INSERT INTO %s (k, i, d, flag, ts, name) VALUES (?, ?, ?, ?, ?, ?)" % TABLE)
+    now = int(time.time() * 1000)
+    execute_concurrent_with_args(
+        session, insert,
+        ((k, k * 7, k / 3.0, k % 2 == 0, now + k, 'name-%d' % k) for k in range(num_rows)),
+        concurrency=100)
+
+
+def tuple_scan(session, fetch_size):
+    session.client_protocol_handler = ProtocolHandler
+    session.row_factory = named_tuple_factory
+    session.default_fetch_size = fetch_size
+    return pd.DataFrame(list(session.execute("SELECT * FROM %s" % TABLE)))
+
+
+def columnar_scan(session, fetch_size):
+    session.client_protocol_handler = ColumnarProtocolHandler
+    session.row_factory = dataframe_factory
+    session.default_fetch_size = fetch_size
+    return fetch_dataframe(session.execute_async("SELECT * FROM %s" % TABLE))
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-H', '--hosts', default='127.0.0.1',
+                      help='cassandra hosts to connect to (comma-separated list) [default: %default]')
+    parser.add_option('-n', '--num-rows', type='int', default=1000000,
+                      help='number of rows to scan [default: %default]')
+    parser.add_option('-f', '--fetch-size', type='int', default=5000,
+                      help='rows per page [default: %default]')
+    parser.add_option('-r', '--repeat', type='int', default=3,
+                      help='number of scans per path [default: %default]')
+    options, args = parser.parse_args()
+
+    cluster = Cluster(options.hosts.split(','))
+    session = cluster.connect()
+    try:
+        setup(session, options.num_rows)
+        for name, scan in (('named tuples', tuple_scan), ('columnar', columnar_scan)):
+            timings = []
+            for _ in range(options.repeat):
+                start = time.time()
+                df = scan(session, options.fetch_size)
+                timings.append(time.time() - start)
+            log.info("%-12s %d rows: best %.2fs, %.0f rows/s", name, len(df),
+                     min(timings), len(df) / min(timings))
+    finally:
+        session.execute("DROP KEYSPACE " + KEYSPACE)
+        cluster.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the per-page cost of the row factories, without a cluster.
+
+Compares building a new namedtuple class for every page (the behavior
+before Row classes were cached) with the cached named_tuple_factory, for
+small point reads and large pages.
+"""
+
+from collections import namedtuple
+from optparse import OptionParser
+import os.path
+import sys
+import timeit
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(dirname, '..'))
+
+from cassandra.query import (named_tuple_factory, dict_factory, tuple_factory,
+                             _clean_column_name)
+from six.moves import range
+
+
+def uncached_named_tuple_factory(colnames, rows):
+    Row = namedtuple('Row', [_clean_column_name(name) for name in colnames])
+    return [Row(*row) for row in rows]
+
+
+FACTORIES = (
+    ('tuple_factory', tuple_factory),
+    ('uncached namedtuple', uncached_named_tuple_factory),
+    ('named_tuple_factory', named_tuple_factory),
+    ('dict_factory', dict_factory),
+)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-c', '--columns', type='int', default=10,
+                      help='number of columns per row [default: %default]')
+    parser.add_option('-n', '--num-pages', type='int', default=2000,
+                      help='number of pages to build per run [default: %default]')
+    parser.add_option('-s', '--page-sizes', default='1,10,100,5000',
+                      help='comma separated list of rows per page [default: %default]')
+    options, args = parser.parse_args()
+
+    colnames = ['column_%d' % i for i in range(options.columns)]
+    row = tuple(range(options.columns))
+
+    for page_size in [int(s) for s in options.page_sizes.split(',')]:
+        rows = [row] * page_size
+        num_pages = max(1, options.num_pages * 10 // (page_size + 9))
+        print("%d rows per page, %d pages:" % (page_size, num_pages))
+        for name, factory in FACTORIES:
+            elapsed = min(timeit.repeat(lambda: factory(colnames, rows), repeat=3, number=num_pages))
+            print("  %-22s %10.2f us/page" % (name, elapsed / num_pages * 1e6))
+
+
+if __name__ == "__main__":
+    main()
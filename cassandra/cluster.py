@@ -19,14 +19,14 @@ This module houses the main classes you will interact with,
 from __future__ import absolute_import
 
 import atexit
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, as_completed
 import logging
 from random import random
 import socket
 import sys
 import time
-from threading import Lock, RLock, Thread, Event
+from threading import Lock, RLock, Thread, Event, Condition
 import warnings
 
 import six
@@ -70,8 +70,9 @@ from cassandra.pool import (Host, _ReconnectionHandler, _HostReconnectionHandler
                             HostConnectionPool, HostConnection,
                             NoConnectionsAvailable)
 from cassandra.query import (SimpleStatement, PreparedStatement, BoundStatement,
-                             BatchStatement, bind_params, QueryTrace, Statement,
-                             named_tuple_factory, dict_factory, FETCH_SIZE_UNSET)
+                             BatchStatement, BatchType, bind_params, QueryTrace, Statement,
+                             named_tuple_factory, dict_factory, tuple_factory, FETCH_SIZE_UNSET)
+from cassandra.util import OrderedDict
 
 
 def _is_eventlet_monkey_patched():
@@ -117,6 +118,9 @@ DEFAULT_MAX_CONNECTIONS_PER_LOCAL_HOST = 8
 DEFAULT_MIN_CONNECTIONS_PER_REMOTE_HOST = 1
 DEFAULT_MAX_CONNECTIONS_PER_REMOTE_HOST = 2
 
+DEFAULT_CONNECTIONS_PER_LOCAL_HOST_V3 = 1
+DEFAULT_CONNECTIONS_PER_REMOTE_HOST_V3 = 1
+
 
 _NOT_SET = object()
 
@@ -346,6 +350,16 @@ class Cluster(object):
     :class:`.policies.SimpleConvictionPolicy`.
     """
 
+    concurrency_limiter_factory = None
+    """
+    A factory function which creates instances of
+    :class:`.policies.ConcurrencyLimiter`, one per host for each
+    :class:`.Session`.  For example, ``concurrency_limiter_factory=AIMDConcurrencyLimiter``
+    adapts the number of requests in flight to each host to its observed
+    overload and latency.  Defaults to :const:`None`, in which case requests
+    are only bounded by connection capacity.
+    """
+
     connect_to_remote_hosts = True
     """
     If left as :const:`True`, hosts that are considered :attr:`~.HostDistance.REMOTE`
@@ -477,6 +491,21 @@ class Cluster(object):
     establishment, options passing, and authentication.
     """
 
+    pool_init_concurrency = 16
+    """
+    The maximum number of hosts a new :class:`.Session` opens connection pools
+    to at the same time while connecting.
+
+    Pools are opened on a dedicated set of threads, independent of
+    ``executor_threads``, so connecting to clusters with many nodes does
+    not take one connection timeout per node in the worst case.
+    :meth:`.Cluster.connect()` returns as soon as the pools for all
+    :attr:`~.HostDistance.LOCAL` hosts are ready; pools for
+    :attr:`~.HostDistance.REMOTE` hosts continue to be opened in the
+    background.  If no host is local, it returns once the first remote
+    pool is ready, or all of them failed.
+    """
+
     sessions = None
     control_connection = None
     scheduler = None
@@ -516,7 +545,9 @@ class Cluster(object):
                  idle_heartbeat_interval=30,
                  schema_event_refresh_window=2,
                  topology_event_refresh_window=10,
-                 connect_timeout=5):
+                 connect_timeout=5,
+                 pool_init_concurrency=16,
+                 concurrency_limiter_factory=None):
         """
         Any of the mutable Cluster attributes may be set as keyword arguments
         to the constructor.
@@ -557,6 +588,11 @@ class Cluster(object):
                 raise ValueError("conviction_policy_factory must be callable")
             self.conviction_policy_factory = conviction_policy_factory
 
+        if concurrency_limiter_factory is not None:
+            if not callable(concurrency_limiter_factory):
+                raise ValueError("concurrency_limiter_factory must be callable")
+            self.concurrency_limiter_factory = concurrency_limiter_factory
+
         if connection_class is not None:
             self.connection_class = connection_class
 
@@ -570,6 +606,7 @@ class Cluster(object):
         self.schema_event_refresh_window = schema_event_refresh_window
         self.topology_event_refresh_window = topology_event_refresh_window
         self.connect_timeout = connect_timeout
+        self.pool_init_concurrency = pool_init_concurrency
 
         self._listeners = set()
         self._listener_lock = Lock()
@@ -604,6 +641,11 @@ class Cluster(object):
             HostDistance.REMOTE: DEFAULT_MAX_CONNECTIONS_PER_REMOTE_HOST
         }
 
+        self._connections_per_host = {
+            HostDistance.LOCAL: DEFAULT_CONNECTIONS_PER_LOCAL_HOST_V3,
+            HostDistance.REMOTE: DEFAULT_CONNECTIONS_PER_REMOTE_HOST_V3
+        }
+
         self.executor = ThreadPoolExecutor(max_workers=executor_threads)
         self.scheduler = _Scheduler(self.executor)
 
@@ -733,9 +775,9 @@ class Cluster(object):
         pooling to support higher levels of concurrency.
 
         If :attr:`~.Cluster.protocol_version` is set to 3 or higher, this
-        is not supported (there is always one connection per host, unless
-        the host is remote and :attr:`connect_to_remote_hosts` is :const:`False`)
-        and using this will result in an :exc:`~.UnsupporteOperation`.
+        is not supported (a fixed number of connections is opened per host, see
+        :meth:`~.Cluster.set_connections_per_host`) and using this will result
+        in an :exc:`~.UnsupporteOperation`.
         """
         if self.protocol_version >= 3:
             raise UnsupportedOperation(
@@ -766,9 +808,9 @@ class Cluster(object):
         :attr:`~HostDistance.REMOTE`.
 
         If :attr:`~.Cluster.protocol_version` is set to 3 or higher, this
-        is not supported (there is always one connection per host, unless
-        the host is remote and :attr:`connect_to_remote_hosts` is :const:`False`)
-        and using this will result in an :exc:`~.UnsupporteOperation`.
+        is not supported (a fixed number of connections is opened per host, see
+        :meth:`~.Cluster.set_connections_per_host`) and using this will result
+        in an :exc:`~.UnsupporteOperation`.
         """
         if self.protocol_version >= 3:
             raise UnsupportedOperation(
@@ -776,6 +818,46 @@ class Cluster(object):
                 "when using protocol_version 1 or 2.")
         self._max_connections_per_host[host_distance] = max_connections
 
+    def get_connections_per_host(self, host_distance):
+        """
+        Gets the number of connections per Session that will be opened
+        for each host with :class:`~.HostDistance` equal to `host_distance`
+        when using protocol version 3 or higher. The default is 1 for
+        both :attr:`~HostDistance.LOCAL` and :attr:`~HostDistance.REMOTE`.
+
+        This property is ignored if :attr:`~.Cluster.protocol_version` is
+        1 or 2.
+        """
+        return self._connections_per_host[host_distance]
+
+    def set_connections_per_host(self, host_distance, connections):
+        """
+        Sets the number of connections per Session that will be opened
+        for each host with :class:`~.HostDistance` equal to `host_distance`
+        when using protocol version 3 or higher.
+
+        A single connection can carry many concurrent requests with protocol
+        v3+, but opening more than one spreads the serialization and socket
+        work for busy hosts, and keeps one slow, large response from delaying
+        every other request to that host. Requests are sent over the
+        connection with the fewest requests in flight.  When the number is
+        lowered, extra connections are closed once their requests complete.
+
+        If :attr:`~.Cluster.protocol_version` is set to 1 or 2, this is not
+        supported (see :meth:`~.Cluster.set_core_connections_per_host`) and
+        using this will result in an :exc:`~.UnsupporteOperation`.
+        """
+        if self.protocol_version < 3:
+            raise UnsupportedOperation(
+                "Cluster.set_connections_per_host() only has an effect "
+                "when using protocol_version 3 or higher.")
+        if connections < 1:
+            raise ValueError("connections must be at least 1")
+        old = self._connections_per_host[host_distance]
+        self._connections_per_host[host_distance] = connections
+        if old != connections:
+            self._ensure_core_connections()
+
     def connection_factory(self, address, *args, **kwargs):
         """
         Called to create a new connection with proper configuration.
@@ -1485,6 +1567,31 @@ class Session(object):
     .. versionadded:: 2.0.0
     """
 
+    page_byte_budget = None
+    """
+    When set to a number of bytes, the fetch size of paged queries adapts
+    to the width of their rows: after each page, the fetch size for the
+    next page of the same query is set so that it holds about this many
+    bytes, based on the average row size of the page just received.  The
+    first page is fetched with :attr:`.default_fetch_size`.
+
+    This only applies to queries using :attr:`.default_fetch_size`, not
+    to those setting their own :attr:`.Statement.fetch_size`.  The adapted
+    fetch size is kept within :attr:`.min_adaptive_fetch_size` and
+    :attr:`.max_adaptive_fetch_size`.  Defaults to :const:`None`, which
+    keeps a fixed fetch size.
+    """
+
+    min_adaptive_fetch_size = 10
+    """
+    The lower bound on fetch sizes chosen for :attr:`.page_byte_budget`.
+    """
+
+    max_adaptive_fetch_size = 100000
+    """
+    The upper bound on fetch sizes chosen for :attr:`.page_byte_budget`.
+    """
+
     use_client_timestamp = True
     """
     When using protocol version 3 or higher, write timestamps may be supplied
@@ -1529,13 +1636,69 @@ class Session(object):
 
     The default pure python implementation is :class:`cassandra.protocol.ProtocolHandler`.
 
-    When compiled with Cython, there are also built-in faster alternatives. See :ref:`faster_deser`
+    When compiled with Cython, there are also built-in faster alternatives. See :ref:`faster_deser`.
+    The Cython handlers build the rows of the built-in row factories (and of
+    :func:`~.query.class_factory`) directly while parsing.
+    """
+
+    max_request_queue_size = 0
+    """
+    The maximum number of requests that may wait in this session for a
+    free request slot when every host in a request's query plan is at its
+    in-flight capacity. Queued requests are re-sent, with a fresh query plan,
+    as soon as any connection of this session completes a request.
+
+    This smooths bursts of :meth:`.execute_async()` calls instead of failing
+    them with :exc:`.NoHostAvailable`. When the queue is full, new requests
+    fail as before. The default of ``0`` disables queueing.
+    """
+
+    request_queue_timeout = 2.0
+    """
+    The maximum time, in seconds, a request may wait in the request queue
+    (see :attr:`.max_request_queue_size`) before failing with
+    :exc:`.OperationTimedOut`. The request timeout only starts once the
+    request has been sent.
+    """
+
+    paging_prefetch_pages = 0
+    """
+    The maximum number of result pages a :class:`.PagedResult` fetches ahead
+    of the page being iterated.  When enabled, the next page is requested
+    in the background once :attr:`.paging_prefetch_threshold` of the current
+    page has been consumed, overlapping network latency with row processing
+    for large scans.  Prefetched pages are held in memory until they are
+    consumed.
+
+    The default of ``0`` only fetches the next page when the current page
+    is exhausted.
+    """
+
+    paging_prefetch_threshold = 0.5
+    """
+    The fraction of a page, between 0 and 1, that must be consumed before
+    the next page is prefetched (see :attr:`.paging_prefetch_pages`).
+    """
+
+    idempotent_timeout_retries = 0
+    """
+    The maximum number of times a request for an idempotent statement
+    (see :attr:`.Statement.is_idempotent`) is sent to the next host of its
+    query plan when it times out on the client side, instead of failing
+    with :exc:`.OperationTimedOut`.  Each attempt gets the full request
+    timeout, and a late response to an abandoned attempt is ignored.
+
+    Requests for statements that are not idempotent are never retried after
+    a timeout, as they may have been applied.  The default of ``0`` disables
+    these retries.
     """
 
     _lock = None
     _pools = None
     _load_balancer = None
     _metrics = None
+    _request_queue = None
+    _request_queue_lock = None
 
     def __init__(self, cluster, hosts):
         self.cluster = cluster
@@ -1543,23 +1706,43 @@ class Session(object):
 
         self._lock = RLock()
         self._pools = {}
+        self._request_queue = deque()
+        self._request_queue_lock = Lock()
         self._load_balancer = cluster.load_balancing_policy
         self._metrics = cluster.metrics
         self._protocol_version = self.cluster.protocol_version
 
         self.encoder = Encoder()
 
-        # create connection pools in parallel
-        futures = []
-        for host in hosts:
-            future = self.add_or_renew_pool(host, is_host_addition=False)
-            if future is not None:
-                futures.append(future)
+        # create connection pools in parallel, waiting only for local hosts;
+        # remote pools keep opening in the background
+        hosts = list(hosts)
+        max_workers = max(1, min(len(hosts), cluster.pool_init_concurrency))
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            local_futures = []
+            remote_futures = []
+            for host in hosts:
+                future = self.add_or_renew_pool(host, is_host_addition=False, executor=executor)
+                if future is None:
+                    continue
+                if self._load_balancer.distance(host) == HostDistance.LOCAL:
+                    local_futures.append(future)
+                else:
+                    remote_futures.append(future)
 
-        for future in futures:
-            future.result()
+            for future in local_futures:
+                future.result()
+            if not local_futures:
+                # no local hosts; wait until a remote pool can serve requests
+                for future in as_completed(remote_futures):
+                    if future.result():
+                        break
+        finally:
+            executor.shutdown(wait=False)
 
-    def execute(self, query, parameters=None, timeout=_NOT_SET, trace=False, custom_payload=None):
+    def execute(self, query, parameters=None, timeout=_NOT_SET, trace=False, custom_payload=None,
+                paging_state=None):
         """
         Execute the given query and synchronously wait for the response.
 
@@ -1591,13 +1774,18 @@ class Session(object):
         `custom_payload` is a :ref:`custom_payload` dict to be passed to the server.
         If `query` is a Statement with its own custom_payload. The message payload
         will be a union of the two, with the values specified here taking precedence.
+
+        `paging_state` resumes a paged query from the
+        :attr:`~.ResponseFuture.paging_state` of an earlier execution of the
+        same query, instead of starting from the first page.  It overrides
+        :attr:`.Statement.paging_state`.
         """
         if trace and not isinstance(query, Statement):
             raise TypeError(
                 "The query argument must be an instance of a subclass of "
                 "cassandra.query.Statement when trace=True")
 
-        future = self.execute_async(query, parameters, trace, custom_payload, timeout)
+        future = self.execute_async(query, parameters, trace, custom_payload, timeout, paging_state)
         try:
             result = future.result()
         finally:
@@ -1609,7 +1797,8 @@ class Session(object):
 
         return result
 
-    def execute_async(self, query, parameters=None, trace=False, custom_payload=None, timeout=_NOT_SET):
+    def execute_async(self, query, parameters=None, trace=False, custom_payload=None, timeout=_NOT_SET,
+                      paging_state=None):
         """
         Execute the given query and return a :class:`~.ResponseFuture` object
         which callbacks may be attached to for asynchronous response
@@ -1629,6 +1818,8 @@ class Session(object):
         the dict can be obtained following :meth:`.ResponseFuture.result` via
         :attr:`.ResponseFuture.custom_payload`
 
+        `paging_state` resumes a paged query, as for :meth:`.execute()`.
+
         Example usage::
 
             >>> session = cluster.connect()
@@ -1657,12 +1848,143 @@ class Session(object):
         if timeout is _NOT_SET:
             timeout = self.default_timeout
 
-        future = self._create_response_future(query, parameters, trace, custom_payload, timeout)
-        future._protocol_handler = self.client_protocol_handler
+        future = self._create_response_future(query, parameters, trace, custom_payload, timeout,
+                                              paging_state)
+        future._protocol_handler = self._protocol_handler_for(future)
         future.send_request()
         return future
 
-    def _create_response_future(self, query, parameters, trace, custom_payload, timeout):
+    def _protocol_handler_for(self, future):
+        protocol_handler = self.client_protocol_handler
+        for_row_factory = getattr(protocol_handler, 'for_row_factory', None)
+        if for_row_factory is not None:
+            row_handler = for_row_factory(future.row_factory)
+            if row_handler is not None:
+                # rows are built by the parser, skip the row factory pass
+                future.row_factory = tuple_factory
+                return row_handler
+        return protocol_handler
+
+    def scan_table(self, table, keyspace=None, columns=None, concurrency=8,
+                   split=1, fetch_size=None, consistency_level=None, pages=False, timeout=_NOT_SET,
+                   ranges=None):
+        """
+        Reads every row of `table` with one paged query per token range of
+        the ring, running up to `concurrency` of them at a time.  Each range
+        query is sent to the replicas of that range when
+        :class:`~.TokenAwarePolicy` is used.
+
+        Returns a :class:`.TokenRangeScan` iterator over the rows.  Rows
+        from different ranges are interleaved in the order their pages
+        arrive, so there is no ordering across the result.  If `pages` is
+        :const:`True`, the iterator yields whole pages instead of rows.
+
+        `keyspace` defaults to the session keyspace, and `columns` is an
+        optional sequence of column names to select (all columns by
+        default).  `split` divides each range of the ring into that many
+        sub-ranges, for more parallelism on clusters with few tokens; it is
+        only supported by integer tokens (``Murmur3Partitioner`` and
+        ``RandomPartitioner``).  `fetch_size` and `consistency_level` apply
+        to every range query.  `timeout` applies to each page request, and
+        defaults to :attr:`.default_timeout`.
+
+        An error on any range query stops the scan and is raised from the
+        iterator.
+
+        `ranges` resumes an interrupted scan from the list returned by
+        :meth:`.TokenRangeScan.get_remaining_ranges()`, instead of scanning
+        the whole ring.  It should be used with the same `table`, `columns`
+        and `split` as the interrupted scan.
+
+        Example usage::
+
+            >>> for row in session.scan_table("users", keyspace="app", concurrency=16):
+            ...     export(row)
+        """
+        if concurrency <= 0:
+            raise ValueError("concurrency must be greater than 0")
+        if split <= 0:
+            raise ValueError("split must be greater than 0")
+        if timeout is _NOT_SET:
+            timeout = self.default_timeout
+
+        keyspace = keyspace or self.keyspace
+        if not keyspace:
+            raise ValueError("No keyspace was given and the session keyspace is not set")
+        try:
+            table_meta = self.cluster.metadata.keyspaces[keyspace].tables[table]
+        except KeyError:
+            raise ValueError("Unknown table %s.%s" % (keyspace, table))
+
+        select = "SELECT %s FROM %s.%s" % (
+            ', '.join(protect_name(c) for c in columns) if columns else '*',
+            protect_name(keyspace), protect_name(table))
+        token_expr = "token(%s)" % ', '.join(protect_name(c.name) for c in table_meta.partition_key)
+        prepared = {}
+
+        def make_statement(start, end, paging_state):
+            bounds = []
+            values = []
+            if start is not None:
+                bounds.append(token_expr + " > ?")
+                values.append(start)
+            if end is not None:
+                bounds.append(token_expr + " <= ?")
+                values.append(end)
+
+            key = (start is not None, end is not None)
+            if key not in prepared:
+                query = select + (" WHERE " + " AND ".join(bounds) if bounds else "")
+                prepared[key] = self.prepare(query)
+
+            statement = prepared[key].bind(values)
+            statement.routing_token = routing_tokens.get((start, end))
+            statement.paging_state = paging_state
+            if fetch_size is not None:
+                statement.fetch_size = fetch_size
+            if consistency_level is not None:
+                statement.consistency_level = consistency_level
+            return statement
+
+        token_ranges = list(_token_ranges(self.cluster.metadata.token_map, split))
+        routing_tokens = dict(((start, end), token) for start, end, token in token_ranges)
+        if ranges is None:
+            ranges = [(start, end, None) for start, end, _ in token_ranges]
+        return TokenRangeScan(self, ranges, make_statement, concurrency, pages, timeout)
+
+    def create_write_buffer(self, batch_size=50, linger=0.005, batch_type=BatchType.UNLOGGED,
+                            consistency_level=None, timeout=_NOT_SET):
+        """
+        Returns a :class:`.WriteBuffer` which coalesces writes added by any
+        number of threads into batches, trading a little latency for
+        throughput.
+
+        Writes to the same partition are grouped together.  A group is
+        sent as one batch of type `batch_type` (a lone write is sent as it
+        is) once it holds `batch_size` writes, or `linger` seconds after its
+        first write was added, whichever comes first.  Writes without a
+        routing key cannot be grouped by partition, and are sent right
+        away on their own.  `consistency_level` applies to batches (lone
+        writes keep their own), and `timeout` defaults to
+        :attr:`.default_timeout`.
+
+        Example usage::
+
+            >>> insert = session.prepare("INSERT INTO events (source, ts, payload) VALUES (?, ?, ?)")
+            >>> buf = session.create_write_buffer(batch_size=100, linger=0.01)
+            >>> future = buf.add(insert, (source, ts, payload))
+            >>> future.result()  # waits until the batch holding it is applied
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be greater than 0")
+        if linger < 0:
+            raise ValueError("linger must not be negative")
+        if timeout is _NOT_SET:
+            timeout = self.default_timeout
+        return WriteBuffer(self, batch_size, linger, batch_type, consistency_level, timeout)
+
+    def _create_response_future(self, query, parameters, trace, custom_payload, timeout,
+                                paging_state=None):
         """ Returns the ResponseFuture before calling send_request() on it """
 
         prepared_statement = None
@@ -1674,8 +1996,10 @@ class Session(object):
 
         cl = query.consistency_level if query.consistency_level is not None else self.default_consistency_level
         fetch_size = query.fetch_size
+        adaptive_fetch_size = False
         if fetch_size is FETCH_SIZE_UNSET and self._protocol_version >= 2:
             fetch_size = self.default_fetch_size
+            adaptive_fetch_size = bool(fetch_size and self.page_byte_budget)
         elif self._protocol_version == 1:
             fetch_size = None
 
@@ -1709,15 +2033,28 @@ class Session(object):
                 query.batch_type, query._statements_and_parameters, cl,
                 query.serial_consistency_level, timestamp)
 
+        if paging_state is None:
+            paging_state = query.paging_state
+        if paging_state is not None:
+            if isinstance(query, BatchStatement):
+                raise ValueError("Paging state cannot be used with a BatchStatement")
+            message.paging_state = paging_state
+
         if trace:
             message.tracing = True
 
         message.update_custom_payload(query.custom_payload)
         message.update_custom_payload(custom_payload)
 
-        return ResponseFuture(
+        future = ResponseFuture(
             self, message, query, timeout, metrics=self._metrics,
             prepared_statement=prepared_statement)
+        if self.idempotent_timeout_retries and query.is_idempotent:
+            future._timeout_retries = self.idempotent_timeout_retries
+        if adaptive_fetch_size:
+            future._page_byte_budget = self.page_byte_budget
+            future._fetch_size_bounds = (self.min_adaptive_fetch_size, self.max_adaptive_fetch_size)
+        return future
 
     def prepare(self, query, custom_payload=None):
         """
@@ -1817,7 +2154,57 @@ class Session(object):
         for pool in self._pools.values():
             pool.shutdown()
 
-    def add_or_renew_pool(self, host, is_host_addition):
+        with self._request_queue_lock:
+            queued = list(self._request_queue)
+            self._request_queue.clear()
+        for response_future in queued:
+            response_future._on_queue_shutdown()
+
+    def _enqueue_request(self, response_future, requeue=False):
+        """
+        Parks `response_future` until a request slot frees up. Returns
+        :const:`False` if request queueing is disabled or the queue is full.
+        Intended for internal use only.
+        """
+        with self._request_queue_lock:
+            if self.is_shutdown:
+                return False
+            if requeue:
+                # it was already admitted once; keep its place at the front
+                self._request_queue.appendleft(response_future)
+                return True
+            if len(self._request_queue) >= self.max_request_queue_size:
+                return False
+            self._request_queue.append(response_future)
+            return True
+
+    def _dequeue_request(self, response_future):
+        """ Internal """
+        with self._request_queue_lock:
+            try:
+                self._request_queue.remove(response_future)
+                return True
+            except ValueError:
+                return False
+
+    def _on_request_slot_available(self):
+        """
+        Called by pools whenever a request completes on one of their
+        connections.  Intended for internal use only.
+        """
+        if not self._request_queue:
+            return
+
+        with self._request_queue_lock:
+            try:
+                response_future = self._request_queue.popleft()
+            except IndexError:
+                return
+
+        # sending may block on v1/v2 pools, so don't do it on the event loop thread
+        self.submit(response_future._send_queued_request)
+
+    def add_or_renew_pool(self, host, is_host_addition, executor=None):
         """
         For internal use only.
         """
@@ -1844,6 +2231,11 @@ class Session(object):
                     host, conn_exc, is_host_addition, expect_host_to_be_down=True)
                 return False
 
+            if self.is_shutdown:
+                # the session was shut down while the pool was being opened
+                new_pool.shutdown()
+                return False
+
             previous = self._pools.get(host)
             self._pools[host] = new_pool
             log.debug("Added pool for host %s to session", host)
@@ -1852,6 +2244,8 @@ class Session(object):
 
             return True
 
+        if executor is not None:
+            return executor.submit(run_add_or_renew_pool)
         return self.submit(run_add_or_renew_pool)
 
     def remove_pool(self, host):
@@ -2857,9 +3251,17 @@ class ResponseFuture(object):
     _start_time = None
     _metrics = None
     _paging_state = None
+    _page_byte_budget = None
+    _fetch_size_bounds = None
     _custom_payload = None
     _warnings = None
     _timer = None
+    _queue_timer = None
+    _queue_deadline = None
+    _limiter = None
+    _limiter_start_time = None
+    _timeout_retries = 0
+    _attempt = None
     _protocol_handler = ProtocolHandler
 
     _warned_timeout = False
@@ -2873,6 +3275,7 @@ class ResponseFuture(object):
         self._metrics = metrics
         self.prepared_statement = prepared_statement
         self._callback_lock = Lock()
+        self._attempt_lock = Lock()
         if metrics is not None:
             self._start_time = time.time()
         self._make_query_plan()
@@ -2888,8 +3291,25 @@ class ResponseFuture(object):
     def _cancel_timer(self):
         if self._timer:
             self._timer.cancel()
+        if self._queue_timer:
+            self._queue_timer.cancel()
 
     def _on_timeout(self):
+        if self._timeout_retries and not self._final_exception:
+            with self._attempt_lock:
+                attempt, self._attempt = self._attempt, None
+            if attempt is not None:
+                log.debug("Request to host %s timed out, retrying idempotent "
+                          "statement against the next host", self._current_host)
+                self._timeout_retries -= 1
+                self._errors[self._current_host] = OperationTimedOut(last_host=self._current_host)
+                self._timer = None
+                if self._metrics is not None:
+                    self._metrics.on_retry()
+                # don't retry on the event loop thread
+                self.session.submit(self._retry_task, False)
+                return
+
         self._set_final_exception(OperationTimedOut(self._errors, self._current_host))
 
     def _make_query_plan(self):
@@ -2908,6 +3328,11 @@ class ResponseFuture(object):
             if req_id is not None:
                 self._req_id = req_id
 
+                if self._queue_timer is not None:
+                    self._queue_timer.cancel()
+                    self._queue_timer = None
+                    self._queue_deadline = None
+
                 # timer is only started here, after we have at least one message queued
                 # this is done to avoid overrun of timers with unfettered client requests
                 # in the case of full disconnect, where no hosts will be available
@@ -2915,13 +3340,52 @@ class ResponseFuture(object):
                     self._start_timer()
                 return
 
+        if self._all_hosts_busy() and self._park():
+            return
+
         self._set_final_exception(NoHostAvailable(
             "Unable to complete the operation against any hosts", self._errors))
 
+    def _all_hosts_busy(self):
+        return bool(self._errors) and \
+            all(isinstance(exc, NoConnectionsAvailable) for exc in self._errors.values())
+
+    def _park(self):
+        requeue = self._queue_deadline is not None
+        if not self.session._enqueue_request(self, requeue):
+            return False
+        if not requeue:
+            log.debug("All hosts are at capacity, queueing request")
+            timeout = self.session.request_queue_timeout
+            self._queue_deadline = time.time() + timeout
+            self._queue_timer = self.session.cluster.connection_class.create_timer(
+                timeout, self._on_queue_timeout)
+        elif time.time() >= self._queue_deadline:
+            # the queue timer fired while the request was out of the queue
+            # being re-sent, and could not time it out
+            self._on_queue_timeout()
+        return True
+
+    def _send_queued_request(self):
+        if self._final_exception:
+            return
+        self._errors = {}
+        self._make_query_plan()
+        self.send_request()
+
+    def _on_queue_timeout(self):
+        if self.session._dequeue_request(self):
+            self._set_final_exception(OperationTimedOut(self._errors, self._current_host))
+
+    def _on_queue_shutdown(self):
+        self._set_final_exception(NoHostAvailable(
+            "Session was shut down while the request was queued", self._errors))
+
     def _query(self, host, message=None, cb=None):
         if message is None:
             message = self.message
 
+        track_attempt = cb is None and self._timeout_retries
         if cb is None:
             cb = self._set_result
 
@@ -2933,6 +3397,15 @@ class ResponseFuture(object):
             self._errors[host] = ConnectionException("Pool is shutdown")
             return None
 
+        limiter = pool.limiter
+        if limiter is not None and not limiter.try_acquire():
+            log.debug("Concurrency limit reached for host %s, moving to the next host", host)
+            self._errors[host] = NoConnectionsAvailable(
+                "Concurrency limit reached for host %s" % (host,))
+            if self._metrics is not None:
+                self._metrics.on_throttled()
+            return None
+
         self._current_host = host
         self._current_pool = pool
 
@@ -2941,11 +3414,19 @@ class ResponseFuture(object):
             # TODO get connectTimeout from cluster settings
             connection, request_id = pool.borrow_connection(timeout=2.0)
             self._connection = connection
+            self._limiter = limiter
+            self._limiter_start_time = time.time()
+            if track_attempt:
+                # this attempt may be abandoned on timeout; its response
+                # must then not complete the request
+                attempt = self._attempt = (pool, connection, limiter)
+                cb = partial(self._on_attempt_response, attempt)
             connection.send_msg(message, request_id, cb=cb, encoder=self._protocol_handler.encode_message, decoder=self._protocol_handler.decode_message)
             return request_id
         except NoConnectionsAvailable as exc:
             log.debug("All connections for host %s are at capacity, moving to the next host", host)
             self._errors[host] = exc
+            self._release_limiter(limiter)
             return None
         except Exception as exc:
             log.debug("Error querying host %s", host, exc_info=True)
@@ -2954,8 +3435,37 @@ class ResponseFuture(object):
                 self._metrics.on_connection_error()
             if connection:
                 pool.return_connection(connection)
+            self._release_limiter(limiter)
             return None
 
+    def _on_attempt_response(self, attempt, response):
+        with self._attempt_lock:
+            current = attempt is self._attempt
+            if current:
+                self._attempt = None
+        if current:
+            self._set_result(response)
+            return
+
+        # a late response to an attempt which timed out and was retried
+        pool, connection, limiter = attempt
+        pool.return_connection(connection)
+        if limiter is not None:
+            limiter.release()
+
+    def _release_limiter(self, limiter, response=None):
+        if limiter is None:
+            return
+        if limiter is self._limiter:
+            self._limiter = None
+        if response is None or (isinstance(response, Exception) and not isinstance(response, ErrorMessage)):
+            # never sent, or the connection failed; no latency sample
+            limiter.release()
+        else:
+            dropped = isinstance(response, (OverloadedErrorMessage, ReadTimeoutErrorMessage,
+                                            WriteTimeoutErrorMessage))
+            limiter.release(time.time() - self._limiter_start_time, dropped)
+
     @property
     def has_more_pages(self):
         """
@@ -2967,6 +3477,28 @@ class ResponseFuture(object):
         """
         return self._paging_state is not None
 
+    @property
+    def paging_state(self):
+        """
+        The server's opaque paging state (as bytes) for the page following
+        the last one received, or :const:`None` if there are no more pages.
+
+        It can be saved and passed to :meth:`.Session.execute()` or
+        :meth:`.Session.execute_async()` (or set as
+        :attr:`.Statement.paging_state`) to resume the same query from that
+        page later, for instance in another process::
+
+            >>> future = session.execute_async(statement)
+            >>> rows = future.result()
+            >>> save_checkpoint(future.paging_state)
+            ...
+            >>> rows = session.execute(statement, paging_state=load_checkpoint())
+
+        The query must be the same, with the same bound values, when it is
+        resumed.
+        """
+        return self._paging_state
+
     @property
     def warnings(self):
         """
@@ -3003,6 +3535,14 @@ class ResponseFuture(object):
             raise Exception("custom_payload cannot be retrieved before ResponseFuture is finalized")
         return self._custom_payload
 
+    def _adapt_fetch_size(self, body_size, rows):
+        row_count = _page_row_count(rows)
+        if not body_size or not row_count:
+            return
+        min_size, max_size = self._fetch_size_bounds
+        fetch_size = int(self._page_byte_budget * row_count / body_size)
+        self.message.fetch_size = min(max(fetch_size, min_size), max_size)
+
     def start_fetching_next_page(self):
         """
         If there are more pages left in the query result, this asynchronously
@@ -3035,6 +3575,7 @@ class ResponseFuture(object):
         try:
             if self._current_pool and self._connection:
                 self._current_pool.return_connection(self._connection)
+            self._release_limiter(self._limiter, response)
 
             trace_id = getattr(response, 'trace_id', None)
             if trace_id:
@@ -3074,6 +3615,8 @@ class ResponseFuture(object):
                     results = getattr(response, 'results', None)
                     if results is not None and response.kind == RESULT_KIND_ROWS:
                         self._paging_state = response.paging_state
+                        if self._page_byte_budget and self._paging_state is not None:
+                            self._adapt_fetch_size(response.body_size, results[1])
                         results = self.row_factory(*results)
                     self._set_final_result(results)
             elif isinstance(response, ErrorMessage):
@@ -3203,6 +3746,7 @@ class ResponseFuture(object):
         """
         if self._current_pool and self._connection:
             self._current_pool.return_connection(self._connection)
+        self._release_limiter(self._limiter, response)
 
         if self._final_exception:
             return
@@ -3457,6 +4001,34 @@ class ResponseFuture(object):
             self._callback = []
             self._errback = []
 
+    def then(self, fn, executor=None):
+        """
+        Returns a :class:`ChainedFuture` for the result of calling `fn` with
+        the results of this operation (the rows of its first page), once
+        they arrive.  If the operation fails, `fn` is not called and the
+        returned future fails with the same exception.
+
+        If `fn` returns a :class:`ResponseFuture` or a
+        :class:`concurrent.futures.Future`, the returned future completes
+        with the result of that one.  Follow-up requests can so be chained
+        without any thread waiting on the first one::
+
+            >>> select = session.prepare("SELECT balance FROM accounts WHERE id=?")
+            >>> update = session.prepare("UPDATE accounts SET balance=? WHERE id=?")
+            >>> def deposit(rows):
+            ...     return session.execute_async(update, (rows[0].balance + amount, account_id))
+            >>> future = session.execute_async(select, (account_id,)).then(deposit)
+            >>> future.result()
+
+        By default, `fn` is called by the thread completing the operation,
+        usually the IO event thread, so like callbacks it must not block or
+        wait on other requests.  Pass a :class:`concurrent.futures.Executor`
+        as `executor` to have `fn` run there instead.
+
+        See also :func:`.concurrent.all_of()` and :func:`.concurrent.any_of()`.
+        """
+        return ChainedFuture._chain(self, fn, executor)
+
     def __str__(self):
         result = "(no result yet)" if self._final_result is _NOT_SET else self._final_result
         return "<ResponseFuture: query='%s' request_id=%s result=%s exception=%s host=%s>" \
@@ -3464,6 +4036,92 @@ class ResponseFuture(object):
     __repr__ = __str__
 
 
+class ChainedFuture(Future):
+    """
+    A :class:`concurrent.futures.Future` for the last step of a chain of
+    operations, as returned by :meth:`.ResponseFuture.then()`,
+    :func:`.concurrent.all_of()` and :func:`.concurrent.any_of()`.
+    """
+
+    def __init__(self):
+        Future.__init__(self)
+        self._set_lock = Lock()
+
+    def then(self, fn, executor=None):
+        """
+        Adds a step to the chain, like :meth:`.ResponseFuture.then()`.
+        """
+        return ChainedFuture._chain(self, fn, executor)
+
+    @classmethod
+    def _chain(cls, future, fn, executor):
+        chained = cls()
+
+        def run(value):
+            try:
+                value = fn(value)
+            except Exception as exc:
+                chained._set(False, exc)
+            else:
+                chained._resolve(value)
+
+        def on_done(success, value):
+            if not success:
+                chained._set(False, value)
+            elif executor is None:
+                run(value)
+            else:
+                try:
+                    executor.submit(run, value)
+                except Exception as exc:
+                    chained._set(False, exc)
+
+        _when_done(future, on_done)
+        return chained
+
+    def _resolve(self, value):
+        if isinstance(value, (ResponseFuture, Future)):
+            _when_done(value, self._set)
+        else:
+            self._set(True, value)
+
+    def _set(self, success, value):
+        # only the first outcome counts, and a cancelled future takes none
+        with self._set_lock:
+            if self.done():
+                return
+            if success:
+                self.set_result(value)
+            else:
+                self.set_exception(value)
+
+
+def _when_done(future, fn):
+    """
+    Calls ``fn(success, result_or_exc)`` once `future`, a
+    :class:`ResponseFuture` or a :class:`concurrent.futures.Future`,
+    completes.
+    """
+    if isinstance(future, ResponseFuture):
+        # callbacks are kept across pages, only the first one counts
+        fired = []
+
+        def once(success, value):
+            if not fired:
+                fired.append(True)
+                fn(success, value)
+        future.add_callbacks(partial(once, True), partial(once, False))
+    else:
+        def done(f):
+            if f.cancelled():
+                fn(False, CancelledError())
+            elif f.exception() is not None:
+                fn(False, f.exception())
+            else:
+                fn(True, f.result())
+        future.add_done_callback(done)
+
+
 class QueryExhausted(Exception):
     """
     Raised when :meth:`.ResponseFuture.start_fetching_next_page()` is called and
@@ -3499,14 +4157,53 @@ class PagedResult(object):
 
     response_future = None
 
-    def __init__(self, response_future, initial_response):
+    _prefetch_pages = 0
+    _prefetch_threshold = 0
+    _rows_until_prefetch = 0
+
+    def __init__(self, response_future, initial_response, prefetch_pages=None, prefetch_threshold=None):
+        """
+        `prefetch_pages` and `prefetch_threshold` default to
+        :attr:`.Session.paging_prefetch_pages` and
+        :attr:`.Session.paging_prefetch_threshold`.
+        """
         self.response_future = response_future
         self.current_response = iter(initial_response)
+        self._paging_state = response_future.paging_state
+
+        session = response_future.session
+        if prefetch_pages is None:
+            prefetch_pages = session.paging_prefetch_pages
+        if prefetch_pages:
+            if prefetch_threshold is None:
+                prefetch_threshold = session.paging_prefetch_threshold
+            self._prefetch_pages = prefetch_pages
+            self._prefetch_threshold = prefetch_threshold
+            self._pages = deque()
+            self._page_condition = Condition(RLock())
+            self._page_error = None
+            self._fetching = False
+            self._callbacks_added = False
+            self._reset_prefetch_countdown(initial_response)
+
+    @property
+    def paging_state(self):
+        """
+        The paging state for the page following the one currently being
+        iterated, or :const:`None` if it is the last page (see
+        :attr:`.ResponseFuture.paging_state`).  Once every row of the current
+        page has been consumed, a query resumed from this paging state
+        continues with the next page, without repeating any row.
+        """
+        return self._paging_state
 
     def __iter__(self):
         return self
 
     def next(self):
+        if self._prefetch_pages:
+            return self._next_prefetched()
+
         try:
             return next(self.current_response)
         except StopIteration:
@@ -3515,6 +4212,7 @@ class PagedResult(object):
 
         self.response_future.start_fetching_next_page()
         result = self.response_future.result()
+        self._paging_state = self.response_future.paging_state
         if self.response_future.has_more_pages:
             self.current_response = result.current_response
         else:
@@ -3523,3 +4221,396 @@ class PagedResult(object):
         return next(self.current_response)
 
     __next__ = next
+
+    def _next_prefetched(self):
+        while True:
+            try:
+                row = next(self.current_response)
+                break
+            except StopIteration:
+                page, self._paging_state = self._wait_for_page()
+                self.current_response = iter(page)
+                self._reset_prefetch_countdown(page)
+
+        self._rows_until_prefetch -= 1
+        if self._rows_until_prefetch == 0:
+            self._maybe_prefetch()
+        return row
+
+    def _reset_prefetch_countdown(self, page):
+        try:
+            page_size = len(page)
+        except TypeError:
+            page_size = 0
+        self._rows_until_prefetch = max(1, int(page_size * self._prefetch_threshold))
+
+    def _wait_for_page(self):
+        with self._page_condition:
+            while not self._pages:
+                if self._page_error is not None:
+                    raise self._page_error
+                if not self._fetching:
+                    if not self.response_future.has_more_pages:
+                        raise StopIteration
+                    self._fetching = True
+                    self._fetch_next_page()
+                    continue
+                self._page_condition.wait()
+            return self._pages.popleft()
+
+    def _maybe_prefetch(self):
+        with self._page_condition:
+            if not self._should_prefetch():
+                return
+            self._fetching = True
+        self._fetch_next_page()
+
+    def _should_prefetch(self):
+        # lock must be held
+        return (not self._fetching and self._page_error is None and
+                len(self._pages) < self._prefetch_pages and
+                self.response_future.has_more_pages)
+
+    def _fetch_next_page(self):
+        try:
+            self.response_future.start_fetching_next_page()
+            if not self._callbacks_added:
+                # callbacks are kept by the future for all following pages
+                self._callbacks_added = True
+                self.response_future.add_callbacks(self._on_page, self._on_page_error)
+        except Exception as exc:
+            self._on_page_error(exc)
+
+    def _on_page(self, rows):
+        with self._page_condition:
+            self._pages.append((rows, self.response_future.paging_state))
+            self._fetching = False
+            self._page_condition.notify()
+            if not self._should_prefetch():
+                return
+            self._fetching = True
+
+        # called on the event loop thread, where sending could block on the pool
+        try:
+            submitted = self.response_future.session.submit(self._fetch_next_page)
+        except Exception:
+            submitted = None
+        if submitted is None:
+            # the session is shutting down, the consumer requests the page itself
+            with self._page_condition:
+                self._fetching = False
+                self._page_condition.notify()
+
+    def _on_page_error(self, exc):
+        with self._page_condition:
+            self._page_error = exc
+            self._fetching = False
+            self._page_condition.notify()
+
+
+def _page_row_count(rows):
+    """
+    Returns the number of rows in a page as decoded by the protocol handler,
+    or :const:`None` if it cannot be told without consuming the rows.
+    """
+    if isinstance(rows, dict):
+        # NumPy parsers return a dict of column arrays
+        rows = next(iter(rows.values()), ())
+    try:
+        return len(rows)
+    except TypeError:
+        return None
+
+
+def _token_ranges(token_map, split=1):
+    """
+    Yields ``(start, end, routing_token)`` tuples covering the whole ring,
+    where the range is ``start < token <= end``, a bound of :const:`None` is
+    open, and `routing_token` is a :class:`~.Token` whose replicas own the
+    range.
+    """
+    ring = token_map.ring if token_map else None
+    if not ring:
+        yield None, None, None
+        return
+
+    last = ring[-1]
+    for start, end in zip(ring, ring[1:]):
+        start_value, end_value = start.value, end.value
+        if split > 1 and isinstance(start_value, six.integer_types):
+            bounds = [start_value + (end_value - start_value) * i // split for i in range(split + 1)]
+            for sub_start, sub_end in zip(bounds, bounds[1:]):
+                if sub_start != sub_end:
+                    yield sub_start, sub_end, start
+        else:
+            yield start_value, end_value, start
+
+    # the range wrapping around the end of the ring
+    yield last.value, None, last
+    yield None, ring[0].value, last
+
+
+class TokenRangeScan(object):
+    """
+    An iterator over the rows of a full table scan split by token ranges,
+    as returned by :meth:`.Session.scan_table()`.
+
+    Each range query is paged.  The next page of a range is only requested
+    once its current page has been handed out by the iterator, so at most
+    two pages per running range are held in memory.
+
+    The scan can be checkpointed with :meth:`get_remaining_ranges()` and
+    resumed later by :meth:`.Session.scan_table()`.
+    """
+
+    def __init__(self, session, ranges, make_statement, concurrency, pages=False, timeout=None):
+        self.session = session
+        self._pending = deque(ranges)
+        self._make_statement = make_statement
+        # paging state after the last page consumed, per started range
+        self._positions = OrderedDict()
+        self._pages = pages
+        self._timeout = timeout
+        self._condition = Condition()
+        self._ready = deque()
+        self._error = None
+        self._running = 0
+        self._closed = False
+        self._rows = iter(())
+        self._results = self._iter_pages()
+
+        for _ in range(concurrency):
+            if not self._start_next():
+                break
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._pages:
+            return next(self._results)
+
+        while True:
+            try:
+                return next(self._rows)
+            except StopIteration:
+                self._rows = iter(next(self._results))
+
+    __next__ = next
+
+    def close(self):
+        """
+        Stops the scan.  Requests in flight are completed but their results
+        are discarded, and no more ranges are started.
+        """
+        with self._condition:
+            self._closed = True
+            self._ready.clear()
+            self._condition.notify()
+
+    def get_remaining_ranges(self):
+        """
+        Returns the token ranges which have not been fully read, as a list
+        of ``(start, end, paging_state)`` tuples to pass as `ranges` to
+        :meth:`.Session.scan_table()` to resume the scan.  `paging_state`
+        is the position after the last page of the range consumed from the
+        iterator, or :const:`None` if no page of the range was consumed.
+
+        A page counts as consumed once the iterator moves past it, so rows
+        of the page being iterated are read again on resume.
+        """
+        with self._condition:
+            return [token_range + (paging_state,) for token_range, paging_state in self._positions.items()] + \
+                list(self._pending)
+
+    def _iter_pages(self):
+        while True:
+            with self._condition:
+                while not self._ready and self._running and self._error is None and not self._closed:
+                    self._condition.wait()
+                if self._error is not None:
+                    self._closed = True
+                    raise self._error
+                if not self._ready:
+                    return
+                token_range, future, rows = self._ready.popleft()
+
+            paging_state = future.paging_state if future.has_more_pages else None
+            if future.has_more_pages:
+                try:
+                    future.start_fetching_next_page()
+                except Exception as exc:
+                    self._on_error(exc, future)
+            else:
+                with self._condition:
+                    self._running -= 1
+                self._start_next()
+
+            yield rows
+
+            # asked for more, so the page has been consumed
+            with self._condition:
+                if paging_state is None:
+                    del self._positions[token_range]
+                else:
+                    self._positions[token_range] = paging_state
+
+    def _start_next(self):
+        with self._condition:
+            if self._closed or self._error is not None or not self._pending:
+                return False
+            start, end, paging_state = self._pending.popleft()
+            self._positions[(start, end)] = paging_state
+            self._running += 1
+
+        try:
+            statement = self._make_statement(start, end, paging_state)
+            future = self.session.execute_async(statement, timeout=self._timeout)
+            # callbacks are kept by the future for all following pages
+            future.add_callbacks(self._on_page, self._on_error,
+                                 callback_args=((start, end), future), errback_args=(future,))
+        except Exception as exc:
+            self._on_error(exc, None)
+        return True
+
+    def _on_page(self, rows, token_range, future):
+        with self._condition:
+            if not self._closed:
+                self._ready.append((token_range, future, rows))
+            self._condition.notify()
+
+    def _on_error(self, exc, future):
+        with self._condition:
+            if self._error is None:
+                self._error = exc
+            self._condition.notify()
+
+
+class WriteBuffer(object):
+    """
+    Coalesces writes into batches by partition, as created by
+    :meth:`.Session.create_write_buffer()`.  It is safe to share between
+    threads.
+
+    Pending writes are sent when :meth:`flush()` or :meth:`close()` is
+    called, which should be done before shutting down the session.  A
+    buffer can also be used as a context manager, closing it on exit.
+    """
+
+    def __init__(self, session, batch_size, linger, batch_type, consistency_level, timeout):
+        self.session = session
+        self.batch_size = batch_size
+        self.linger = linger
+        self.batch_type = batch_type
+        self.consistency_level = consistency_level
+        self.timeout = timeout
+        self._lock = Lock()
+        self._groups = {}
+        self._timers = {}
+        self._closed = False
+
+    def add(self, statement, parameters=None):
+        """
+        Adds a write to the buffer, with the same arguments as
+        :meth:`.Session.execute()`.  Returns a
+        :class:`concurrent.futures.Future` which is resolved with the
+        result of the batch holding the write, or with its error.
+        """
+        if isinstance(statement, six.string_types):
+            statement = SimpleStatement(statement)
+        elif isinstance(statement, PreparedStatement):
+            statement, parameters = statement.bind(() if parameters is None else parameters), None
+
+        keyspace = statement.keyspace or self.session.keyspace
+        routing_key = statement.routing_key
+        key = (keyspace, routing_key) if keyspace and routing_key is not None else None
+
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise Exception("WriteBuffer is closed")
+            if key is None:
+                # writes to unknown partitions are sent on their own
+                group = [(statement, parameters, future)]
+            else:
+                group = self._groups.get(key)
+                if group is None:
+                    group = self._groups[key] = []
+                    self._timers[key] = self.session.cluster.connection_class.create_timer(
+                        self.linger, partial(self._on_linger, key, group))
+                group.append((statement, parameters, future))
+                if len(group) < self.batch_size:
+                    return future
+                self._pop_group(key)
+
+        self._send(key, group)
+        return future
+
+    def flush(self):
+        """
+        Sends every pending write without waiting for its group to fill up.
+        """
+        with self._lock:
+            groups = [(key, self._pop_group(key)) for key in list(self._groups)]
+        for key, group in groups:
+            self._send(key, group)
+
+    def close(self):
+        """
+        Sends every pending write, and refuses any more writes.
+        """
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _pop_group(self, key):
+        # lock must be held
+        timer = self._timers.pop(key)
+        timer.cancel()
+        return self._groups.pop(key)
+
+    def _on_linger(self, key, group):
+        with self._lock:
+            if self._groups.get(key) is not group:
+                return
+            self._pop_group(key)
+        self._send(key, group)
+
+    def _send(self, key, group):
+        futures = [future for _, _, future in group]
+        try:
+            if len(group) == 1:
+                statement, parameters, _ = group[0]
+                query = statement
+            else:
+                query = BatchStatement(self.batch_type, consistency_level=self.consistency_level,
+                                       session=self.session)
+                for statement, parameters, _ in group:
+                    query.add(statement, parameters)
+                if key is not None:
+                    query.keyspace, query.routing_key = key
+                parameters = None
+            response_future = self.session.execute_async(query, parameters, timeout=self.timeout)
+            response_future.add_callbacks(self._on_success, self._on_error,
+                                          callback_args=(futures,), errback_args=(futures,))
+        except Exception as exc:
+            self._on_error(exc, futures)
+
+    @staticmethod
+    def _on_success(result, futures):
+        for future in futures:
+            # skip writes whose futures were cancelled by the caller
+            if future.set_running_or_notify_cancel():
+                future.set_result(result)
+
+    @staticmethod
+    def _on_error(exc, futures):
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(exc)
@@ -0,0 +1,257 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Containers and helpers for columnar results, as returned by
+:attr:`~cassandra.protocol.ColumnarProtocolHandler`.
+
+=============================================================================
+This module should not be imported by any of the main python-driver modules,
+as numpy is an optional dependency.
+=============================================================================
+"""
+
+from uuid import UUID
+
+import numpy as np
+from six.moves import range
+
+
+class VarlenColumn(object):
+    """
+    A column of variable-length values (text or blobs), laid out like an
+    Apache Arrow binary array: all values are stored back to back in
+    :attr:`data`, and value ``i`` is ``data[offsets[i]:offsets[i + 1]]``.
+
+    Indexing and iterating decode single values, with :const:`None` for
+    NULL.  Use :meth:`to_numpy()` or :meth:`to_arrow()` to convert the
+    whole column.
+    """
+
+    offsets = None
+    """
+    An integer array of ``len(column) + 1`` offsets into :attr:`data`.
+    """
+
+    data = None
+    """
+    A ``uint8`` array holding the encoded values.
+    """
+
+    mask = None
+    """
+    A boolean array which is :const:`True` where the value is NULL.
+    """
+
+    is_text = False
+    """
+    :const:`True` if values are UTF-8 text, :const:`False` for blobs.
+    """
+
+    def __init__(self, offsets, data, mask, is_text=False):
+        self.offsets = offsets
+        self.data = data
+        self.mask = mask
+        self.is_text = is_text
+
+    def __len__(self):
+        return len(self.mask)
+
+    def __getitem__(self, i):
+        if self.mask[i]:
+            return None
+        value = self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+        return value.decode('utf-8') if self.is_text else value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return "<%s(%d %s values)>" % (self.__class__.__name__, len(self),
+                                       'text' if self.is_text else 'blob')
+
+    def to_numpy(self):
+        """
+        Returns the values as a NumPy object array, with :const:`None` for NULL.
+        """
+        arr = np.empty((len(self),), dtype=object)
+        arr[:] = list(self)
+        return arr
+
+    def to_arrow(self):
+        """
+        Returns the values as a ``pyarrow`` string or binary array, sharing the
+        offsets and data buffers.  Requires ``pyarrow``.
+        """
+        import pyarrow as pa
+
+        large = self.offsets.dtype.itemsize == 8
+        if self.is_text:
+            arrow_type = pa.large_string() if large else pa.string()
+        else:
+            arrow_type = pa.large_binary() if large else pa.binary()
+        validity = np.packbits(~self.mask, bitorder='little')
+        return pa.Array.from_buffers(
+            arrow_type, len(self),
+            [pa.py_buffer(validity), pa.py_buffer(self.offsets), pa.py_buffer(self.data)],
+            null_count=int(self.mask.sum()))
+
+
+def concat_columns(columns):
+    """
+    Concatenates the arrays of one column from several pages.
+    """
+    first = columns[0]
+    if isinstance(first, VarlenColumn):
+        data = np.concatenate([c.data for c in columns])
+        offsets_dtype = np.int32 if len(data) < 2 ** 31 else np.int64
+        offsets = _concat_offsets([c.offsets for c in columns], offsets_dtype)
+        return VarlenColumn(offsets, data, np.concatenate([c.mask for c in columns]), first.is_text)
+    if any(isinstance(c, np.ma.MaskedArray) for c in columns):
+        return np.ma.concatenate(columns)
+    return np.concatenate(columns)
+
+
+def _concat_offsets(offsets, dtype):
+    result = [offsets[0].astype(dtype)]
+    # kept as a Python int, as int32 offsets would wrap around past 2 GB
+    base = int(offsets[0][-1])
+    for o in offsets[1:]:
+        result.append(o[1:].astype(dtype) + dtype(base))
+        base += int(o[-1])
+    return np.concatenate(result)
+
+
+def concat_pages(pages):
+    """
+    Concatenates result pages, each a dict mapping column names to arrays,
+    into a single dict of arrays.
+    """
+    if not pages:
+        return {}
+    return dict((name, concat_columns([page[name] for page in pages]))
+                for name in pages[0])
+
+
+def fetch_all_pages(response_future):
+    """
+    Waits for every page of a paged query, and returns all of its columns
+    as a single dict of arrays.  Raises any error met while fetching.
+
+    Example::
+
+        >>> from cassandra.protocol import ColumnarProtocolHandler
+        >>> from cassandra.query import tuple_factory
+        >>> session.client_protocol_handler = ColumnarProtocolHandler
+        >>> session.row_factory = tuple_factory
+        >>> future = session.execute_async("SELECT * FROM events")
+        >>> columns = fetch_all_pages(future)
+        >>> columns['ts']
+        array(['2015-10-01T12:00:00.000', ...], dtype='datetime64[ms]')
+    """
+    return concat_pages(_fetch_pages(response_future))
+
+
+def _fetch_pages(response_future):
+    pages = []
+    while True:
+        response_future.result()
+        pages.append(response_future._final_result)
+        if not response_future.has_more_pages:
+            break
+        response_future.start_fetching_next_page()
+    return pages
+
+
+def to_dataframe(columns, colnames):
+    """
+    Builds a ``pandas.DataFrame`` from a dict of column arrays, as returned
+    by the NumPy protocol handlers, with columns in the order of `colnames`.
+    Requires ``pandas``.
+
+    Native arrays are passed to pandas as they are.  Masked integer and
+    boolean columns become nullable pandas arrays, and masked float and
+    timestamp columns are filled with NaN and NaT.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(
+        dict((name, _to_pandas_column(columns[name])) for name in colnames),
+        columns=colnames)
+
+
+def _to_pandas_column(column):
+    import pandas as pd
+
+    if isinstance(column, VarlenColumn):
+        return column.to_numpy()
+
+    kind = column.dtype.kind
+    if kind == 'V':
+        mask = np.ma.getmaskarray(column)
+        return np.array([None if masked else UUID(bytes=v.tobytes())
+                         for v, masked in zip(np.ma.getdata(column), mask)], dtype=object)
+    if not isinstance(column, np.ma.MaskedArray):
+        return column
+
+    data, mask = column.data, np.ma.getmaskarray(column)
+    if kind == 'f':
+        return column.filled(np.nan)
+    if kind == 'M':
+        return column.filled(np.datetime64('NaT'))
+    if kind == 'i' and hasattr(pd.arrays, 'IntegerArray'):
+        return pd.arrays.IntegerArray(data, mask)
+    if kind == 'b' and hasattr(pd.arrays, 'BooleanArray'):
+        return pd.arrays.BooleanArray(data, mask)
+    return column.astype(object).filled(None)
+
+
+def dataframe_factory(colnames, rows):
+    """
+    A row factory returning each result page as a ``pandas.DataFrame``.
+    Requires ``pandas``.
+
+    Pages decoded by :attr:`~cassandra.protocol.NumpyProtocolHandler` or
+    :attr:`~cassandra.protocol.ColumnarProtocolHandler` are built from the
+    column arrays directly (see :func:`to_dataframe`).  Other pages are
+    built from their rows.
+
+    Example::
+
+        >>> from cassandra.columnar import dataframe_factory, fetch_dataframe
+        >>> from cassandra.protocol import ColumnarProtocolHandler
+        >>> session.client_protocol_handler = ColumnarProtocolHandler
+        >>> session.row_factory = dataframe_factory
+        >>> df = fetch_dataframe(session.execute_async("SELECT * FROM events"))
+    """
+    import pandas as pd
+
+    if isinstance(rows, dict):
+        return to_dataframe(rows, colnames)
+    return pd.DataFrame.from_records(list(rows), columns=colnames)
+
+
+def fetch_dataframe(response_future):
+    """
+    Waits for every page of a query made with :func:`dataframe_factory` as
+    row factory, and returns all of them as a single ``pandas.DataFrame``.
+    Requires ``pandas``.
+    """
+    import pandas as pd
+
+    pages = _fetch_pages(response_future)
+    if len(pages) == 1:
+        return pages[0]
+    return pd.concat(pages, ignore_index=True)
@@ -13,19 +13,29 @@
 # limitations under the License.
 
 
-from heapq import heappush, heappop
-from itertools import cycle
+from collections import deque
+from functools import partial
+from itertools import count, cycle, islice
 import six
-from six.moves import xrange, zip
-from threading import Condition
+from six.moves import cPickle as pickle, zip
+from six.moves.queue import Empty, Queue
+from threading import Event, Lock
 import sys
+import time
 
-from cassandra.cluster import PagedResult
+from cassandra import OperationTimedOut, Timeout, Unavailable, WriteTimeout
+from cassandra.cluster import ChainedFuture, NoHostAvailable, PagedResult, _when_done
+from cassandra.protocol import OverloadedErrorMessage
+from cassandra.query import (BatchStatement, BatchType, BoundStatement, PreparedStatement,
+                             SimpleStatement, tuple_factory)
+from cassandra.util import OrderedDict
 
 import logging
 log = logging.getLogger(__name__)
 
-def execute_concurrent(session, statements_and_parameters, concurrency=100, raise_on_first_error=True, results_generator=False):
+def execute_concurrent(session, statements_and_parameters, concurrency=100, raise_on_first_error=True, results_generator=False,
+                       max_rate=None, max_bytes_rate=None, deadline=None, adaptive_concurrency=False, ordered=True,
+                       fetch_all_pages=False, max_rows=None):
     """
     Executes a sequence of (statement, parameters) tuples concurrently.  Each
     ``parameters`` item must be a sequence or :const:`None`.
@@ -53,6 +63,40 @@ def execute_concurrent(session, statements_and_parameters, concurrency=100, rais
         footprint is marginal CPU overhead (more thread coordination and sorting out-of-order results
         on-the-fly).
 
+    If `ordered` is :const:`False`, ``(index, success, result_or_exc)`` tuples
+    are returned in the order the statements complete instead, where ``index``
+    is the position of the statement.  Used with `results_generator`, each
+    result is yielded as soon as it arrives, so a slow statement does not hold
+    back the others.  Results not yet consumed count against `concurrency`,
+    so no more than `concurrency` results are ever held in memory.
+
+    The following options throttle execution, for instance for backfills
+    against a live cluster:
+
+        `max_rate` caps the number of statements started per second, and
+        `max_bytes_rate` the number of bytes of bound values (or query
+        strings, for unprepared statements) sent per second.  Statements are
+        delayed with timers on the event loop rather than by blocking it.
+
+        `deadline` is a number of seconds after which no more statements are
+        started.  Statements in flight are timed out at the deadline, and the
+        remaining ones are reported as failed with :exc:`.DeadlineExceeded`.
+
+        If `adaptive_concurrency` is :const:`True`, the number of statements
+        in flight is halved whenever one fails because a host was overloaded
+        or a write timed out, then grows back by one per `concurrency`
+        successes, up to `concurrency`.
+
+    Results with more than one page are normally returned as
+    :class:`~.PagedResult`, whose further pages are fetched when it is
+    iterated.  If `fetch_all_pages` is :const:`True`, the remaining pages
+    are fetched by the executor instead, one after the other while the
+    statement keeps its place among the `concurrency` requests in flight,
+    and the result is the list of all rows.  If `max_rows` is given, pages
+    are fetched until there are that many rows, and no more are returned.
+    Rows which are not returned as a list by the row factory are still
+    returned as :class:`~.PagedResult`.
+
     A sequence of ``(success, result_or_exc)`` tuples is returned in the same
     order that the statements were passed in.  If ``success`` is :const:`False`,
     there was an error executing the statement, and ``result_or_exc`` will be
@@ -80,49 +124,214 @@ def execute_concurrent(session, statements_and_parameters, concurrency=100, rais
     """
     if concurrency <= 0:
         raise ValueError("concurrency must be greater than 0")
+    if max_rate is not None and max_rate <= 0:
+        raise ValueError("max_rate must be greater than 0")
+    if max_bytes_rate is not None and max_bytes_rate <= 0:
+        raise ValueError("max_bytes_rate must be greater than 0")
+    if max_rows is not None and max_rows <= 0:
+        raise ValueError("max_rows must be greater than 0")
 
     if not statements_and_parameters:
         return []
 
-    executor = ConcurrentExecutorGenResults(session, statements_and_parameters) if results_generator else ConcurrentExecutorListResults(session, statements_and_parameters)
-    return executor.execute(concurrency, raise_on_first_error)
+    if not ordered:
+        executor_class = ConcurrentExecutorUnorderedResults
+    elif results_generator:
+        executor_class = ConcurrentExecutorGenResults
+    else:
+        executor_class = ConcurrentExecutorListResults
+    executor = executor_class(session, statements_and_parameters, max_rate=max_rate, max_bytes_rate=max_bytes_rate,
+                              deadline=deadline, adaptive_concurrency=adaptive_concurrency,
+                              fetch_all_pages=fetch_all_pages, max_rows=max_rows)
+    results = executor.execute(concurrency, raise_on_first_error)
+    if not ordered and not results_generator:
+        return list(results)
+    return results
+
+
+class DeadlineExceeded(Exception):
+    """
+    Reported by :func:`.execute_concurrent()` for statements that were not
+    executed because its `deadline` had passed.
+    """
+    pass
+
+
+class _RateLimiter(object):
+    """
+    A token bucket which tells how long to delay each operation, allowing
+    bursts of up to :attr:`burst` seconds worth of operations.
+    """
+
+    burst = 0.1
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self._lock = Lock()
+        self._next_free = 0
+
+    def reserve(self, cost=1):
+        """
+        Takes `cost` units, and returns the number of seconds to wait
+        before they are available.
+        """
+        with self._lock:
+            now = time.time()
+            start = max(self._next_free, now - self.burst)
+            self._next_free = start + cost / self.rate
+            return max(0.0, start - now)
+
+
+def _is_overload(exc):
+    if isinstance(exc, NoHostAvailable):
+        return any(_is_overload(e) for e in exc.errors.values())
+    return isinstance(exc, (OverloadedErrorMessage, WriteTimeout))
+
+
+def _statement_size(statement, params):
+    if isinstance(statement, BoundStatement):
+        return _values_size(statement.values)
+    if isinstance(statement, BatchStatement):
+        return sum(_values_size(values) if is_prepared else len(query)
+                   for is_prepared, query, values in statement._statements_and_parameters)
+    if isinstance(statement, SimpleStatement):
+        statement = statement.query_string
+    if isinstance(statement, six.string_types):
+        return len(statement) + sum(len(p) if isinstance(p, (six.binary_type, six.text_type)) else 8
+                                    for p in (params or ()))
+    return 0
+
+
+def _values_size(values):
+    # skips NULL and UNSET_VALUE
+    return sum(len(v) for v in values if isinstance(v, six.binary_type))
 
 
 class _ConcurrentExecutor(object):
+    """
+    Runs statements with a bounded number of requests in flight, each
+    completion starting the next statements from its own callback.
 
-    def __init__(self, session, statements_and_params):
+    Results are stored without a lock: each is written to its own slot in
+    :attr:`_slots`, indexed by statement, and counted with an atomic
+    counter.  Each completion then briefly takes :attr:`_statements_lock`
+    to update the number of requests in flight and pull the next
+    statements from the input iterator.  The lock is never held while a
+    request is sent.
+    """
+
+    def __init__(self, session, statements_and_params, max_rate=None, max_bytes_rate=None, deadline=None,
+                 adaptive_concurrency=False, fetch_all_pages=False, max_rows=None):
         self.session = session
         self._enum_statements = enumerate(iter(statements_and_params))
-        self._condition = Condition()
+        self._statements_lock = Lock()
+        self._rate_limiter = _RateLimiter(max_rate) if max_rate else None
+        self._bytes_rate_limiter = _RateLimiter(max_bytes_rate) if max_bytes_rate else None
+        self._deadline = deadline
+        self._adaptive_concurrency = adaptive_concurrency
+        self._fetch_pages = fetch_all_pages or max_rows is not None
+        self._max_rows = max_rows
+        # rows of the pages fetched so far, by statement
+        self._page_rows = {}
         self._fail_fast = False
-        self._results_queue = []
-        self._current = 0
+        self._slots = []
         self._exec_count = 0
+        self._in_flight = 0
+        self._exhausted = False
+        self._exception = None
+        self._completions = count(1)
 
     def execute(self, concurrency, fail_fast):
         self._fail_fast = fail_fast
-        self._results_queue = []
-        self._current = 0
+        self._slots = []
         self._exec_count = 0
-        with self._condition:
-            for n in xrange(concurrency):
-                if not self._execute_next():
-                    break
+        self._in_flight = 0
+        self._exhausted = False
+        self._exception = None
+        self._max_concurrency = concurrency
+        self._concurrency = float(concurrency)
+        self._deadline_time = time.time() + self._deadline if self._deadline is not None else None
+        # the launching thread holds one extra completion until it is done
+        # starting the first statements, so that completions racing with it
+        # cannot see the executor as finished too early
+        self._completions = count(1)
+        self._execute_next()
+        self._complete()
         return self._results()
 
-    def _execute_next(self):
-        # lock must be held
-        try:
-            (idx, (statement, params)) = next(self._enum_statements)
-            self._exec_count += 1
+    def _execute_next(self, completed=False, error=None):
+        to_execute = []
+        skipped = []
+        with self._statements_lock:
+            if completed:
+                self._in_flight -= 1
+                if self._adaptive_concurrency:
+                    self._adapt_concurrency(error)
+
+            while self._in_flight + self._buffered() < self._concurrency and not self._exhausted:
+                if self._fail_fast and self._exception is not None:
+                    self._exhausted = True
+                    break
+                try:
+                    (idx, (statement, params)) = next(self._enum_statements)
+                except StopIteration:
+                    self._exhausted = True
+                    break
+
+                self._exec_count += 1
+                self._start(idx)
+                if self._deadline_passed():
+                    # report without sending, and count as completed right away
+                    exc = DeadlineExceeded()
+                    self._store(idx, False, exc)
+                    next(self._completions)
+                    skipped.append(idx)
+                    if self._exception is None:
+                        self._exception = exc
+                    continue
+
+                self._in_flight += 1
+                to_execute.append((idx, statement, params))
+
+        for idx in skipped:
+            self._on_result(idx, False)
+        for idx, statement, params in to_execute:
             self._execute(idx, statement, params)
-            return True
-        except StopIteration:
-            pass
+        return bool(to_execute)
+
+    def _adapt_concurrency(self, error):
+        # lock must be held
+        if error is None:
+            self._concurrency = min(self._max_concurrency, self._concurrency + 1.0 / self._max_concurrency)
+        elif _is_overload(error):
+            self._concurrency = max(1.0, self._concurrency / 2)
+
+    def _deadline_passed(self):
+        return self._deadline_time is not None and time.time() >= self._deadline_time
 
     def _execute(self, idx, statement, params):
+        delay = 0
+        if self._rate_limiter:
+            delay = self._rate_limiter.reserve()
+        if self._bytes_rate_limiter:
+            if isinstance(statement, PreparedStatement):
+                statement, params = statement.bind(() if params is None else params), None
+            delay = max(delay, self._bytes_rate_limiter.reserve(_statement_size(statement, params)))
+
+        if delay > 0:
+            self.session.cluster.connection_class.create_timer(
+                delay, partial(self._send, idx, statement, params))
+        else:
+            self._send(idx, statement, params)
+
+    def _send(self, idx, statement, params):
         try:
-            future = self.session.execute_async(statement, params, timeout=None)
+            timeout = None
+            if self._deadline_time is not None:
+                timeout = self._deadline_time - time.time()
+                if timeout <= 0:
+                    raise DeadlineExceeded()
+            future = self.session.execute_async(statement, params, timeout=timeout)
             args = (future, idx)
             future.add_callbacks(
                 callback=self._on_success, callback_args=args,
@@ -134,14 +343,68 @@ class _ConcurrentExecutor(object):
             self._put_result(e, idx, False)
 
     def _on_success(self, result, future, idx):
-        if future.has_more_pages:
+        if self._fetch_pages and isinstance(result, list):
+            rows = self._page_rows.pop(idx, None)
+            if rows is not None:
+                rows.extend(result)
+                result = rows
+            if self._max_rows is not None and len(result) >= self._max_rows:
+                result = result[:self._max_rows]
+            elif future.has_more_pages:
+                # callbacks are kept, the next page comes back here
+                self._page_rows[idx] = result
+                # called on the event loop thread, where sending could block on the pool
+                try:
+                    submitted = self.session.submit(self._fetch_next_page, future, idx)
+                except Exception:
+                    submitted = None
+                if submitted is None:
+                    # the session is shutting down, the request fails right away
+                    self._fetch_next_page(future, idx)
+                return
+        elif future.has_more_pages:
             result = PagedResult(future, result)
             future.clear_callbacks()
         self._put_result(result, idx, True)
 
+    def _fetch_next_page(self, future, idx):
+        try:
+            future.start_fetching_next_page()
+        except Exception as exc:
+            self._on_error(exc, future, idx)
+
     def _on_error(self, result, future, idx):
+        self._page_rows.pop(idx, None)
         self._put_result(result, idx, False)
 
+    def _put_result(self, result, idx, success):
+        self._store(idx, success, result)
+        if not success and self._exception is None:
+            self._exception = result
+        self._on_result(idx, success)
+        self._execute_next(completed=True, error=None if success else result)
+        self._complete()
+
+    def _start(self, idx):
+        # lock must be held, statements are started in order
+        self._slots.append(_PENDING)
+
+    def _store(self, idx, success, result):
+        self._slots[idx] = (success, result)
+
+    def _buffered(self):
+        """
+        Number of results held for the consumer which count against the
+        concurrency limit.
+        """
+        return 0
+
+    def _complete(self):
+        # only the last completion, once the statements are exhausted,
+        # sees the count reach the number of statements (plus the launcher)
+        if next(self._completions) == self._exec_count + 1 and self._exhausted:
+            self._on_done()
+
     @staticmethod
     def _raise(exc):
         if six.PY2 and isinstance(exc, tuple):
@@ -151,58 +414,131 @@ class _ConcurrentExecutor(object):
             raise exc
 
 
+_PENDING = object()
+
+
 class ConcurrentExecutorGenResults(_ConcurrentExecutor):
 
-    def _put_result(self, result, idx, success):
-        with self._condition:
-            heappush(self._results_queue, (idx, (success, result)))
-            self._execute_next()
-            self._condition.notify()
+    def execute(self, concurrency, fail_fast):
+        # completions only wake the consumer up when they fill the slot it
+        # is blocked on, or when everything has completed
+        self._wakeup = Event()
+        self._waiting_for = None
+        self._done = False
+        return super(ConcurrentExecutorGenResults, self).execute(concurrency, fail_fast)
+
+    def _on_result(self, idx, success):
+        if idx == self._waiting_for:
+            self._wakeup.set()
+
+    def _on_done(self):
+        self._done = True
+        self._wakeup.set()
 
     def _results(self):
-        with self._condition:
-            while self._current < self._exec_count:
-                while not self._results_queue or self._results_queue[0][0] != self._current:
-                    self._condition.wait()
-                while self._results_queue and self._results_queue[0][0] == self._current:
-                    _, res = heappop(self._results_queue)
-                    try:
-                        self._condition.release()
-                        if self._fail_fast and not res[0]:
-                            self._raise(res[1])
-                        yield res
-                    finally:
-                        self._condition.acquire()
-                    self._current += 1
+        slots = self._slots
+        current = 0
+        while True:
+            while current < len(slots) and slots[current] is not _PENDING:
+                res = slots[current]
+                slots[current] = None  # results are not kept once yielded
+                current += 1
+                if self._fail_fast and not res[0]:
+                    self._raise(res[1])
+                yield res
 
+            # clear before checking again, so that a completion between the
+            # check and the wait still wakes us up
+            self._wakeup.clear()
+            self._waiting_for = current
+            if current < len(slots) and slots[current] is not _PENDING:
+                continue
+            if self._done and current >= self._exec_count:
+                return
+            self._wakeup.wait()
 
-class ConcurrentExecutorListResults(_ConcurrentExecutor):
 
-    _exception = None
+class ConcurrentExecutorUnorderedResults(_ConcurrentExecutor):
 
     def execute(self, concurrency, fail_fast):
-        self._exception = None
-        return super(ConcurrentExecutorListResults, self).execute(concurrency, fail_fast)
+        self._completed = deque()
+        self._wakeup = Event()
+        self._waiting = False
+        self._done = False
+        return super(ConcurrentExecutorUnorderedResults, self).execute(concurrency, fail_fast)
 
-    def _put_result(self, result, idx, success):
-        self._results_queue.append((idx, (success, result)))
-        with self._condition:
-            self._current += 1
-            if not success and self._fail_fast:
-                if not self._exception:
-                    self._exception = result
-                self._condition.notify()
-            elif not self._execute_next() and self._current == self._exec_count:
-                self._condition.notify()
+    def _start(self, idx):
+        pass
+
+    def _store(self, idx, success, result):
+        self._completed.append((idx, success, result))
+
+    def _buffered(self):
+        return len(self._completed)
+
+    def _on_result(self, idx, success):
+        if self._waiting:
+            self._wakeup.set()
+
+    def _on_done(self):
+        self._done = True
+        self._wakeup.set()
 
     def _results(self):
-        with self._condition:
-            while self._current < self._exec_count:
-                self._condition.wait()
-                if self._exception and self._fail_fast:
-                    self._raise(self._exception)
-        return [r[1] for r in sorted(self._results_queue)]
+        completed = self._completed
+        while True:
+            while completed:
+                res = completed.popleft()
+                if self._fail_fast and not res[1]:
+                    self._raise(res[2])
+                # consuming results makes room for more statements; once a
+                # quarter of the room is free, start them here in case the
+                # buffer is what held them back (completions otherwise do)
+                if self._in_flight + len(completed) <= self._concurrency * 0.75:
+                    self._resume()
+                yield res
+
+            # clear before checking again, so that a completion between the
+            # check and the wait still wakes us up
+            self._waiting = True
+            self._wakeup.clear()
+            if completed:
+                self._waiting = False
+                continue
+            if self._done:
+                return
+            self._wakeup.wait()
+            self._waiting = False
+
+    def _resume(self):
+        with self._statements_lock:
+            if self._exhausted:
+                return
+            # take part in the completion count like the launching thread,
+            # so that running out of statements here is still noticed
+            self._exec_count += 1
+        self._execute_next()
+        self._complete()
+
+
+class ConcurrentExecutorListResults(_ConcurrentExecutor):
 
+    def execute(self, concurrency, fail_fast):
+        self._done = Event()
+        return super(ConcurrentExecutorListResults, self).execute(concurrency, fail_fast)
+
+    def _on_result(self, idx, success):
+        if not success and self._fail_fast:
+            self._done.set()
+
+    def _on_done(self):
+        self._done.set()
+
+    def _results(self):
+        self._done.wait()
+        if self._fail_fast and self._exception is not None:
+            self._raise(self._exception)
+        return list(self._slots)
 
 
 def execute_concurrent_with_args(session, statement, parameters, *args, **kwargs):
@@ -218,3 +554,630 @@ def execute_concurrent_with_args(session, statement, parameters, *args, **kwargs
         execute_concurrent_with_args(session, statement, parameters, concurrency=50)
     """
     return execute_concurrent(session, zip(cycle((statement,)), parameters), *args, **kwargs)
+
+
+def all_of(futures):
+    """
+    Returns a :class:`~.ChainedFuture` for the list of the results of
+    `futures`, each a :class:`~.ResponseFuture` or a
+    :class:`concurrent.futures.Future`, in the same order.  It fails with
+    the first exception raised by any of them.
+
+    No thread waits for the futures, so this can be used in steps of
+    :meth:`.ResponseFuture.then()` chains::
+
+        >>> future = session.execute_async(select_user, (user_id,)).then(
+        ...     lambda rows: all_of(session.execute_async(select_orders, (order_id,))
+        ...                         for order_id in rows[0].order_ids))
+        >>> orders = future.result()
+    """
+    futures = list(futures)
+    combined = ChainedFuture()
+    if not futures:
+        combined._set(True, [])
+        return combined
+
+    results = [None] * len(futures)
+    completions = count(1)
+
+    def done(idx, success, result):
+        if not success:
+            combined._set(False, result)
+            return
+        results[idx] = result
+        if next(completions) == len(results):
+            combined._set(True, results)
+
+    for idx, future in enumerate(futures):
+        _when_done(future, partial(done, idx))
+    return combined
+
+
+def any_of(futures):
+    """
+    Returns a :class:`~.ChainedFuture` for the result of the first of
+    `futures` to succeed, each a :class:`~.ResponseFuture` or a
+    :class:`concurrent.futures.Future`.  If all of them fail, it fails with
+    the exception of the last one.
+    """
+    futures = list(futures)
+    if not futures:
+        raise ValueError("any_of() needs at least one future")
+
+    combined = ChainedFuture()
+    failures = count(1)
+
+    def done(success, result):
+        if success:
+            combined._set(True, result)
+        elif next(failures) == len(futures):
+            combined._set(False, result)
+
+    for future in futures:
+        _when_done(future, done)
+    return combined
+
+
+def execute_concurrent_batches(session, statements_and_parameters, batch_size=50, group_by_replicas=False,
+                               batch_type=BatchType.UNLOGGED, consistency_level=None, max_buffered=None,
+                               concurrency=100, raise_on_first_error=True, results_generator=False,
+                               with_statements=False):
+    """
+    Groups a sequence of (statement, parameters) write tuples into batches
+    of up to `batch_size` statements and executes the batches concurrently,
+    like :meth:`~cassandra.concurrent.execute_concurrent()`.
+
+    Statements are grouped by partition, using their
+    :attr:`~.Statement.routing_key`, so that each batch only touches one
+    partition and is sent to one of its replicas when
+    :class:`~.TokenAwarePolicy` is used.  If `group_by_replicas` is
+    :const:`True`, statements are instead grouped by the set of replicas
+    of their partition (from :attr:`.Metadata.token_map`), which makes for
+    fuller batches when partitions are small.  Statements without a routing
+    key, such as plain query strings, are sent in batches of their own, as
+    their partitions are not known.
+
+    Batches are :attr:`~.BatchType.UNLOGGED` by default, use
+    :attr:`~.BatchType.COUNTER` for counter updates.  They use
+    `consistency_level` if given, else the session default; settings of
+    the individual statements do not apply.
+
+    Incomplete batches are held until they fill up, or until more than
+    `max_buffered` statements are held in all (by default, `batch_size`
+    times `concurrency`), at which point all of them are sent.
+
+    One ``(success, result_or_exc)`` tuple is returned per batch, in the
+    order batches were formed, which is not the order of the statements.
+    If `with_statements` is :const:`True`, ``(success, result_or_exc,
+    statements_and_parameters)`` tuples are returned instead, with the
+    ``(statement, parameters)`` tuples of the batch, so that failed writes
+    can be told apart and sent again.  Prepared statements are given bound
+    to their parameters in these tuples.
+
+    Example usage::
+
+        insert = session.prepare("INSERT INTO readings (sensor, ts, value) VALUES (?, ?, ?)")
+        results = execute_concurrent_batches(
+            session, ((insert, reading) for reading in readings), batch_size=100)
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be greater than 0")
+    if max_buffered is None:
+        max_buffered = batch_size * concurrency
+
+    batches = _partition_batches(session, statements_and_parameters, batch_size, group_by_replicas,
+                                 batch_type, consistency_level, max_buffered)
+    if not with_statements:
+        return execute_concurrent(session, ((batch, None) for batch, _ in batches), concurrency,
+                                  raise_on_first_error, results_generator)
+
+    # results are in the order of the batches
+    groups = deque()
+
+    def batch_statements():
+        for batch, group in batches:
+            groups.append(group)
+            yield batch, None
+
+    batch_results = execute_concurrent(session, batch_statements(), concurrency, raise_on_first_error,
+                                       results_generator=True)
+    results = ((success, result, groups.popleft()) for success, result in batch_results)
+    return results if results_generator else list(results)
+
+
+def execute_concurrent_batches_with_args(session, statement, parameters, *args, **kwargs):
+    """
+    Like :meth:`~cassandra.concurrent.execute_concurrent_batches()`, but
+    takes a single statement and a sequence of parameters.
+
+    Example usage::
+
+        insert = session.prepare("INSERT INTO readings (sensor, ts, value) VALUES (?, ?, ?)")
+        execute_concurrent_batches_with_args(session, insert, readings, batch_size=100)
+    """
+    return execute_concurrent_batches(session, zip(cycle((statement,)), parameters), *args, **kwargs)
+
+
+def _partition_batches(session, statements_and_parameters, batch_size, group_by_replicas,
+                       batch_type, consistency_level, max_buffered):
+    metadata = session.cluster.metadata
+    groups = OrderedDict()
+    buffered = 0
+
+    def make_batch(statements):
+        batch = BatchStatement(batch_type, consistency_level=consistency_level, session=session)
+        for statement, parameters in statements:
+            batch.add(statement, parameters)
+        return batch, statements
+
+    for statement, parameters in statements_and_parameters:
+        if isinstance(statement, six.string_types):
+            statement = SimpleStatement(statement)
+        elif isinstance(statement, PreparedStatement):
+            statement, parameters = statement.bind(() if parameters is None else parameters), None
+
+        keyspace = statement.keyspace or session.keyspace
+        routing_key = statement.routing_key
+        if not keyspace or routing_key is None:
+            # don't make multi-partition batches of unknown partitions
+            yield make_batch([(statement, parameters)])
+            continue
+
+        key = (keyspace, routing_key)
+        if group_by_replicas:
+            key = frozenset(metadata.get_replicas(keyspace, routing_key)) or key
+
+        group = groups.setdefault(key, [])
+        group.append((statement, parameters))
+        buffered += 1
+
+        if len(group) >= batch_size:
+            del groups[key]
+            buffered -= len(group)
+            yield make_batch(group)
+        elif buffered > max_buffered:
+            for group in groups.values():
+                yield make_batch(group)
+            groups.clear()
+            buffered = 0
+
+    for group in groups.values():
+        yield make_batch(group)
+
+
+def bulk_load(session, statement, rows, batch_size=20, group_by_replicas=True, concurrency=100,
+              consistency_level=None, max_retries=3, bind_chunk_size=1000, **kwargs):
+    """
+    Loads a stream of `rows`, each a sequence of values, with the prepared
+    INSERT (or UPDATE) `statement`, and returns :class:`BulkLoadStats`
+    once all of them have been written or have failed.
+
+    Rows are bound `bind_chunk_size` at a time with
+    :meth:`.PreparedStatement.bind_many()`.  Unless `batch_size` is 1,
+    they are then grouped into unlogged batches of up to `batch_size` rows
+    sharing the same replicas (or the same partition, if
+    `group_by_replicas` is :const:`False`), as
+    :meth:`~cassandra.concurrent.execute_concurrent_batches()` does.
+
+    Batches (or rows) are sent with up to `concurrency` requests in flight,
+    using :meth:`~cassandra.concurrent.execute_concurrent()` with any other
+    keyword arguments, such as `max_rate`, `max_bytes_rate` or
+    `adaptive_concurrency`.  Those which fail because of an unavailable or
+    overloaded replica, or no host being available, are retried up to
+    `max_retries` times, after the rest of the rows have been sent.  Those
+    which time out are only retried if `statement` is idempotent (see
+    :attr:`.Statement.is_idempotent`).  Other failures are counted in the
+    returned statistics and do not stop the load.
+
+    Example usage::
+
+        import csv
+
+        insert = session.prepare("INSERT INTO users (id, name, age) VALUES (?, ?, ?)")
+        with open('users.csv') as f:
+            rows = ((int(id), name, int(age)) for id, name, age in csv.reader(f))
+            stats = bulk_load(session, insert, rows, max_rate=20000)
+        print(stats)
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be greater than 0")
+    if bind_chunk_size <= 0:
+        raise ValueError("bind_chunk_size must be greater than 0")
+
+    stats = BulkLoadStats()
+    start = time.time()
+
+    bound = _bind_rows(statement, rows, bind_chunk_size, consistency_level, stats)
+    if batch_size > 1:
+        batches = _partition_batches(session, ((s, None) for s in bound), batch_size, group_by_replicas,
+                                     BatchType.UNLOGGED, consistency_level, batch_size * concurrency)
+        statements = (batch for batch, _ in batches)
+    else:
+        statements = bound
+    items = (_LoadItem(s) for s in statements)
+
+    while True:
+        retries = _load(session, items, concurrency, max_retries, stats, kwargs)
+        if not retries:
+            break
+        stats.retries += len(retries)
+        items = retries
+
+    stats.elapsed = time.time() - start
+    return stats
+
+
+class BulkLoadStats(object):
+    """
+    Statistics of a :func:`.bulk_load()`.
+    """
+
+    rows = 0
+    """
+    Number of rows written.
+    """
+
+    failed_rows = 0
+    """
+    Number of rows which could not be bound or written.
+    """
+
+    requests = 0
+    """
+    Number of successful requests, one per batch.
+    """
+
+    retries = 0
+    """
+    Number of requests sent again after a failure.
+    """
+
+    bytes = 0
+    """
+    Size of the values of the rows written, in bytes.
+    """
+
+    elapsed = 0
+    """
+    Duration of the load, in seconds.
+    """
+
+    errors = None
+    """
+    A dict of the number of rows failed by each exception class name.
+    """
+
+    error_samples = None
+    """
+    The first exceptions met, up to :attr:`max_error_samples`.
+    """
+
+    max_error_samples = 10
+
+    def __init__(self):
+        self.errors = {}
+        self.error_samples = []
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def _add_failure(self, exc, rows):
+        self.failed_rows += rows
+        name = exc.__class__.__name__
+        self.errors[name] = self.errors.get(name, 0) + rows
+        if len(self.error_samples) < self.max_error_samples:
+            self.error_samples.append(exc)
+
+    def __str__(self):
+        return ("%d rows written (%d failed) in %.2fs: %.0f rows/s, %.0f bytes/s, %d requests, %d retries%s" %
+                (self.rows, self.failed_rows, self.elapsed, self.rows_per_second, self.bytes_per_second,
+                 self.requests, self.retries,
+                 "; errors: " + ", ".join("%s: %d" % e for e in sorted(self.errors.items())) if self.errors else ""))
+    __repr__ = __str__
+
+
+class _LoadItem(object):
+    """
+    A request of a bulk load, and the number of times it was tried.
+    """
+
+    __slots__ = ('statement', 'rows', 'attempts')
+
+    def __init__(self, statement):
+        self.statement = statement
+        if isinstance(statement, BatchStatement):
+            self.rows = len(statement._statements_and_parameters)
+        else:
+            self.rows = 1
+        self.attempts = 0
+
+
+def _bind_rows(statement, rows, chunk_size, consistency_level, stats):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        try:
+            bound = statement.bind_many(chunk)
+        except Exception:
+            # find out which rows cannot be bound
+            bound = []
+            for row in chunk:
+                try:
+                    bound.append(statement.bind(row))
+                except Exception as exc:
+                    stats._add_failure(exc, 1)
+
+        for bound_statement in bound:
+            if consistency_level is not None:
+                bound_statement.consistency_level = consistency_level
+            yield bound_statement
+
+
+def _is_retryable(exc, statement):
+    if isinstance(exc, (Timeout, OperationTimedOut)):
+        # the statement may have been applied
+        return statement.is_idempotent
+    return isinstance(exc, (Unavailable, NoHostAvailable, OverloadedErrorMessage))
+
+
+def _load(session, items, concurrency, max_retries, stats, kwargs):
+    sent = {}
+
+    def statements():
+        for idx, item in enumerate(items):
+            sent[idx] = item
+            yield item.statement, None
+
+    retries = []
+    results = execute_concurrent(session, statements(), concurrency, raise_on_first_error=False,
+                                 results_generator=True, ordered=False, **kwargs)
+    for idx, success, result in results:
+        item = sent.pop(idx)
+        if success:
+            stats.rows += item.rows
+            stats.requests += 1
+            stats.bytes += _statement_size(item.statement, None)
+        elif item.attempts < max_retries and _is_retryable(result, item.statement):
+            item.attempts += 1
+            retries.append(item)
+        else:
+            stats._add_failure(result, item.rows)
+    return retries
+
+
+def execute_concurrent_multiprocess(cluster_factory, statements_and_parameters, processes=None, keyspace=None,
+                                    chunk_size=1000, concurrency=100, raise_on_first_error=True,
+                                    results_generator=False, ordered=True, row_factory=tuple_factory):
+    """
+    Like :meth:`~cassandra.concurrent.execute_concurrent()`, but spreads
+    the statements over a pool of `processes` worker processes (by default,
+    one per CPU), so that binding statements and building result rows is
+    not limited to a single core.
+
+    Each worker creates its own :class:`~.Cluster` by calling
+    `cluster_factory` with no arguments, then connects to `keyspace`.
+    `cluster_factory` must be picklable where processes are not forked,
+    for instance a module-level function or a :func:`functools.partial`
+    of :class:`~.Cluster`.  Statements are sent to the workers in chunks
+    of `chunk_size`, each executed with up to `concurrency` requests in
+    flight.
+
+    Statements may be query strings, :class:`~.SimpleStatement` or
+    :class:`~.PreparedStatement` instances; prepared statements are
+    prepared again by each worker, which binds them to their parameters.
+
+    Results are sent back from the workers, so rows must be picklable:
+    `row_factory` is used by the worker sessions, and defaults to
+    :meth:`~cassandra.query.tuple_factory`.  Rows which cannot be pickled,
+    such as those made by :meth:`~cassandra.query.named_tuple_factory`,
+    are sent back as plain tuples.  Paged results are fetched in full by
+    the workers.  Exceptions which cannot be pickled are replaced by an
+    :class:`Exception` carrying their message.
+
+    If `ordered` is :const:`True`, ``(success, result_or_exc)`` tuples are
+    returned in the order of the statements, as with
+    :meth:`~cassandra.concurrent.execute_concurrent()`.  Otherwise
+    ``(index, success, result_or_exc)`` tuples are returned as chunks
+    complete, where ``index`` is the position of the statement.
+
+    If `raise_on_first_error` is left as :const:`True`, the first error
+    returned is raised and the pool is terminated.  Statements in other
+    chunks may have been executed already.
+
+    Example usage::
+
+        from functools import partial
+
+        insert = session.prepare("INSERT INTO users (id, name) VALUES (?, ?)")
+        results = execute_concurrent_multiprocess(
+            partial(Cluster, ['10.0.0.1', '10.0.0.2']), ((insert, user) for user in users),
+            keyspace='app', processes=4)
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be greater than 0")
+    if concurrency <= 0:
+        raise ValueError("concurrency must be greater than 0")
+
+    results = _execute_multiprocess(cluster_factory, statements_and_parameters, processes, keyspace,
+                                    chunk_size, concurrency, raise_on_first_error, ordered, row_factory)
+    return results if results_generator else list(results)
+
+
+def _execute_multiprocess(cluster_factory, statements_and_parameters, processes, keyspace, chunk_size,
+                          concurrency, raise_on_first_error, ordered, row_factory):
+    import multiprocessing
+
+    pool = multiprocessing.Pool(processes, _init_worker, (cluster_factory, keyspace, row_factory))
+    # chunks are handed out as workers free up, rather than all at once
+    # like Pool.imap() does, so that the input is read as it is needed
+    max_pending = 2 * (processes or multiprocessing.cpu_count())
+    pending = OrderedDict()
+    completed = Queue()
+    try:
+        chunks = enumerate(_chunks(statements_and_parameters, chunk_size))
+        while True:
+            for key, chunk in chunks:
+                indices = [idx for idx, _, _ in chunk]
+                callback = None if ordered else partial(_put_chunk_results, completed, key)
+                pending[key] = (indices, pool.apply_async(_execute_chunk, (concurrency, chunk),
+                                                          callback=callback))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+
+            if ordered:
+                _, (indices, async_result) = pending.popitem(last=False)
+                results = _chunk_results(async_result, indices)
+            else:
+                results = _next_chunk_results(pending, completed)
+            for idx, success, result in results:
+                if raise_on_first_error and not success:
+                    raise result
+                yield (success, result) if ordered else (idx, success, result)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _put_chunk_results(completed, key, results):
+    completed.put((key, results))
+
+
+def _chunk_results(async_result, indices):
+    try:
+        return async_result.get()
+    except Exception as exc:
+        # the results could not be sent back by the worker
+        return [(idx, False, exc) for idx in indices]
+
+
+def _next_chunk_results(pending, completed):
+    while True:
+        try:
+            key, results = completed.get(timeout=0.1)
+            del pending[key]
+            return results
+        except Empty:
+            # chunks whose results could not be sent back never get to the
+            # completed queue
+            for key, (indices, async_result) in pending.items():
+                if async_result.ready() and not async_result.successful():
+                    del pending[key]
+                    return _chunk_results(async_result, indices)
+
+
+def _chunks(statements_and_parameters, chunk_size):
+    chunk = []
+    for idx, (statement, parameters) in enumerate(statements_and_parameters):
+        if isinstance(statement, BoundStatement):
+            raise ValueError("BoundStatements cannot be sent to worker processes; "
+                             "pass their PreparedStatement and parameters instead")
+        if isinstance(statement, PreparedStatement):
+            statement = _ToPrepare(statement.query_string, statement.consistency_level)
+        chunk.append((idx, statement, parameters))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _ToPrepare(object):
+    """
+    Stands for a :class:`~.PreparedStatement` while sent to a worker
+    process, which prepares the query again.
+    """
+
+    def __init__(self, query_string, consistency_level):
+        self.query_string = query_string
+        self.consistency_level = consistency_level
+
+
+# state of a worker process, set up by _init_worker()
+_worker_session = None
+_worker_error = None
+_worker_prepared = {}
+
+
+def _init_worker(cluster_factory, keyspace, row_factory):
+    global _worker_session, _worker_error
+
+    try:
+        cluster = cluster_factory()
+        # clear any reactor state inherited from the parent process
+        cluster.connection_class.handle_fork()
+        _worker_session = cluster.connect(keyspace)
+        _worker_session.row_factory = row_factory
+    except Exception as exc:
+        # a failing initializer would have the pool start workers over and
+        # over, report the error for each statement instead
+        _worker_error = _portable_exception(exc)
+    _worker_prepared.clear()
+
+
+def _worker_statement(statement):
+    if not isinstance(statement, _ToPrepare):
+        return statement
+
+    key = (statement.query_string, statement.consistency_level)
+    prepared = _worker_prepared.get(key)
+    if prepared is None:
+        prepared = _worker_session.prepare(statement.query_string)
+        if statement.consistency_level is not None:
+            prepared.consistency_level = statement.consistency_level
+        _worker_prepared[key] = prepared
+    return prepared
+
+
+def _execute_chunk(concurrency, chunk):
+    try:
+        if _worker_error is not None:
+            raise _worker_error
+        statements = [(_worker_statement(statement), parameters) for _, statement, parameters in chunk]
+        results = execute_concurrent(_worker_session, statements, concurrency, raise_on_first_error=False,
+                                     fetch_all_pages=True)
+    except Exception as exc:
+        exc = _portable_exception(exc)
+        return [(idx, False, exc) for idx, _, _ in chunk]
+    return [(idx,) + _portable_outcome(success, result) for (idx, _, _), (success, result) in zip(chunk, results)]
+
+
+def _portable_outcome(success, result):
+    if not success:
+        return False, _portable_exception(result)
+    try:
+        return True, _portable_result(result)
+    except Exception as exc:
+        return False, _portable_exception(exc)
+
+
+def _portable_result(result):
+    if isinstance(result, PagedResult):
+        # pages of rows which are not a list were not fetched yet
+        result = list(result)
+    try:
+        # rows all have the same type, checking the first one is enough
+        pickle.dumps(result[:1] if isinstance(result, list) else result)
+        return result
+    except Exception:
+        # such as rows of the classes made by named_tuple_factory
+        result = [tuple(row) for row in result]
+        pickle.dumps(result[:1])
+        return result
+
+
+def _portable_exception(exc):
+    try:
+        pickle.loads(pickle.dumps(exc))
+        return exc
+    except Exception:
+        return Exception("%s: %s" % (exc.__class__.__name__, exc))
@@ -92,6 +92,13 @@ class Metrics(object):
     failed request was ignored based on the :class:`.RetryPolicy` decision.
     """
 
+    throttled_requests = None
+    """
+    A :class:`greplin.scales.IntStat` count of the number of times a host
+    was skipped for a request because its :class:`.ConcurrencyLimiter`
+    limit was reached.
+    """
+
     known_hosts = None
     """
     A :class:`greplin.scales.IntStat` count of the number of nodes in
@@ -111,6 +118,14 @@ class Metrics(object):
     the driver currently has open.
     """
 
+    concurrency_limits = None
+    """
+    A :class:`greplin.scales.Stat` gauge mapping each host address to the
+    current :attr:`.ConcurrencyLimiter.limit` for that host, summed across
+    sessions.  Only hosts with a limiter (see
+    :attr:`.Cluster.concurrency_limiter_factory`) are included.
+    """
+
     def __init__(self, cluster_proxy):
         log.debug("Starting metric capture")
 
@@ -123,6 +138,7 @@ class Metrics(object):
             scales.IntStat('other_errors'),
             scales.IntStat('retries'),
             scales.IntStat('ignores'),
+            scales.IntStat('throttled_requests'),
 
             # gauges
             scales.Stat('known_hosts',
@@ -130,7 +146,9 @@ class Metrics(object):
             scales.Stat('connected_to',
                 lambda: len(set(chain.from_iterable(s._pools.keys() for s in cluster_proxy.sessions)))),
             scales.Stat('open_connections',
-                lambda: sum(sum(p.open_count for p in s._pools.values()) for s in cluster_proxy.sessions)))
+                lambda: sum(sum(p.open_count for p in s._pools.values()) for s in cluster_proxy.sessions)),
+            scales.Stat('concurrency_limits',
+                lambda: _concurrency_limits(cluster_proxy)))
 
         self.request_timer = self.stats.request_timer
         self.connection_errors = self.stats.connection_errors
@@ -140,9 +158,11 @@ class Metrics(object):
         self.other_errors = self.stats.other_errors
         self.retries = self.stats.retries
         self.ignores = self.stats.ignores
+        self.throttled_requests = self.stats.throttled_requests
         self.known_hosts = self.stats.known_hosts
         self.connected_to = self.stats.connected_to
         self.open_connections = self.stats.open_connections
+        self.concurrency_limits = self.stats.concurrency_limits
 
     def on_connection_error(self):
         self.stats.connection_errors += 1
@@ -164,3 +184,16 @@ class Metrics(object):
 
     def on_retry(self):
         self.stats.retries += 1
+
+    def on_throttled(self):
+        self.stats.throttled_requests += 1
+
+
+def _concurrency_limits(cluster):
+    limits = {}
+    for session in cluster.sessions:
+        for host, pool in tuple(session._pools.items()):
+            limiter = pool.limiter
+            if limiter is not None:
+                limits[host.address] = limits.get(host.address, 0) + int(limiter.limit)
+    return limits
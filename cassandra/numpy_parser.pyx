@@ -25,13 +25,16 @@ as numpy is an optional dependency.
 include "ioutils.pyx"
 
 cimport cython
-from libc.stdint cimport uint64_t
+from libc.stdint cimport uint64_t, int32_t
+from libc.stdlib cimport calloc, realloc, free
+from libc.string cimport memcpy, memset
 from cpython.ref cimport Py_INCREF, PyObject
 
 from cassandra.bytesio cimport BytesIOReader
 from cassandra.deserializers cimport Deserializer, from_binary
 from cassandra.parsing cimport ParseDesc, ColumnParser, RowParser
 from cassandra import cqltypes
+from cassandra.columnar import VarlenColumn
 from cassandra.util import is_little_endian
 
 import numpy as np
@@ -47,18 +50,34 @@ cdef extern from "Python.h":
     ctypedef uint64_t Py_uintptr_t
 
 
+# How values of a column are stored
+cdef enum:
+    NATIVE = 0  # fixed-size values copied as-is into a typed array
+    OBJECT = 1  # deserialized Python objects in an object array
+    VARLEN = 2  # Arrow-style offsets into a growing data buffer
+
 # Simple array descriptor, useful to parse rows into a NumPy array
 ctypedef struct ArrDesc:
     Py_uintptr_t buf_ptr
     int stride # should be large enough as we allocate contiguous arrays
-    int is_object
+    int kind
+    Py_uintptr_t mask_ptr # NULL mask, for NATIVE and VARLEN columns
+    Py_ssize_t null_count
 
 arrDescDtype = np.dtype(
     [ ('buf_ptr', np.uintp)
     , ('stride', np.dtype('i'))
-    , ('is_object', np.dtype('i'))
+    , ('kind', np.dtype('i'))
+    , ('mask_ptr', np.uintp)
+    , ('null_count', np.intp)
     ])
 
+# Data buffer of a VARLEN column
+ctypedef struct VarBuf:
+    char *data
+    Py_ssize_t size
+    Py_ssize_t capacity
+
 _cqltype_to_numpy = {
     cqltypes.LongType:          np.dtype('>i8'),
     cqltypes.CounterColumnType: np.dtype('>i8'),
@@ -68,65 +87,135 @@ _cqltype_to_numpy = {
     cqltypes.DoubleType:        np.dtype('>f8'),
 }
 
+# Additional native types, only used in columnar mode
+_columnar_cqltype_to_numpy = dict(_cqltype_to_numpy)
+_columnar_cqltype_to_numpy.update({
+    cqltypes.ByteType:          np.dtype('>i1'),
+    cqltypes.BooleanType:       np.dtype('?'),
+    cqltypes.DateType:          np.dtype('>i8'),
+    cqltypes.TimestampType:     np.dtype('>i8'),
+    cqltypes.UUIDType:          np.dtype('V16'),
+    cqltypes.TimeUUIDType:      np.dtype('V16'),
+})
+
+# Native columns which are reinterpreted once parsed
+_datetime_cqltypes = (cqltypes.DateType, cqltypes.TimestampType)
+
+_text_cqltypes = (cqltypes.UTF8Type, cqltypes.VarcharType, cqltypes.AsciiType)
+_varlen_cqltypes = _text_cqltypes + (cqltypes.BytesType,)
+
 obj_dtype = np.dtype('O')
+offsets_dtype = np.dtype(np.int32)
+mask_dtype = np.dtype('?')
 
 
 cdef class NumpyParser(ColumnParser):
-    """Decode a ResultMessage into a bunch of NumPy arrays"""
+    """
+    Decode a ResultMessage into a bunch of NumPy arrays
+
+    With `columnar`, more types are decoded into native arrays instead of
+    object arrays: timestamps to datetime64[ms], booleans to bool, UUIDs to
+    16-byte values, and text and blobs to :class:`~cassandra.columnar.VarlenColumn`
+    (Arrow-style offsets and data buffers, with a NULL mask).
+
+    Native columns containing NULL values are returned as NumPy masked
+    arrays, masking the NULL entries.
+    """
+
+    cdef readonly bint columnar
+
+    def __init__(self, columnar=False):
+        self.columnar = columnar
 
     cpdef parse_rows(self, BytesIOReader reader, ParseDesc desc):
-        cdef Py_ssize_t rowcount
+        cdef Py_ssize_t i, rowcount
         cdef ArrDesc[::1] array_descs
         cdef ArrDesc *arrs
+        cdef VarBuf *varbufs
 
         rowcount = read_int(reader)
-        array_descs, arrays = make_arrays(desc, rowcount)
+        array_descs, arrays, masks = make_arrays(desc, rowcount, self.columnar)
         arrs = &array_descs[0]
 
-        _parse_rows(reader, desc, arrs, rowcount)
+        varbufs = <VarBuf *> calloc(desc.rowsize, sizeof(VarBuf))
+        if varbufs == NULL:
+            raise MemoryError()
+
+        try:
+            _parse_rows(reader, desc, arrs, varbufs, rowcount)
+
+            for i in range(desc.rowsize):
+                if arrs[i].kind == VARLEN:
+                    arrays[i] = make_varlen_column(
+                        desc.coltypes[i], arrays[i], masks[i], &varbufs[i])
+                elif arrs[i].kind == NATIVE:
+                    arrays[i] = make_native_column(
+                        desc.coltypes[i], arrays[i], masks[i], arrs[i].null_count)
+        finally:
+            for i in range(desc.rowsize):
+                free(varbufs[i].data)
+            free(varbufs)
 
-        arrays = [make_native_byteorder(arr) for arr in arrays]
         result = dict(zip(desc.colnames, arrays))
         return result
 
 
 cdef _parse_rows(BytesIOReader reader, ParseDesc desc,
-                 ArrDesc *arrs, Py_ssize_t rowcount):
+                 ArrDesc *arrs, VarBuf *varbufs, Py_ssize_t rowcount):
     cdef Py_ssize_t i
 
     for i in range(rowcount):
-        unpack_row(reader, desc, arrs)
+        unpack_row(reader, desc, arrs, varbufs)
 
 
 ### Helper functions to create NumPy arrays and array descriptors
 
-def make_arrays(ParseDesc desc, array_size):
+def make_arrays(ParseDesc desc, array_size, columnar=False):
     """
     Allocate arrays for each result column.
 
-    returns a tuple of (array_descs, arrays), where
-        'array_descs' describe the arrays for NativeRowParser and
-        'arrays' is a dict mapping column names to arrays
-            (e.g. this can be fed into pandas.DataFrame)
+    returns a tuple of (array_descs, arrays, masks), where
+        'array_descs' describe the arrays for NativeRowParser,
+        'arrays' is a list of arrays, in column order, and
+        'masks' is a list of NULL masks, or None for object columns
     """
     array_descs = np.empty((desc.rowsize,), arrDescDtype)
     arrays = []
+    masks = []
 
     for i, coltype in enumerate(desc.coltypes):
-        arr = make_array(coltype, array_size)
-        array_descs[i]['buf_ptr'] = arr.ctypes.data
+        mask = None
+        if columnar and coltype in _varlen_cqltypes:
+            # offsets[0] is always 0, rows fill in the end offsets
+            arr = np.zeros((array_size + 1,), dtype=offsets_dtype)
+            mask = np.empty((array_size,), dtype=mask_dtype)
+            array_descs[i]['buf_ptr'] = arr.ctypes.data + arr.strides[0]
+            array_descs[i]['kind'] = VARLEN
+            array_descs[i]['mask_ptr'] = mask.ctypes.data
+        else:
+            arr = make_array(coltype, array_size, columnar)
+            array_descs[i]['buf_ptr'] = arr.ctypes.data
+            if arr.dtype == obj_dtype:
+                array_descs[i]['kind'] = OBJECT
+                array_descs[i]['mask_ptr'] = 0
+            else:
+                mask = np.empty((array_size,), dtype=mask_dtype)
+                array_descs[i]['kind'] = NATIVE
+                array_descs[i]['mask_ptr'] = mask.ctypes.data
         array_descs[i]['stride'] = arr.strides[0]
-        array_descs[i]['is_object'] = coltype not in _cqltype_to_numpy
+        array_descs[i]['null_count'] = 0
         arrays.append(arr)
+        masks.append(mask)
 
-    return array_descs, arrays
+    return array_descs, arrays, masks
 
 
-def make_array(coltype, array_size):
+def make_array(coltype, array_size, columnar=False):
     """
     Allocate a new NumPy array of the given column type and size.
     """
-    dtype = _cqltype_to_numpy.get(coltype, obj_dtype)
+    dtypes = _columnar_cqltype_to_numpy if columnar else _cqltype_to_numpy
+    dtype = dtypes.get(coltype, obj_dtype)
     return np.empty((array_size,), dtype=dtype)
 
 
@@ -135,7 +224,8 @@ def make_array(coltype, array_size):
 @cython.boundscheck(False)
 @cython.wraparound(False)
 cdef inline int unpack_row(
-        BytesIOReader reader, ParseDesc desc, ArrDesc *arrays) except -1:
+        BytesIOReader reader, ParseDesc desc, ArrDesc *arrays,
+        VarBuf *varbufs) except -1:
     cdef Buffer buf
     cdef Py_ssize_t i, rowsize = desc.rowsize
     cdef ArrDesc arr
@@ -145,15 +235,31 @@ cdef inline int unpack_row(
         get_buf(reader, &buf)
         arr = arrays[i]
 
-        if buf.size == 0:
-            raise ValueError("Cannot handle NULL value")
-        if arr.is_object:
+        if arr.kind == VARLEN:
+            # NULL (negative size) and empty values both add no data
+            if buf.size > 0:
+                append_varlen(&varbufs[i], &buf)
+            (<int32_t *> arr.buf_ptr)[0] = <int32_t> varbufs[i].size
+            (<char *> arr.mask_ptr)[0] = buf.size < 0
+            arrays[i].mask_ptr += 1
+        elif arr.kind == OBJECT:
             deserializer = desc.deserializers[i]
             val = from_binary(deserializer, &buf, desc.protocol_version)
             Py_INCREF(val)
             (<PyObject **> arr.buf_ptr)[0] = <PyObject *> val
+        elif buf.size <= 0:
+            # NULL, or a legacy empty value: mask it and don't leave
+            # uninitialized memory behind
+            memset(<char *> arr.buf_ptr, 0, arr.stride)
+            (<char *> arr.mask_ptr)[0] = 1
+            arrays[i].mask_ptr += 1
+            arrays[i].null_count += 1
+        elif buf.size != arr.stride:
+            raise ValueError("Unexpected value size %d for column %s" % (buf.size, desc.colnames[i]))
         else:
             memcopy(buf.ptr, <char *> arr.buf_ptr, buf.size)
+            (<char *> arr.mask_ptr)[0] = 0
+            arrays[i].mask_ptr += 1
 
         # Update the pointer into the array for the next time
         arrays[i].buf_ptr += arr.stride
@@ -161,6 +267,27 @@ cdef inline int unpack_row(
     return 0
 
 
+cdef inline int append_varlen(VarBuf *varbuf, Buffer *buf) except -1:
+    """
+    Append a value to the data buffer of a VARLEN column, growing it as needed.
+    """
+    cdef Py_ssize_t size = varbuf.size + buf.size
+    cdef Py_ssize_t capacity
+    cdef char *data
+
+    if size > varbuf.capacity:
+        capacity = max(size, 2 * varbuf.capacity, 256)
+        data = <char *> realloc(varbuf.data, capacity)
+        if data == NULL:
+            raise MemoryError()
+        varbuf.data = data
+        varbuf.capacity = capacity
+
+    memcpy(varbuf.data + varbuf.size, buf.ptr, buf.size)
+    varbuf.size = size
+    return 0
+
+
 cdef inline void memcopy(char *src, char *dst, Py_ssize_t size):
     """
     Our own simple memcopy which can be inlined. This is useful because our data types
@@ -171,15 +298,37 @@ cdef inline void memcopy(char *src, char *dst, Py_ssize_t size):
         dst[i] = src[i]
 
 
+cdef make_varlen_column(coltype, offsets, mask, VarBuf *varbuf):
+    """
+    Copy the data buffer of a VARLEN column into a VarlenColumn.
+    """
+    data = np.empty((varbuf.size,), dtype=np.uint8)
+    if varbuf.size:
+        memcpy(<char *> <Py_uintptr_t> data.ctypes.data, varbuf.data, varbuf.size)
+    return VarlenColumn(offsets, data, mask, is_text=coltype in _text_cqltypes)
+
+
+def make_native_column(coltype, arr, mask, null_count):
+    """
+    Convert a parsed array to its final dtype, masking any NULL values.
+    """
+    arr = make_native_byteorder(arr)
+    if coltype in _datetime_cqltypes and arr.dtype.kind == 'i':
+        arr = arr.view('datetime64[ms]')
+    if null_count:
+        arr = np.ma.MaskedArray(arr, mask=mask)
+    return arr
+
+
 def make_native_byteorder(arr):
     """
     Make sure all values have a native endian in the NumPy arrays.
     """
-    if is_little_endian and not arr.dtype.kind == 'O':
+    if is_little_endian and arr.dtype.byteorder == '>':
         # We have arrays in big-endian order. First swap the bytes
         # into little endian order, and then update the numpy dtype
         # accordingly (e.g. from '>i8' to '<i8')
         #
-        # Ignore any object arrays of dtype('O')
+        # Ignore any arrays without a byte order, e.g. dtype('O') or dtype('?')
         return arr.byteswap().newbyteorder()
     return arr
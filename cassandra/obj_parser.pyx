@@ -14,38 +14,98 @@
 
 include "ioutils.pyx"
 
+from cpython.dict cimport PyDict_SetItem
+from cpython.object cimport PyObject_SetAttr
+
 from cassandra.bytesio cimport BytesIOReader
 from cassandra.deserializers cimport Deserializer, from_binary
 from cassandra.parsing cimport ParseDesc, ColumnParser, RowParser
 from cassandra.tuple cimport tuple_new, tuple_set
 
+import six
+from six.moves import intern
+
 
 cdef class ListParser(ColumnParser):
-    """Decode a ResultMessage into a list of tuples (or other objects)"""
+    """
+    Decode a ResultMessage into a list of tuples (or other objects)
+
+    `row_parser_factory` is called with the column names of each result to
+    create the :class:`RowParser` building the rows; rows are tuples by
+    default.
+    """
+
+    cdef object row_parser_factory
+
+    def __init__(self, row_parser_factory=None):
+        self.row_parser_factory = row_parser_factory
+
+    def with_row_factory(self, row_factory):
+        """
+        Returns a parser building the rows of `row_factory` directly, or
+        None if the row factory is not supported.
+        """
+        row_parser_factory = compiled_row_parser_factory(row_factory)
+        if row_parser_factory is not None:
+            return type(self)(row_parser_factory)
 
     cpdef parse_rows(self, BytesIOReader reader, ParseDesc desc):
         cdef Py_ssize_t i, rowcount
         rowcount = read_int(reader)
-        cdef RowParser rowparser = TupleRowParser()
+        cdef RowParser rowparser = make_row_parser(self.row_parser_factory, desc)
         return [rowparser.unpack_row(reader, desc) for i in range(rowcount)]
 
 
-cdef class LazyParser(ColumnParser):
+cdef class LazyParser(ListParser):
     """Decode a ResultMessage lazily using a generator"""
 
     cpdef parse_rows(self, BytesIOReader reader, ParseDesc desc):
         # Use a little helper function as closures (generators) are not
         # supported in cpdef methods
-        return parse_rows_lazy(reader, desc)
+        return parse_rows_lazy(reader, desc, make_row_parser(self.row_parser_factory, desc))
 
 
-def parse_rows_lazy(BytesIOReader reader, ParseDesc desc):
+def parse_rows_lazy(BytesIOReader reader, ParseDesc desc, RowParser rowparser=None):
     cdef Py_ssize_t i, rowcount
     rowcount = read_int(reader)
-    cdef RowParser rowparser = TupleRowParser()
+    if rowparser is None:
+        rowparser = TupleRowParser()
     return (rowparser.unpack_row(reader, desc) for i in range(rowcount))
 
 
+cdef RowParser make_row_parser(row_parser_factory, ParseDesc desc):
+    if row_parser_factory is None:
+        return TupleRowParser()
+    return row_parser_factory(desc.colnames)
+
+
+def compiled_row_parser_factory(row_factory):
+    """
+    Map a row factory from :mod:`cassandra.query` to a function creating
+    the equivalent :class:`RowParser` for a list of column names, or return
+    None if rows of that factory cannot be built by the parser.
+    """
+    from cassandra import query
+
+    if row_factory is query.named_tuple_factory:
+        return lambda colnames: NamedTupleRowParser(query._get_row_class(colnames))
+    elif row_factory is query.dict_factory:
+        return DictRowParser
+    elif row_factory is query.ordered_dict_factory:
+        return lambda colnames: DictRowParser(colnames, query.OrderedDict)
+
+    row_class = getattr(row_factory, 'row_class', None)
+    if row_class is not None:
+        return lambda colnames: AttributeRowParser(
+            row_class, [query._clean_column_name(name) for name in colnames])
+
+
+cdef tuple intern_names(names):
+    if six.PY3:
+        return tuple([intern(name) for name in names])
+    return tuple(names)
+
+
 cdef class TupleRowParser(RowParser):
     """
     Parse a single returned row into a tuple of objects:
@@ -73,3 +133,80 @@ cdef class TupleRowParser(RowParser):
             tuple_set(res, i, val)
 
         return res
+
+
+cdef class NamedTupleRowParser(TupleRowParser):
+    """
+    Parse a single returned row into an instance of a namedtuple class
+    """
+
+    cdef object row_class
+
+    def __init__(self, row_class):
+        self.row_class = row_class
+
+    cpdef unpack_row(self, BytesIOReader reader, ParseDesc desc):
+        return tuple.__new__(self.row_class, TupleRowParser.unpack_row(self, reader, desc))
+
+
+cdef class DictRowParser(RowParser):
+    """
+    Parse a single returned row into a dict (or a `dict_class` instance)
+    keyed by column name. Keys are interned once per result.
+    """
+
+    cdef tuple keys
+    cdef object dict_class
+
+    def __init__(self, colnames, dict_class=dict):
+        self.keys = intern_names(colnames)
+        self.dict_class = dict_class
+
+    cpdef unpack_row(self, BytesIOReader reader, ParseDesc desc):
+        cdef Buffer buf
+        cdef Py_ssize_t i, rowsize = desc.rowsize
+        cdef Deserializer deserializer
+        cdef dict res
+
+        if self.dict_class is dict:
+            res = {}
+            for i in range(rowsize):
+                get_buf(reader, &buf)
+                deserializer = desc.deserializers[i]
+                PyDict_SetItem(res, self.keys[i],
+                               from_binary(deserializer, &buf, desc.protocol_version))
+            return res
+
+        row = self.dict_class()
+        for i in range(rowsize):
+            get_buf(reader, &buf)
+            deserializer = desc.deserializers[i]
+            row[self.keys[i]] = from_binary(deserializer, &buf, desc.protocol_version)
+        return row
+
+
+cdef class AttributeRowParser(RowParser):
+    """
+    Parse a single returned row into an instance of `row_class`, setting one
+    attribute per column (e.g. a class with matching ``__slots__``).
+    """
+
+    cdef object row_class
+    cdef tuple names
+
+    def __init__(self, row_class, names):
+        self.row_class = row_class
+        self.names = intern_names(names)
+
+    cpdef unpack_row(self, BytesIOReader reader, ParseDesc desc):
+        cdef Buffer buf
+        cdef Py_ssize_t i, rowsize = desc.rowsize
+        cdef Deserializer deserializer
+
+        row = self.row_class.__new__(self.row_class)
+        for i in range(rowsize):
+            get_buf(reader, &buf)
+            deserializer = desc.deserializers[i]
+            PyObject_SetAttr(row, self.names[i],
+                             from_binary(deserializer, &buf, desc.protocol_version))
+        return row
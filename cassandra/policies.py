@@ -14,7 +14,7 @@
 
 from itertools import islice, cycle, groupby, repeat
 import logging
-from random import randint
+from random import randint, shuffle
 from threading import Lock
 import six
 
@@ -318,20 +318,40 @@ class TokenAwarePolicy(LoadBalancingPolicy):
     This alters the child policy's behavior so that it first attempts to
     send queries to :attr:`~.HostDistance.LOCAL` replicas (as determined
     by the child policy) based on the :class:`.Statement`'s
-    :attr:`~.Statement.routing_key`.  Once those hosts are exhausted, the
+    :attr:`~.Statement.routing_key` (or :attr:`~.Statement.routing_token`,
+    for token range queries).  Once those hosts are exhausted, the
     remaining hosts in the child policy's query plan will be used.
 
-    If no :attr:`~.Statement.routing_key` is set on the query, the child
-    policy's query plan will be used as is.
+    If neither is set on the query, the child policy's query plan will be
+    used as is.
     """
 
     _child_policy = None
     _cluster_metadata = None
+    _cluster = None
 
-    def __init__(self, child_policy):
+    shuffle_replicas = False
+    """
+    If :const:`True`, the local replicas for a query are yielded in a
+    random order instead of ring order, spreading the coordinator load of
+    hot partitions across all of their replicas.
+    """
+
+    power_of_two_choices = False
+    """
+    If :const:`True`, two of the local replicas are picked at random and the
+    one with fewer requests in flight across all sessions of the
+    :class:`.Cluster` is tried first ("power of two choices"). The remaining
+    replicas follow in random order. This implies :attr:`.shuffle_replicas`.
+    """
+
+    def __init__(self, child_policy, shuffle_replicas=False, power_of_two_choices=False):
         self._child_policy = child_policy
+        self.shuffle_replicas = shuffle_replicas
+        self.power_of_two_choices = power_of_two_choices
 
     def populate(self, cluster, hosts):
+        self._cluster = cluster
         self._cluster_metadata = cluster.metadata
         self._child_policy.populate(cluster, hosts)
 
@@ -359,15 +379,17 @@ class TokenAwarePolicy(LoadBalancingPolicy):
                 yield host
         else:
             routing_key = query.routing_key
-            if routing_key is None or keyspace is None:
+            routing_token = query.routing_token
+            if (routing_key is None and routing_token is None) or keyspace is None:
                 for host in child.make_query_plan(keyspace, query):
                     yield host
             else:
-                replicas = self._cluster_metadata.get_replicas(keyspace, routing_key)
-                for replica in replicas:
-                    if replica.is_up and \
-                            child.distance(replica) == HostDistance.LOCAL:
-                        yield replica
+                if routing_token is not None:
+                    replicas = self._token_replicas(keyspace, routing_token)
+                else:
+                    replicas = self._cluster_metadata.get_replicas(keyspace, routing_key)
+                for replica in self._order_local_replicas(replicas):
+                    yield replica
 
                 for host in child.make_query_plan(keyspace, query):
                     # skip if we've already listed this host
@@ -375,6 +397,38 @@ class TokenAwarePolicy(LoadBalancingPolicy):
                             child.distance(host) == HostDistance.REMOTE:
                         yield host
 
+    def _token_replicas(self, keyspace, token):
+        token_map = self._cluster_metadata.token_map
+        if not token_map:
+            return []
+        return token_map.get_replicas(keyspace, token)
+
+    def _order_local_replicas(self, replicas):
+        child = self._child_policy
+        local_replicas = [r for r in replicas
+                          if r.is_up and child.distance(r) == HostDistance.LOCAL]
+        if len(local_replicas) < 2:
+            return local_replicas
+
+        if self.shuffle_replicas or self.power_of_two_choices:
+            shuffle(local_replicas)
+
+        if self.power_of_two_choices:
+            first, second = local_replicas[0], local_replicas[1]
+            if self._in_flight(second) < self._in_flight(first):
+                local_replicas[0], local_replicas[1] = second, first
+
+        return local_replicas
+
+    def _in_flight(self, host):
+        in_flight = 0
+        # a snapshot, as sessions can be added or collected concurrently
+        for session in list(self._cluster.sessions):
+            pool = session._pools.get(host)
+            if pool:
+                in_flight += sum(c.in_flight for c in pool.get_connections())
+        return in_flight
+
     def on_up(self, *args, **kwargs):
         return self._child_policy.on_up(*args, **kwargs)
 
@@ -474,6 +528,114 @@ class SimpleConvictionPolicy(ConvictionPolicy):
         pass
 
 
+class ConcurrencyLimiter(object):
+    """
+    A policy which bounds how many requests a :class:`.Session` may have in
+    flight against a single host at any time.  One instance is created per
+    host and session, through :attr:`.Cluster.concurrency_limiter_factory`.
+
+    When the limit is reached, the host is skipped for that request as if
+    all of its connections were busy: the next host in the query plan is
+    tried (or the request is queued, see :attr:`.Session.max_request_queue_size`).
+
+    If custom behavior is needed, this class may be subclassed.
+    """
+
+    limit = None
+    """
+    The current maximum number of requests in flight.
+    """
+
+    in_flight = 0
+    """
+    The number of requests currently in flight under this limiter.
+    """
+
+    def __init__(self, host):
+        """
+        `host` is an instance of :class:`.Host`.
+        """
+        self.host = host
+
+    def try_acquire(self):
+        """
+        Implementations should return :const:`True` and count the request as
+        in flight if another request may be sent to the host, or return
+        :const:`False` otherwise.
+        """
+        raise NotImplementedError()
+
+    def release(self, latency=None, dropped=False):
+        """
+        Called when a request acquired through :meth:`.try_acquire()`
+        completes.  `latency` is the response time in seconds, or :const:`None`
+        if the request was never sent.  `dropped` is :const:`True` if the host
+        signaled that it is overloaded (overloaded errors and server-side
+        timeouts).
+        """
+        raise NotImplementedError()
+
+
+class AIMDConcurrencyLimiter(ConcurrencyLimiter):
+    """
+    A :class:`.ConcurrencyLimiter` which adapts the limit using additive
+    increase, multiplicative decrease (AIMD), like TCP congestion control.
+
+    While the limit is being used, every response grows it by ``1 / limit``
+    (about one request per round trip of the whole window).  Every dropped
+    request, and every response slower than `latency_threshold`, shrinks it
+    by `backoff_ratio`.  Under overload this keeps the number of requests
+    queued on the host, and therefore latency, bounded.
+    """
+
+    def __init__(self, host, initial_limit=128, min_limit=8, max_limit=1024,
+                 backoff_ratio=0.9, latency_threshold=None):
+        """
+        `initial_limit`, `min_limit` and `max_limit` bound the number of
+        requests in flight to the host.
+
+        `backoff_ratio` is the factor applied to the limit on each drop; it
+        must be between 0 and 1.
+
+        `latency_threshold`, in seconds, treats slower responses as drops.
+        If left as :const:`None`, only overloaded errors and server-side
+        timeouts shrink the limit.
+        """
+        ConcurrencyLimiter.__init__(self, host)
+        if not 0 < min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 0 < min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1")
+
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+        self._lock = Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, dropped=False):
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+
+            if not dropped and self.latency_threshold is not None and latency is not None:
+                dropped = latency > self.latency_threshold
+
+            if dropped:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            elif latency is not None and in_flight * 2 >= self.limit:
+                # only grow while the limit is actually in use
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+
 class ReconnectionPolicy(object):
     """
     This class and its subclasses govern how frequently an attempt is made
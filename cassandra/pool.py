@@ -16,6 +16,7 @@
 Connection pooling and host management.
 """
 
+from functools import partial
 import logging
 import socket
 import time
@@ -262,11 +263,20 @@ class _HostReconnectionHandler(_ReconnectionHandler):
             return True
 
 
+def _make_limiter(host, session):
+    factory = session.cluster.concurrency_limiter_factory
+    return factory(host) if factory is not None else None
+
+
 class HostConnection(object):
     """
     When using v3 of the native protocol, this is used instead of a connection
     pool per host (HostConnectionPool) due to the increased in-flight capacity
     of individual connections.
+
+    A fixed number of connections is opened to the host (one by default; see
+    :meth:`.Cluster.set_connections_per_host`). Requests are sent over the
+    connection with the fewest requests in flight.
     """
 
     host = None
@@ -274,15 +284,20 @@ class HostConnection(object):
     is_shutdown = False
 
     _session = None
-    _connection = None
+    _connections = None
+    _trash = None
     _lock = None
+    limiter = None
 
     def __init__(self, host, host_distance, session):
         self.host = host
         self.host_distance = host_distance
         self._session = weakref.proxy(session)
         self._lock = Lock()
-        self._is_replacing = False
+        self._connections = []
+        self._trash = set()
+        self._scheduled_for_creation = 0
+        self.limiter = _make_limiter(host, session)
 
         if host_distance == HostDistance.IGNORED:
             log.debug("Not opening connection to ignored host %s", self.host)
@@ -292,9 +307,19 @@ class HostConnection(object):
             return
 
         log.debug("Initializing connection for host %s", self.host)
-        self._connection = session.cluster.connection_factory(host.address)
-        if session.keyspace:
-            self._connection.set_keyspace_blocking(session.keyspace)
+        num_conns = session.cluster.get_connections_per_host(host_distance)
+        connections = []
+        try:
+            for i in range(num_conns):
+                connections.append(session.cluster.connection_factory(host.address))
+            if session.keyspace:
+                for conn in connections:
+                    conn.set_keyspace_blocking(session.keyspace)
+        except Exception:
+            for conn in connections:
+                conn.close()
+            raise
+        self._connections = connections
         log.debug("Finished initializing connection for host %s", self.host)
 
     def borrow_connection(self, timeout):
@@ -302,10 +327,15 @@ class HostConnection(object):
             raise ConnectionException(
                 "Pool for %s is shutdown" % (self.host,), self.host)
 
-        conn = self._connection
-        if not conn:
+        conns = self._connections
+        if not conns:
             raise NoConnectionsAvailable()
 
+        if len(conns) == 1:
+            conn = conns[0]
+        else:
+            conn = min(conns, key=lambda c: c.in_flight)
+
         with conn.lock:
             if conn.in_flight < conn.max_request_id:
                 conn.in_flight += 1
@@ -317,6 +347,12 @@ class HostConnection(object):
         with connection.lock:
             connection.in_flight -= 1
 
+        self._session._on_request_slot_available()
+
+        if self._trash and connection in self._trash:
+            self._close_if_idle(connection)
+            return
+
         if (connection.is_defunct or connection.is_closed) and not connection.signaled_error:
             log.debug("Defunct or closed connection (%s) returned to pool, potentially "
                       "marking host %s as down", id(connection), self.host)
@@ -326,21 +362,95 @@ class HostConnection(object):
             if is_down:
                 self.shutdown()
             else:
-                self._connection = None
                 with self._lock:
-                    if self._is_replacing:
+                    if connection not in self._connections:
+                        # a replacement has already been scheduled
                         return
-                    self._is_replacing = True
-                    self._session.submit(self._replace, connection)
+                    new_connections = self._connections[:]
+                    new_connections.remove(connection)
+                    self._connections = new_connections
+                    self._scheduled_for_creation += 1
+                self._session.submit(self._replace, connection)
 
-    def _replace(self, connection):
+    def _replace(self, connection, schedule=None):
         log.debug("Replacing connection (%s) to %s", id(connection), self.host)
+        if not self._try_add_connection() and not self.is_shutdown:
+            # try again later rather than staying below the configured size
+            if schedule is None:
+                schedule = iter(self._session.cluster.reconnection_policy.new_schedule())
+            delay = next(schedule, None)
+            if delay is not None:
+                self._session.cluster.connection_class.create_timer(
+                    delay, partial(self._session.submit, self._replace, connection, schedule))
+                return
+
+        with self._lock:
+            self._scheduled_for_creation -= 1
+
+    def _add_connection(self):
         conn = self._session.cluster.connection_factory(self.host.address)
         if self._session.keyspace:
             conn.set_keyspace_blocking(self._session.keyspace)
-        self._connection = conn
         with self._lock:
-            self._is_replacing = False
+            if self.is_shutdown:
+                close = True
+            else:
+                close = False
+                self._connections = self._connections[:] + [conn]
+        if close:
+            conn.close()
+
+    def ensure_core_connections(self):
+        if self.is_shutdown:
+            return
+        if self.host_distance == HostDistance.IGNORED or \
+                (self.host_distance == HostDistance.REMOTE and not self._session.cluster.connect_to_remote_hosts):
+            return
+
+        num_conns = self._session.cluster.get_connections_per_host(self.host_distance)
+        extra = []
+        with self._lock:
+            to_create = num_conns - (len(self._connections) + self._scheduled_for_creation)
+            for i in range(to_create):
+                self._scheduled_for_creation += 1
+                self._session.submit(self._create_new_connection)
+            if to_create < 0 and len(self._connections) > num_conns:
+                # the least busy connections are closed once their requests complete
+                by_load = sorted(self._connections, key=lambda c: c.in_flight)
+                extra = by_load[:len(self._connections) - num_conns]
+                self._connections = by_load[len(extra):]
+                self._trash.update(extra)
+
+        for conn in extra:
+            log.debug("Closing extra connection (%s) to %s", id(conn), self.host)
+            self._close_if_idle(conn)
+
+    def _close_if_idle(self, connection):
+        with connection.lock:
+            if connection.in_flight > 0:
+                return
+        with self._lock:
+            if connection not in self._trash:
+                return
+            self._trash.remove(connection)
+        connection.close()
+
+    def _create_new_connection(self):
+        try:
+            self._try_add_connection()
+        finally:
+            with self._lock:
+                self._scheduled_for_creation -= 1
+
+    def _try_add_connection(self):
+        try:
+            self._add_connection()
+            return True
+        except (ConnectionException, socket.error) as exc:
+            log.warning("Failed to create new connection to %s: %s", self.host, exc)
+        except Exception:
+            log.exception("Unexpectedly failed to create new connection")
+        return False
 
     def shutdown(self):
         with self._lock:
@@ -349,34 +459,49 @@ class HostConnection(object):
             else:
                 self.is_shutdown = True
 
-        if self._connection:
-            self._connection.close()
+        for conn in self._connections:
+            conn.close()
+        for conn in list(self._trash):
+            conn.close()
 
     def _set_keyspace_for_all_conns(self, keyspace, callback):
-        if self.is_shutdown or not self._connection:
+        """
+        Asynchronously sets the keyspace for all connections.  When all
+        connections have been set, `callback` will be called with two
+        arguments: this pool, and a list of any errors that occurred.
+        """
+        if self.is_shutdown or not self._connections:
             return
 
+        remaining_callbacks = set(self._connections)
+        errors = []
+
         def connection_finished_setting_keyspace(conn, error):
             self.return_connection(conn)
-            errors = [] if not error else [error]
-            callback(self, errors)
+            remaining_callbacks.remove(conn)
+            if error:
+                errors.append(error)
 
-        self._connection.set_keyspace_async(keyspace, connection_finished_setting_keyspace)
+            if not remaining_callbacks:
+                callback(self, errors)
+
+        for conn in self._connections:
+            conn.set_keyspace_async(keyspace, connection_finished_setting_keyspace)
 
     def get_connections(self):
-        c = self._connection
-        return [c] if c else []
+        return self._connections
 
     def get_state(self):
-        connection = self._connection
-        open_count = 1 if connection and not (connection.is_closed or connection.is_defunct) else 0
-        in_flights = [connection.in_flight] if connection else []
-        return {'shutdown': self.is_shutdown, 'open_count': open_count, 'in_flights': in_flights}
+        connections = self._connections
+        in_flights = [c.in_flight for c in connections]
+        state = {'shutdown': self.is_shutdown, 'open_count': self.open_count, 'in_flights': in_flights}
+        if self.limiter is not None:
+            state['concurrency_limit'] = int(self.limiter.limit)
+        return state
 
     @property
     def open_count(self):
-        connection = self._connection
-        return 1 if connection and not (connection.is_closed or connection.is_defunct) else 0
+        return sum(1 for c in self._connections if not (c.is_closed or c.is_defunct))
 
 _MAX_SIMULTANEOUS_CREATION = 1
 _MIN_TRASH_INTERVAL = 10
@@ -394,6 +519,7 @@ class HostConnectionPool(object):
     open_count = 0
     _scheduled_for_creation = 0
     _next_trash_allowed_at = 0
+    limiter = None
 
     def __init__(self, host, host_distance, session):
         self.host = host
@@ -402,6 +528,7 @@ class HostConnectionPool(object):
         self._session = weakref.proxy(session)
         self._lock = RLock()
         self._conn_available_condition = Condition()
+        self.limiter = _make_limiter(host, session)
 
         log.debug("Initializing new connection pool for host %s", self.host)
         core_conns = session.cluster.get_core_connections_per_host(host_distance)
@@ -573,6 +700,8 @@ class HostConnectionPool(object):
             connection.in_flight -= 1
             in_flight = connection.in_flight
 
+        self._session._on_request_slot_available()
+
         if connection.is_defunct or connection.is_closed:
             if not connection.signaled_error:
                 log.debug("Defunct or closed connection (%s) returned to pool, potentially "
@@ -713,4 +842,7 @@ class HostConnectionPool(object):
 
     def get_state(self):
         in_flights = [c.in_flight for c in self._connections]
-        return {'shutdown': self.is_shutdown, 'open_count': self.open_count, 'in_flights': in_flights}
+        state = {'shutdown': self.is_shutdown, 'open_count': self.open_count, 'in_flights': in_flights}
+        if self.limiter is not None:
+            state['concurrency_limit'] = int(self.limiter.limit)
+        return state
@@ -88,6 +88,7 @@ class _MessageType(object):
     tracing = False
     custom_payload = None
     warnings = None
+    body_size = None
 
     def update_custom_payload(self, other):
         if other:
@@ -959,6 +960,7 @@ class ProtocolHandler(object):
             body = decompressor(body)
             flags ^= COMPRESSED_FLAG
 
+        body_size = len(body)
         body = io.BytesIO(body)
         if flags & TRACING_FLAG:
             trace_id = UUID(bytes=body.read(16))
@@ -987,6 +989,7 @@ class ProtocolHandler(object):
         msg.trace_id = trace_id
         msg.custom_payload = custom_payload
         msg.warnings = warnings
+        msg.body_size = body_size
 
         if msg.warnings:
             for w in msg.warnings:
@@ -1011,6 +1014,10 @@ def cython_protocol_handler(colparser):
         - numpy_parser.NumPyParser
             decodes result messages into NumPy arrays
 
+        - numpy_parser.NumPyParser(columnar=True)
+            decodes result messages into native NumPy arrays for most types,
+            see cassandra.columnar
+
     The default is to use obj_parser.ListParser
     """
     from cassandra.row_parser import make_recv_results_rows
@@ -1033,6 +1040,31 @@ def cython_protocol_handler(colparser):
         my_opcodes[FastResultMessage.opcode] = FastResultMessage
         message_types_by_opcode = my_opcodes
 
+        _row_factory_handlers = {}
+
+        @classmethod
+        def for_row_factory(cls, row_factory):
+            """
+            Returns a protocol handler whose parser builds the rows of
+            `row_factory` directly, or None if the parser does not support
+            that row factory. Rows decoded by the returned handler must
+            not be passed through `row_factory` again.
+            """
+            key = getattr(row_factory, 'row_class', row_factory)
+            try:
+                return cls._row_factory_handlers[key]
+            except KeyError:
+                pass
+
+            handler = None
+            with_row_factory = getattr(colparser, 'with_row_factory', None)
+            if with_row_factory is not None:
+                row_parser = with_row_factory(row_factory)
+                if row_parser is not None:
+                    handler = cython_protocol_handler(row_parser)
+            cls._row_factory_handlers[key] = handler
+            return handler
+
     return CythonProtocolHandler
 
 
@@ -1048,8 +1080,10 @@ else:
 if HAVE_CYTHON and HAVE_NUMPY:
     from cassandra.numpy_parser import NumpyParser
     NumpyProtocolHandler = cython_protocol_handler(NumpyParser())
+    ColumnarProtocolHandler = cython_protocol_handler(NumpyParser(columnar=True))
 else:
     NumpyProtocolHandler = None
+    ColumnarProtocolHandler = None
 
 
 def read_byte(f):
@@ -22,6 +22,7 @@ from collections import namedtuple
 from datetime import datetime, timedelta
 import re
 import struct
+from threading import Lock
 import time
 import six
 from six.moves import range, zip
@@ -30,7 +31,7 @@ from cassandra import ConsistencyLevel, OperationTimedOut
 from cassandra.util import unix_time_from_uuid1
 from cassandra.encoder import Encoder
 import cassandra.encoder
-from cassandra.protocol import _UNSET_VALUE
+from cassandra.protocol import _UNSET_VALUE, ProtocolHandler
 from cassandra.util import OrderedDict
 
 import logging
@@ -55,6 +56,34 @@ END_BADCHAR_REGEX = re.compile('[^a-zA-Z0-9_]*$')
 
 _clean_name_cache = {}
 
+_STRING_LITERAL_REGEX = re.compile(r"'(?:[^']|'')*'|\$\$.*?\$\$", re.DOTALL)
+_WRITE_REGEX = re.compile(r'^\s*(INSERT|UPDATE|DELETE|BEGIN)\b', re.IGNORECASE)
+_NON_IDEMPOTENT_REGEXES = [
+    # lightweight transactions
+    re.compile(r'\bIF\b', re.IGNORECASE),
+    # counter updates and list appends, but not set or map updates: c = c + 1, l = l + [x]
+    re.compile(r'(?<![\w"])("?\w+"?)\s*=\s*\1\s*[-+](?!\s*\{)'),
+    # list prepends: l = [x] + l
+    re.compile(r'=\s*(\[[^\]]*\]|\?|:\w+|%s|%\(\w+\)s)\s*\+'),
+    # list elements removed by index
+    re.compile(r'^\s*DELETE\s[^;]*?\[[^;]*?\bFROM\b', re.IGNORECASE),
+    # values differing at each execution
+    re.compile(r'\b(now|uuid|currenttimestamp|currenttimeuuid|currentdate|currenttime)\s*\(', re.IGNORECASE)
+]
+
+
+def _is_idempotent_query(query_string):
+    """
+    Infers whether `query_string` can be applied more than once with the
+    same effect, erring on the side of :const:`False`.
+    """
+    query_string = _STRING_LITERAL_REGEX.sub("''", query_string)
+    if query_string.lstrip()[:6].upper() == 'SELECT':
+        return True
+    if not _WRITE_REGEX.match(query_string):
+        return False
+    return not any(regex.search(query_string) for regex in _NON_IDEMPOTENT_REGEXES)
+
 
 def _clean_column_name(name):
     try:
@@ -65,6 +94,48 @@ def _clean_column_name(name):
         return clean
 
 
+_ROW_CLASS_CACHE_SIZE = 256
+_row_class_cache = OrderedDict()
+_row_class_cache_lock = Lock()
+
+
+def _get_row_class(colnames):
+    """
+    Returns the namedtuple ``Row`` class for the given column names.
+
+    Creating a namedtuple class compiles a new type, which costs far more
+    than building the rows of a small result page, so classes are kept in
+    an LRU cache keyed by the column names.
+    """
+    key = tuple(colnames)
+    with _row_class_cache_lock:
+        try:
+            Row = _row_class_cache.pop(key)
+        except KeyError:
+            pass
+        else:
+            _row_class_cache[key] = Row  # most recently used goes last
+            return Row
+
+    clean_column_names = [_clean_column_name(name) for name in key]
+    try:
+        Row = namedtuple('Row', clean_column_names)
+    except Exception:
+        log.warning("Failed creating named tuple for results with column names %s (cleaned: %s) "
+                    "(see Python 'namedtuple' documentation for details on name rules). "
+                    "Results will be returned with positional names. "
+                    "Avoid this by choosing different names, using SELECT \"<col name>\" AS aliases, "
+                    "or specifying a different row_factory on your Session" %
+                    (colnames, clean_column_names))
+        Row = namedtuple('Row', clean_column_names, rename=True)
+
+    with _row_class_cache_lock:
+        Row = _row_class_cache.setdefault(key, Row)
+        while len(_row_class_cache) > _ROW_CLASS_CACHE_SIZE:
+            _row_class_cache.popitem(last=False)
+    return Row
+
+
 def tuple_factory(colnames, rows):
     """
     Returns each row as a tuple
@@ -112,20 +183,18 @@ def named_tuple_factory(colnames, rows):
 
     .. versionchanged:: 2.0.0
         moved from ``cassandra.decoder`` to ``cassandra.query``
-    """
-    clean_column_names = map(_clean_column_name, colnames)
-    try:
-        Row = namedtuple('Row', clean_column_names)
-    except Exception:
-        log.warning("Failed creating named tuple for results with column names %s (cleaned: %s) "
-                    "(see Python 'namedtuple' documentation for details on name rules). "
-                    "Results will be returned with positional names. "
-                    "Avoid this by choosing different names, using SELECT \"<col name>\" AS aliases, "
-                    "or specifying a different row_factory on your Session" %
-                    (colnames, clean_column_names))
-        Row = namedtuple('Row', clean_column_names, rename=True)
 
-    return [Row(*row) for row in rows]
+    ``Row`` classes are cached by column names, so the same class is shared
+    by all pages and queries selecting the same columns.
+
+    If `rows` is an iterator rather than a sequence (e.g. when using
+    :ref:`LazyProtocolHandler <faster_deser>`), the rows are returned as
+    a generator, which builds each row only as it is consumed.
+    """
+    make_row = _get_row_class(colnames)._make
+    if iter(rows) is rows:
+        return (make_row(row) for row in rows)
+    return [make_row(row) for row in rows]
 
 
 def dict_factory(colnames, rows):
@@ -141,9 +210,14 @@ def dict_factory(colnames, rows):
         >>> print rows[0]
         {u'age': 42, u'name': u'Bob'}
 
+    Like :meth:`~cassandra.query.named_tuple_factory`, this returns a
+    generator if `rows` is an iterator.
+
     .. versionchanged:: 2.0.0
         moved from ``cassandra.decoder`` to ``cassandra.query``
     """
+    if iter(rows) is rows:
+        return (dict(zip(colnames, row)) for row in rows)
     return [dict(zip(colnames, row)) for row in rows]
 
 
@@ -155,9 +229,47 @@ def ordered_dict_factory(colnames, rows):
     .. versionchanged:: 2.0.0
         moved from ``cassandra.decoder`` to ``cassandra.query``
     """
+    if iter(rows) is rows:
+        return (OrderedDict(zip(colnames, row)) for row in rows)
     return [OrderedDict(zip(colnames, row)) for row in rows]
 
 
+def class_factory(row_class):
+    """
+    Returns a row factory which returns each row as an instance of
+    `row_class`, with one attribute per column.  `row_class` is created
+    without calling its ``__init__``; it is typically a small class with
+    ``__slots__`` named after the columns.  Column names are cleaned up
+    like for :meth:`~cassandra.query.named_tuple_factory`.
+
+    Example::
+
+        >>> from cassandra.query import class_factory
+        >>> class User(object):
+        ...     __slots__ = ('name', 'age')
+        >>> session.row_factory = class_factory(User)
+        >>> rows = session.execute("SELECT name, age FROM users LIMIT 1")
+        >>> print rows[0].name
+        Bob
+    """
+    def factory(colnames, rows):
+        names = [_clean_column_name(name) for name in colnames]
+        new = row_class.__new__
+
+        def make_row(row):
+            obj = new(row_class)
+            for name, value in zip(names, row):
+                setattr(obj, name, value)
+            return obj
+
+        if iter(rows) is rows:
+            return (make_row(row) for row in rows)
+        return [make_row(row) for row in rows]
+
+    factory.row_class = row_class
+    return factory
+
+
 FETCH_SIZE_UNSET = object()
 
 
@@ -226,12 +338,29 @@ class Statement(object):
     .. versionadded:: 2.6.0
     """
 
+    paging_state = None
+    """
+    The :attr:`~.ResponseFuture.paging_state` to resume this query from, as
+    saved from an earlier execution of the same query.  Defaults to
+    :const:`None`, which starts from the first page.  The `paging_state`
+    argument of :meth:`.Session.execute()` takes precedence over this.
+    """
+
+    routing_token = None
+    """
+    A :class:`~.Token` used to find the replicas for this query instead of
+    :attr:`.routing_key`, for queries selecting a range of tokens rather
+    than a partition.  Replicas are those owning the range that starts at
+    this token.  It is set by :meth:`.Session.scan_table()`.
+    """
+
     _serial_consistency_level = None
     _routing_key = None
+    _is_idempotent = None
 
     def __init__(self, retry_policy=None, consistency_level=None, routing_key=None,
                  serial_consistency_level=None, fetch_size=FETCH_SIZE_UNSET, keyspace=None,
-                 custom_payload=None):
+                 custom_payload=None, paging_state=None, is_idempotent=None):
         self.retry_policy = retry_policy
         if consistency_level is not None:
             self.consistency_level = consistency_level
@@ -244,6 +373,10 @@ class Statement(object):
             self.keyspace = keyspace
         if custom_payload is not None:
             self.custom_payload = custom_payload
+        if paging_state is not None:
+            self.paging_state = paging_state
+        if is_idempotent is not None:
+            self._is_idempotent = is_idempotent
 
     def _get_routing_key(self):
         return self._routing_key
@@ -271,6 +404,39 @@ class Statement(object):
         components should be strings.
         """)
 
+    def _get_is_idempotent(self):
+        if self._is_idempotent is None:
+            return self._infer_idempotence()
+        return self._is_idempotent
+
+    def _set_is_idempotent(self, is_idempotent):
+        self._is_idempotent = is_idempotent
+
+    def _del_is_idempotent(self):
+        self._is_idempotent = None
+
+    is_idempotent = property(
+        _get_is_idempotent,
+        _set_is_idempotent,
+        _del_is_idempotent,
+        """
+        Whether applying this statement more than once has the same effect
+        as applying it once, which makes it safe to retry when its outcome
+        is unknown, such as after a client-side timeout (see
+        :attr:`.Session.idempotent_timeout_retries`).  Retry policies may
+        also check it.
+
+        Unless set, it is inferred from the query: ``SELECT`` queries are
+        idempotent, and so are ``INSERT``, ``UPDATE`` and ``DELETE``
+        queries, unless they are conditional (lightweight transactions),
+        update counters, append, prepend or remove list elements, or call
+        functions such as ``now()`` or ``uuid()``.  Other queries are not.
+        Setting it to :const:`None` reverts to the inferred value.
+        """)
+
+    def _infer_idempotence(self):
+        return False
+
     def _get_serial_consistency_level(self):
         return self._serial_consistency_level
 
@@ -341,6 +507,9 @@ class SimpleStatement(Statement):
     def query_string(self):
         return self._query_string
 
+    def _infer_idempotence(self):
+        return _is_idempotent_query(self._query_string)
+
     def __str__(self):
         consistency = ConsistencyLevel.value_to_name.get(self.consistency_level, 'Not Set')
         return (u'<SimpleStatement query="%s", consistency=%s>' %
@@ -365,6 +534,7 @@ class PreparedStatement(object):
 
     routing_key_indexes = None
     _routing_key_index_set = None
+    _is_idempotent = None
 
     consistency_level = None
     serial_consistency_level = None
@@ -422,6 +592,66 @@ class PreparedStatement(object):
         """
         return BoundStatement(self).bind(values)
 
+    def bind_many(self, values_seq):
+        """
+        Binds each item of `values_seq` and returns a list of
+        :class:`BoundStatement` instances, like calling :meth:`bind()` for
+        each of them.
+
+        The serializers of the columns are looked up once for all items,
+        which makes this faster when binding many rows giving a value for
+        each column, as bulk loads do.  Other items are bound with
+        :meth:`bind()`, whose exceptions are raised.
+        """
+        proto_version = self.protocol_version
+        col_meta = self.column_metadata
+        serializers = [col_spec.type.serialize for col_spec in col_meta]
+        col_meta_len = len(col_meta)
+        # attributes every statement starts from, copied rather than set up
+        # by BoundStatement.__init__() each time
+        template = BoundStatement(self).__dict__
+
+        bound = []
+        for values in values_seq:
+            if isinstance(values, dict) or len(values) != col_meta_len:
+                bound.append(BoundStatement(self).bind(values))
+                continue
+
+            serialized = []
+            try:
+                for value, serialize in zip(values, serializers):
+                    if value is None:
+                        serialized.append(None)
+                    elif value is UNSET_VALUE:
+                        raise TypeError("UNSET_VALUE is checked by bind()")
+                    else:
+                        serialized.append(serialize(value, proto_version))
+            except (TypeError, struct.error):
+                # let bind() handle or report it
+                bound.append(BoundStatement(self).bind(values))
+                continue
+
+            statement = BoundStatement.__new__(BoundStatement)
+            statement.__dict__.update(template)
+            statement.raw_values = values
+            statement.values = serialized
+            bound.append(statement)
+        return bound
+
+    @property
+    def is_idempotent(self):
+        """
+        Like :attr:`.Statement.is_idempotent`, for the statements bound
+        from this one.  Unless set, it is inferred from the query.
+        """
+        if self._is_idempotent is None:
+            self._is_idempotent = _is_idempotent_query(self.query_string or '')
+        return self._is_idempotent
+
+    @is_idempotent.setter
+    def is_idempotent(self, is_idempotent):
+        self._is_idempotent = is_idempotent
+
     def is_routing_key_index(self, i):
         if self._routing_key_index_set is None:
             self._routing_key_index_set = set(self.routing_key_indexes) if self.routing_key_indexes else set()
@@ -556,6 +786,9 @@ class BoundStatement(Statement):
 
         return self
 
+    def _infer_idempotence(self):
+        return self.prepared_statement.is_idempotent
+
     def _append_unset_value(self):
         next_index = len(self.values)
         if self.prepared_statement.is_routing_key_index(next_index):
@@ -653,10 +886,11 @@ class BatchStatement(Statement):
 
     _statements_and_parameters = None
     _session = None
+    _all_idempotent = True
 
     def __init__(self, batch_type=BatchType.LOGGED, retry_policy=None,
                  consistency_level=None, serial_consistency_level=None,
-                 session=None, custom_payload=None):
+                 session=None, custom_payload=None, is_idempotent=None):
         """
         `batch_type` specifies The :class:`.BatchType` for the batch operation.
         Defaults to :attr:`.BatchType.LOGGED`.
@@ -705,7 +939,8 @@ class BatchStatement(Statement):
         self._statements_and_parameters = []
         self._session = session
         Statement.__init__(self, retry_policy=retry_policy, consistency_level=consistency_level,
-                           serial_consistency_level=serial_consistency_level, custom_payload=custom_payload)
+                           serial_consistency_level=serial_consistency_level, custom_payload=custom_payload,
+                           is_idempotent=is_idempotent)
 
     def add(self, statement, parameters=None):
         """
@@ -719,6 +954,7 @@ class BatchStatement(Statement):
             if parameters:
                 encoder = Encoder() if self._session is None else self._session.encoder
                 statement = bind_params(statement, parameters, encoder)
+            self._all_idempotent = self._all_idempotent and _is_idempotent_query(statement)
             self._statements_and_parameters.append((False, statement, ()))
         elif isinstance(statement, PreparedStatement):
             query_id = statement.query_id
@@ -768,6 +1004,10 @@ class BatchStatement(Statement):
     def _update_state(self, statement):
         self._maybe_set_routing_attributes(statement)
         self._update_custom_payload(statement)
+        self._all_idempotent = self._all_idempotent and statement.is_idempotent
+
+    def _infer_idempotence(self):
+        return self._all_idempotent and self.batch_type is not BatchType.COUNTER
 
     def __str__(self):
         consistency = ConsistencyLevel.value_to_name.get(self.consistency_level, 'Not Set')
@@ -919,8 +1159,10 @@ class QueryTrace(object):
     def _execute(self, query, parameters, time_spent, max_wait):
         timeout = (max_wait - time_spent) if max_wait is not None else None
         future = self._session._create_response_future(query, parameters, trace=False, custom_payload=None, timeout=timeout)
-        # in case the user switched the row factory, set it to namedtuple for this query
+        # in case the user switched the row factory or protocol handler, use
+        # namedtuple rows in a list for this query
         future.row_factory = named_tuple_factory
+        future._protocol_handler = ProtocolHandler
         future.send_request()
 
         try:
@@ -0,0 +1,202 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+from uuid import UUID, uuid1
+from mock import Mock
+
+from cassandra import cqltypes
+
+from tests.unit.cython.utils import numpytest, parse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest  # noqa
+
+
+class ColumnarParserTest(unittest.TestCase):
+
+    columns = [('i', cqltypes.Int32Type),
+               ('ts', cqltypes.DateType),
+               ('b', cqltypes.BooleanType),
+               ('u', cqltypes.UUIDType),
+               ('t', cqltypes.UTF8Type),
+               ('bl', cqltypes.BytesType)]
+
+    @numpytest
+    def test_native_types(self):
+        from cassandra.protocol import ColumnarProtocolHandler
+
+        u1, u2 = uuid1(), UUID(int=1)
+        ts = datetime(2015, 10, 1, 12, 30, 15, 250000)
+        rows = [(1, ts, True, u1, u'caf\xe9', b'\x00\x01'),
+                (2, ts, False, u2, u'', b'')]
+        arrays = parse(ColumnarProtocolHandler, self.columns, rows)
+
+        self.assertEqual(list(arrays['i']), [1, 2])
+        self.assertEqual(str(arrays['ts'].dtype), 'datetime64[ms]')
+        self.assertEqual(arrays['ts'][0].astype(datetime), ts)
+        self.assertEqual(arrays['b'].dtype.kind, 'b')
+        self.assertEqual(list(arrays['b']), [True, False])
+        self.assertEqual(arrays['u'].dtype.itemsize, 16)
+        self.assertEqual([UUID(bytes=v.tobytes()) for v in arrays['u']], [u1, u2])
+
+        text = arrays['t']
+        self.assertEqual(list(text.offsets), [0, 5, 5])
+        self.assertEqual(list(text), [u'caf\xe9', u''])
+        self.assertEqual(list(arrays['bl']), [b'\x00\x01', b''])
+
+    @numpytest
+    def test_varlen_nulls(self):
+        from cassandra.protocol import ColumnarProtocolHandler
+
+        columns = [('i', cqltypes.Int32Type), ('t', cqltypes.UTF8Type)]
+        arrays = parse(ColumnarProtocolHandler, columns, [(1, u'a'), (2, None), (3, u'bc')])
+
+        text = arrays['t']
+        self.assertEqual(list(text.mask), [False, True, False])
+        self.assertEqual(list(text.offsets), [0, 1, 1, 3])
+        self.assertEqual(list(text.to_numpy()), [u'a', None, u'bc'])
+
+    @numpytest
+    def test_numpy_handler_unchanged(self):
+        from cassandra.protocol import NumpyProtocolHandler
+
+        ts = datetime(2015, 10, 1)
+        arrays = parse(NumpyProtocolHandler, self.columns[:2], [(1, ts)])
+        self.assertEqual(arrays['ts'].dtype.kind, 'O')
+        self.assertEqual(arrays['ts'][0], ts)
+
+    @numpytest
+    def test_null_masks(self):
+        from cassandra.protocol import ColumnarProtocolHandler, NumpyProtocolHandler
+
+        columns = [('i', cqltypes.Int32Type), ('d', cqltypes.DoubleType), ('t', cqltypes.UTF8Type)]
+        rows = [(1, None, u''), (None, 2.5, None)]
+        for protocol_handler in (ColumnarProtocolHandler, NumpyProtocolHandler):
+            arrays = parse(protocol_handler, columns, rows)
+
+            for name in ('i', 'd'):
+                self.assertTrue(isinstance(arrays[name], np.ma.MaskedArray))
+            self.assertEqual(list(arrays['i'].mask), [False, True])
+            self.assertEqual(list(arrays['i'].data), [1, 0])
+            self.assertEqual(arrays['i'].dtype.kind, 'i')
+            self.assertEqual(arrays['d'].tolist(), [None, 2.5])
+
+        # only columns with NULL values are masked
+        arrays = parse(NumpyProtocolHandler, columns, [(1, 2.5, u'a')])
+        self.assertFalse(isinstance(arrays['i'], np.ma.MaskedArray))
+        self.assertEqual(list(arrays['t']), [u'a'])
+
+    @numpytest
+    def test_concat_pages(self):
+        from cassandra.columnar import concat_pages
+        from cassandra.protocol import ColumnarProtocolHandler
+
+        columns = [('i', cqltypes.Int32Type), ('t', cqltypes.UTF8Type)]
+        pages = [parse(ColumnarProtocolHandler, columns, [(1, u'ab'), (2, None)]),
+                 parse(ColumnarProtocolHandler, columns, []),
+                 parse(ColumnarProtocolHandler, columns, [(3, u'cde')])]
+        arrays = concat_pages(pages)
+
+        self.assertEqual(list(arrays['i']), [1, 2, 3])
+        self.assertEqual(list(arrays['t'].offsets), [0, 2, 2, 5])
+        self.assertEqual(list(arrays['t']), [u'ab', None, u'cde'])
+
+        # pages with and without NULL values
+        pages = [parse(ColumnarProtocolHandler, columns, [(1, u'a')]),
+                 parse(ColumnarProtocolHandler, columns, [(None, u'b')])]
+        arrays = concat_pages(pages)
+        self.assertEqual(arrays['i'].tolist(), [1, None])
+
+    @numpytest
+    def test_concat_large_offsets(self):
+        from cassandra.columnar import _concat_offsets
+
+        # offsets of pages adding up to more than 2 GB
+        page = np.array([0, 2 ** 30, 2 ** 31 - 1], dtype=np.int32)
+        offsets = _concat_offsets([page, page, page], np.int64)
+        self.assertEqual(offsets.dtype, np.int64)
+        end = 2 ** 31 - 1
+        self.assertEqual(list(offsets), [0, 2 ** 30, end, end + 2 ** 30, 2 * end, 2 * end + 2 ** 30, 3 * end])
+
+    @numpytest
+    @unittest.skipUnless(pandas, 'pandas is not available')
+    def test_dataframe_factory(self):
+        from cassandra.columnar import dataframe_factory
+        from cassandra.protocol import ColumnarProtocolHandler
+
+        u = uuid1()
+        columns = [('i', cqltypes.Int32Type), ('d', cqltypes.DoubleType),
+                   ('u', cqltypes.UUIDType), ('t', cqltypes.UTF8Type)]
+        rows = [(1, None, u, u'a'), (None, 2.5, u, None)]
+        arrays = parse(ColumnarProtocolHandler, columns, rows)
+
+        df = dataframe_factory(['t', 'i', 'd', 'u'], arrays)
+        self.assertEqual(list(df.columns), ['t', 'i', 'd', 'u'])
+        self.assertEqual(str(df['i'].dtype), 'Int32')
+        self.assertTrue(df['i'].isna()[1])
+        self.assertTrue(np.isnan(df['d'][0]))
+        self.assertEqual(list(df['u']), [u, u])
+        self.assertEqual(list(df['t']), [u'a', None])
+
+        # rows from the other protocol handlers
+        df = dataframe_factory(['i', 'd'], [(1, 2.5), (2, None)])
+        self.assertEqual(list(df['i']), [1, 2])
+
+    @numpytest
+    @unittest.skipUnless(pandas, 'pandas is not available')
+    def test_dataframe_null_uuids(self):
+        from cassandra.columnar import dataframe_factory
+        from cassandra.protocol import ColumnarProtocolHandler
+
+        u = uuid1()
+        columns = [('i', cqltypes.Int32Type), ('u', cqltypes.TimeUUIDType)]
+        arrays = parse(ColumnarProtocolHandler, columns, [(1, u), (2, None)])
+        self.assertTrue(isinstance(arrays['u'], np.ma.MaskedArray))
+
+        df = dataframe_factory(['i', 'u'], arrays)
+        self.assertEqual(list(df['u']), [u, None])
+
+    @numpytest
+    @unittest.skipUnless(pandas, 'pandas is not available')
+    def test_fetch_dataframe(self):
+        from cassandra.columnar import dataframe_factory, fetch_dataframe
+        from cassandra.protocol import ColumnarProtocolHandler
+
+        columns = [('i', cqltypes.Int32Type)]
+        pages = [dataframe_factory(['i'], parse(ColumnarProtocolHandler, columns, rows))
+                 for rows in ([(1,), (2,)], [(3,)])]
+
+        response_future = Mock(has_more_pages=True, _final_result=pages[0])
+
+        def next_page():
+            response_future._final_result = pages[1]
+            response_future.has_more_pages = False
+        response_future.start_fetching_next_page.side_effect = next_page
+
+        df = fetch_dataframe(response_future)
+        self.assertEqual(list(df['i']), [1, 2, 3])
+        self.assertEqual(list(df.index), [0, 1, 2])
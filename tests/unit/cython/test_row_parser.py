@@ -0,0 +1,86 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+
+from cassandra import cqltypes
+from cassandra.query import (named_tuple_factory, dict_factory, ordered_dict_factory,
+                             tuple_factory, class_factory, _get_row_class)
+
+from tests.unit.cython.utils import cythontest, parse
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest  # noqa
+
+
+class User(object):
+    __slots__ = ('k', 'first_name')
+
+
+class RowParserTest(unittest.TestCase):
+
+    columns = [('k', cqltypes.Int32Type), ('first name', cqltypes.UTF8Type)]
+    rows = [(1, u'a'), (2, None)]
+
+    def parse(self, row_factory, handler_name='ProtocolHandler'):
+        from cassandra import protocol
+        handler = getattr(protocol, handler_name).for_row_factory(row_factory)
+        self.assertIsNotNone(handler)
+        return parse(handler, self.columns, self.rows)
+
+    @cythontest
+    def test_named_tuple_rows(self):
+        rows = self.parse(named_tuple_factory)
+        self.assertEqual(rows, named_tuple_factory(['k', 'first name'], self.rows))
+        self.assertIs(type(rows[0]), _get_row_class(('k', 'first name')))
+        self.assertEqual(rows[1].first_name, None)
+
+    @cythontest
+    def test_dict_rows(self):
+        rows = self.parse(dict_factory)
+        self.assertEqual(rows, [{'k': 1, 'first name': u'a'}, {'k': 2, 'first name': None}])
+
+        rows = self.parse(ordered_dict_factory)
+        self.assertTrue(all(type(row) is OrderedDict for row in rows))
+        self.assertEqual(list(rows[0].items()), [('k', 1), ('first name', u'a')])
+
+    @cythontest
+    def test_class_rows(self):
+        rows = self.parse(class_factory(User))
+        self.assertTrue(all(type(row) is User for row in rows))
+        self.assertEqual([(row.k, row.first_name) for row in rows], self.rows)
+
+    @cythontest
+    def test_lazy_rows(self):
+        rows = self.parse(dict_factory, 'LazyProtocolHandler')
+        self.assertNotIsInstance(rows, list)
+        self.assertEqual(list(rows), [{'k': 1, 'first name': u'a'}, {'k': 2, 'first name': None}])
+
+    @cythontest
+    def test_unsupported_row_factory(self):
+        from cassandra.protocol import ProtocolHandler
+
+        self.assertIsNone(ProtocolHandler.for_row_factory(tuple_factory))
+        self.assertIsNone(ProtocolHandler.for_row_factory(lambda colnames, rows: rows))
+
+    @cythontest
+    def test_handlers_are_cached(self):
+        from cassandra.protocol import ProtocolHandler
+
+        self.assertIs(ProtocolHandler.for_row_factory(dict_factory),
+                      ProtocolHandler.for_row_factory(dict_factory))
+        self.assertIs(ProtocolHandler.for_row_factory(class_factory(User)),
+                      ProtocolHandler.for_row_factory(class_factory(User)))
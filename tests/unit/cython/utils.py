@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+
 from cassandra.cython_deps import HAVE_CYTHON, HAVE_NUMPY
+from cassandra.protocol import ResultMessage, write_int, write_short, write_string
 
 try:
     import unittest2 as unittest
@@ -36,3 +39,43 @@ def cyimport(import_path):
 # def test_something(self): ...
 cythontest = unittest.skipUnless(HAVE_CYTHON, 'Cython is not available')
 numpytest  = unittest.skipUnless(HAVE_CYTHON and HAVE_NUMPY, 'NumPy is not available')
+
+
+PROTOCOL_VERSION = 4
+
+_type_codes = dict((cqltype, code) for code, cqltype in ResultMessage.type_codes.items())
+
+
+def make_rows_body(columns, rows):
+    """
+    Encode the body of a ROWS result message, with `columns` a list of
+    (name, cqltype) and `rows` a list of tuples of values (None for NULL).
+    """
+    f = io.BytesIO()
+    write_int(f, ResultMessage._FLAGS_GLOBAL_TABLES_SPEC)
+    write_int(f, len(columns))
+    write_string(f, 'ks')
+    write_string(f, 'tbl')
+    for name, cqltype in columns:
+        write_string(f, name)
+        write_short(f, _type_codes[cqltype])
+
+    write_int(f, len(rows))
+    for row in rows:
+        for (_, cqltype), value in zip(columns, row):
+            if value is None:
+                write_int(f, -1)
+            else:
+                data = cqltype.serialize(value, PROTOCOL_VERSION)
+                write_int(f, len(data))
+                f.write(data)
+
+    f.seek(0)
+    return f
+
+
+def parse(protocol_handler, columns, rows):
+    message_class = protocol_handler.message_types_by_opcode[ResultMessage.opcode]
+    _, (_, parsed) = message_class.recv_results_rows(
+        make_rows_body(columns, rows), PROTOCOL_VERSION, {})
+    return parsed
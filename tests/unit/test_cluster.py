@@ -0,0 +1,463 @@
+# Copyright 2013-2015 DataStax, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest # noqa
+
+from functools import partial
+from mock import Mock, NonCallableMagicMock
+from threading import Event, Lock
+
+from cassandra import OperationTimedOut
+from cassandra.cluster import Cluster, Session, TokenRangeScan, _token_ranges
+from cassandra.connection import Connection
+from cassandra.metadata import Murmur3Token
+from cassandra.policies import HostDistance, SimpleConvictionPolicy
+from cassandra.pool import Host
+from cassandra.query import dict_factory, tuple_factory, SimpleStatement, BatchStatement
+
+
+class SessionInitTests(unittest.TestCase):
+
+    def make_cluster(self, distances):
+        cluster = NonCallableMagicMock(spec=Cluster)
+        cluster.protocol_version = 3
+        cluster.metrics = None
+        cluster.pool_init_concurrency = 4
+        cluster.connect_to_remote_hosts = True
+        cluster.get_connections_per_host.return_value = 1
+        cluster.load_balancing_policy.distance.side_effect = lambda h: distances[h]
+        return cluster
+
+    def make_connection(self):
+        return NonCallableMagicMock(spec=Connection, in_flight=0, is_defunct=False, is_closed=False,
+                                    max_request_id=100, lock=Lock())
+
+    def test_does_not_wait_for_remote_pools(self):
+        local_host = Host('ip1', SimpleConvictionPolicy)
+        remote_host = Host('ip2', SimpleConvictionPolicy)
+        cluster = self.make_cluster({local_host: HostDistance.LOCAL,
+                                     remote_host: HostDistance.REMOTE})
+
+        remote_may_connect = Event()
+
+        def connection_factory(address):
+            if address == remote_host.address:
+                remote_may_connect.wait()
+            return self.make_connection()
+        cluster.connection_factory.side_effect = connection_factory
+
+        try:
+            session = Session(cluster, [local_host, remote_host])
+            self.assertIn(local_host, session._pools)
+            self.assertNotIn(remote_host, session._pools)
+        finally:
+            remote_may_connect.set()
+
+    def test_waits_for_a_remote_pool_without_local_hosts(self):
+        hosts = [Host('ip1', SimpleConvictionPolicy), Host('ip2', SimpleConvictionPolicy)]
+        cluster = self.make_cluster(dict((h, HostDistance.REMOTE) for h in hosts))
+
+        second_may_connect = Event()
+
+        def connection_factory(address):
+            if address == hosts[1].address:
+                second_may_connect.wait()
+            return self.make_connection()
+        cluster.connection_factory.side_effect = connection_factory
+
+        try:
+            session = Session(cluster, hosts)
+            self.assertIn(hosts[0], session._pools)
+            self.assertNotIn(hosts[1], session._pools)
+        finally:
+            second_may_connect.set()
+
+    def test_opens_pools_concurrently(self):
+        hosts = [Host('ip%d' % i, SimpleConvictionPolicy) for i in range(4)]
+        cluster = self.make_cluster(dict((h, HostDistance.LOCAL) for h in hosts))
+
+        # each connection attempt blocks until all of them are in progress
+        lock = Lock()
+        started = []
+        all_started = Event()
+
+        def connection_factory(address):
+            with lock:
+                started.append(address)
+                if len(started) == len(hosts):
+                    all_started.set()
+            self.assertTrue(all_started.wait(5))
+            return self.make_connection()
+        cluster.connection_factory.side_effect = connection_factory
+
+        session = Session(cluster, hosts)
+        self.assertEqual(set(hosts), set(session._pools.keys()))
+
+
+class SessionRequestQueueTests(unittest.TestCase):
+
+    def make_session(self, max_request_queue_size):
+        cluster = NonCallableMagicMock(spec=Cluster)
+        cluster.protocol_version = 3
+        cluster.metrics = None
+        cluster.pool_init_concurrency = 1
+        session = Session(cluster, [])
+        session.max_request_queue_size = max_request_queue_size
+        session.submit = Mock()
+        return session
+
+    def test_disabled_by_default(self):
+        session = self.make_session(Session.max_request_queue_size)
+        self.assertFalse(session._enqueue_request(Mock()))
+
+    def test_bounded_queue(self):
+        session = self.make_session(2)
+        futures = [Mock(), Mock(), Mock()]
+        self.assertTrue(session._enqueue_request(futures[0]))
+        self.assertTrue(session._enqueue_request(futures[1]))
+        self.assertFalse(session._enqueue_request(futures[2]))
+
+        # requeued requests were already admitted and go to the front
+        self.assertTrue(session._enqueue_request(futures[2], requeue=True))
+        self.assertEqual([futures[2], futures[0], futures[1]], list(session._request_queue))
+
+    def test_dispatch_on_slot_available(self):
+        session = self.make_session(10)
+        future = Mock()
+        session._on_request_slot_available()
+        self.assertFalse(session.submit.called)
+
+        session._enqueue_request(future)
+        session._on_request_slot_available()
+        session.submit.assert_called_once_with(future._send_queued_request)
+        self.assertEqual(0, len(session._request_queue))
+
+    def test_dequeue(self):
+        session = self.make_session(10)
+        future = Mock()
+        session._enqueue_request(future)
+        self.assertTrue(session._dequeue_request(future))
+        self.assertFalse(session._dequeue_request(future))
+
+    def test_shutdown_fails_queued_requests(self):
+        session = self.make_session(10)
+        future = Mock()
+        session._enqueue_request(future)
+        session.shutdown()
+        future._on_queue_shutdown.assert_called_once_with()
+        self.assertFalse(session._enqueue_request(Mock()))
+
+
+class SessionProtocolHandlerTests(unittest.TestCase):
+
+    def make_session(self, protocol_handler):
+        cluster = NonCallableMagicMock(spec=Cluster)
+        cluster.protocol_version = 3
+        cluster.metrics = None
+        cluster.pool_init_concurrency = 1
+        session = Session(cluster, [])
+        session.client_protocol_handler = protocol_handler
+        return session
+
+    def test_row_factory_handler(self):
+        row_handler = Mock()
+        protocol_handler = Mock()
+        protocol_handler.for_row_factory.return_value = row_handler
+        future = Mock(row_factory=dict_factory)
+
+        session = self.make_session(protocol_handler)
+        self.assertIs(row_handler, session._protocol_handler_for(future))
+        protocol_handler.for_row_factory.assert_called_once_with(dict_factory)
+        self.assertIs(tuple_factory, future.row_factory)
+
+    def test_unsupported_row_factory(self):
+        protocol_handler = Mock()
+        protocol_handler.for_row_factory.return_value = None
+        future = Mock(row_factory=dict_factory)
+
+        session = self.make_session(protocol_handler)
+        self.assertIs(protocol_handler, session._protocol_handler_for(future))
+        self.assertIs(dict_factory, future.row_factory)
+
+        # handlers without compiled row construction are used as they are
+        protocol_handler = Mock(spec=['encode_message', 'decode_message'])
+        session = self.make_session(protocol_handler)
+        self.assertIs(protocol_handler, session._protocol_handler_for(future))
+
+    def test_paging_state(self):
+        session = self.make_session(Mock())
+
+        future = session._create_response_future("SELECT * FROM t", None, False, None, 1, b'state')
+        self.assertEqual(b'state', future.message.paging_state)
+
+        statement = SimpleStatement("SELECT * FROM t", paging_state=b'saved')
+        future = session._create_response_future(statement, None, False, None, 1)
+        self.assertEqual(b'saved', future.message.paging_state)
+        future = session._create_response_future(statement, None, False, None, 1, b'override')
+        self.assertEqual(b'override', future.message.paging_state)
+
+        self.assertRaises(ValueError, session._create_response_future,
+                          BatchStatement(), None, False, None, 1, b'state')
+
+    def test_adaptive_fetch_size(self):
+        session = self.make_session(Mock())
+        session.page_byte_budget = 1000000
+
+        future = session._create_response_future("SELECT * FROM t", None, False, None, 1)
+        self.assertEqual(1000000, future._page_byte_budget)
+        self.assertEqual((session.min_adaptive_fetch_size, session.max_adaptive_fetch_size),
+                         future._fetch_size_bounds)
+
+        # explicit fetch sizes are kept
+        statement = SimpleStatement("SELECT * FROM t", fetch_size=100)
+        future = session._create_response_future(statement, None, False, None, 1)
+        self.assertIsNone(future._page_byte_budget)
+
+        session.page_byte_budget = None
+        future = session._create_response_future("SELECT * FROM t", None, False, None, 1)
+        self.assertIsNone(future._page_byte_budget)
+
+
+class FakePagedFuture(object):
+
+    def __init__(self, pages, paging_state=None):
+        self._pages = list(pages)
+        self.has_more_pages = len(self._pages) > 1
+        self._page_number = paging_state or 0
+        self.paging_state = None
+
+    def add_callbacks(self, callback, errback, callback_args=(), errback_args=()):
+        self._callback = lambda rows: callback(rows, *callback_args)
+        self._errback = lambda exc: errback(exc, *errback_args)
+        self._deliver()
+
+    def start_fetching_next_page(self):
+        self._deliver()
+
+    def _deliver(self):
+        page = self._pages.pop(0)
+        self.has_more_pages = bool(self._pages)
+        self._page_number += 1
+        self.paging_state = self._page_number if self.has_more_pages else None
+        if isinstance(page, Exception):
+            self._errback(page)
+        else:
+            self._callback(page)
+
+
+class TokenRangeScanTests(unittest.TestCase):
+
+    def make_ranges(self, count):
+        return [(i, i + 1, None) for i in range(count)]
+
+    def make_statement(self, start, end, paging_state):
+        return (start, end, paging_state)
+
+    def test_token_ranges(self):
+        token_map = Mock(ring=[Murmur3Token(-10), Murmur3Token(0), Murmur3Token(20)])
+        self.assertEqual(
+            [(-10, 0, Murmur3Token(-10)), (0, 20, Murmur3Token(0)),
+             (20, None, Murmur3Token(20)), (None, -10, Murmur3Token(20))],
+            list(_token_ranges(token_map)))
+
+        ranges = list(_token_ranges(token_map, split=2))
+        self.assertEqual([(-10, -5), (-5, 0), (0, 10), (10, 20), (20, None), (None, -10)],
+                         [r[:2] for r in ranges])
+        self.assertEqual(Murmur3Token(-10), ranges[1][2])
+
+        # no ring yet, a single unbounded scan
+        self.assertEqual([(None, None, None)], list(_token_ranges(None)))
+
+    def test_scan_rows(self):
+        futures = [FakePagedFuture([[1, 2], [3]]), FakePagedFuture([[4]]), FakePagedFuture([[5, 6]])]
+        session = Mock()
+        session.execute_async.side_effect = futures
+
+        scan = TokenRangeScan(session, self.make_ranges(3), self.make_statement, concurrency=2)
+        self.assertEqual(2, session.execute_async.call_count)
+        self.assertEqual([1, 2, 3, 4, 5, 6], sorted(scan))
+        self.assertEqual(3, session.execute_async.call_count)
+
+        futures = [FakePagedFuture([[1, 2], [3]])]
+        session.execute_async.side_effect = futures
+        scan = TokenRangeScan(session, self.make_ranges(1), self.make_statement, concurrency=1, pages=True)
+        self.assertEqual([[1, 2], [3]], list(scan))
+        self.assertEqual([], scan.get_remaining_ranges())
+
+    def test_scan_error(self):
+        session = Mock()
+        session.execute_async.side_effect = [FakePagedFuture([[1], ValueError("page failed")]),
+                                             FakePagedFuture([[2]])]
+
+        scan = TokenRangeScan(session, self.make_ranges(2), self.make_statement, concurrency=1, pages=True)
+        self.assertEqual([1], next(scan))
+        self.assertRaises(ValueError, list, scan)
+        self.assertEqual(1, session.execute_async.call_count)
+        self.assertEqual([(0, 1, 1), (1, 2, None)], scan.get_remaining_ranges())
+
+    def test_resume_scan(self):
+        pages = {0: [[1, 2], [3, 4], [5]], 1: [[6]]}
+        session = Mock()
+        session.execute_async.side_effect = \
+            lambda statement, timeout: FakePagedFuture(pages[statement[0]][statement[2] or 0:], statement[2])
+
+        scan = TokenRangeScan(session, self.make_ranges(2), self.make_statement, concurrency=1, pages=True)
+        self.assertEqual([1, 2], next(scan))
+        # the page being iterated is not consumed yet
+        self.assertEqual([(0, 1, None), (1, 2, None)], scan.get_remaining_ranges())
+        self.assertEqual([3, 4], next(scan))
+        remaining = scan.get_remaining_ranges()
+        self.assertEqual([(0, 1, 1), (1, 2, None)], remaining)
+        scan.close()
+
+        scan = TokenRangeScan(session, remaining, self.make_statement, concurrency=2, pages=True)
+        self.assertEqual(((0, 1, 1),), session.execute_async.call_args_list[-2][0])
+        self.assertEqual([[3, 4], [5], [6]], sorted(scan))
+        self.assertEqual([], scan.get_remaining_ranges())
+
+    def test_scan_table_statements(self):
+        cluster = NonCallableMagicMock(spec=Cluster)
+        cluster.protocol_version = 3
+        cluster.metrics = None
+        cluster.pool_init_concurrency = 1
+        table = Mock(partition_key=[Mock()])
+        table.partition_key[0].name = 'k'
+        cluster.metadata.keyspaces = {'ks': Mock(tables={'tbl': table})}
+        cluster.metadata.token_map = Mock(ring=[Murmur3Token(0), Murmur3Token(20)])
+
+        session = Session(cluster, [])
+        session.prepare = Mock()
+        session.execute_async = Mock(side_effect=lambda *args, **kwargs: FakePagedFuture([[]]))
+
+        self.assertEqual([], list(session.scan_table('tbl', keyspace='ks', columns=['k', 'v'], fetch_size=10)))
+        queries = [c[0][0] for c in session.prepare.call_args_list]
+        self.assertEqual(['SELECT k, v FROM ks.tbl WHERE token(k) > ? AND token(k) <= ?',
+                          'SELECT k, v FROM ks.tbl WHERE token(k) > ?',
+                          'SELECT k, v FROM ks.tbl WHERE token(k) <= ?'], queries)
+        binds = [c[0][0] for c in session.prepare.return_value.bind.call_args_list]
+        self.assertEqual([[0, 20], [20], [0]], binds)
+        statement = session.execute_async.call_args[0][0]
+        self.assertEqual(Murmur3Token(20), statement.routing_token)
+        self.assertEqual(10, statement.fetch_size)
+        self.assertEqual(session.default_timeout, session.execute_async.call_args[1]['timeout'])
+
+        list(session.scan_table('tbl', keyspace='ks', timeout=60))
+        self.assertEqual(60, session.execute_async.call_args[1]['timeout'])
+
+        session.prepare.return_value.bind.reset_mock()
+        session.execute_async.reset_mock()
+        list(session.scan_table('tbl', keyspace='ks', ranges=[(None, 0, b'state')]))
+        binds = [c[0][0] for c in session.prepare.return_value.bind.call_args_list]
+        self.assertEqual([[0]], binds)
+        statement = session.execute_async.call_args[0][0]
+        self.assertEqual(b'state', statement.paging_state)
+        self.assertEqual(Murmur3Token(20), statement.routing_token)
+
+        self.assertRaises(ValueError, session.scan_table, 'missing', keyspace='ks')
+        self.assertRaises(ValueError, session.scan_table, 'tbl')
+
+
+class WriteBufferTests(unittest.TestCase):
+
+    def make_buffer(self, **kwargs):
+        session = Mock(keyspace='ks', default_timeout=10)
+        session.create_write_buffer = partial(Session.create_write_buffer, session)
+        self.timers = []
+
+        def create_timer(timeout, callback):
+            timer = Mock(callback=callback)
+            self.timers.append(timer)
+            return timer
+        session.cluster.connection_class.create_timer.side_effect = create_timer
+
+        self.sent = []
+
+        def execute_async(query, parameters=None, timeout=None):
+            self.sent.append(query)
+            return FakePagedFuture([['applied']])
+        session.execute_async.side_effect = execute_async
+        return session.create_write_buffer(**kwargs)
+
+    def statement(self, key):
+        return SimpleStatement("INSERT INTO t (k) VALUES (1)", routing_key=key)
+
+    def test_size_trigger(self):
+        buf = self.make_buffer(batch_size=2)
+        futures = [buf.add(self.statement(key)) for key in (b'a', b'b', b'a')]
+
+        self.assertEqual(1, len(self.sent))
+        self.assertIsInstance(self.sent[0], BatchStatement)
+        self.assertEqual(b'a', self.sent[0].routing_key)
+        self.assertEqual(['applied'], futures[0].result())
+        self.assertEqual(['applied'], futures[2].result())
+        self.assertFalse(futures[1].done())
+
+        # the first timer of the flushed group is cancelled
+        self.timers[0].cancel.assert_called_once_with()
+        self.assertFalse(self.timers[1].cancel.called)
+
+    def test_linger_trigger(self):
+        buf = self.make_buffer(batch_size=10, linger=0.1)
+        statement = self.statement(b'a')
+        future = buf.add(statement)
+        self.assertEqual([], self.sent)
+
+        self.timers[0].callback()
+        self.assertEqual([statement], self.sent)  # lone writes are not batched
+        self.assertEqual(['applied'], future.result())
+
+        # a timer firing after its group was sent does nothing
+        self.timers[0].callback()
+        self.assertEqual(1, len(self.sent))
+
+    def test_unrouted_writes_not_batched(self):
+        buf = self.make_buffer(batch_size=2)
+        futures = [buf.add("INSERT INTO t (k) VALUES (%d)" % i) for i in range(3)]
+        futures.append(buf.add(SimpleStatement("INSERT INTO t (k) VALUES (3)")))
+
+        self.assertEqual(4, len(self.sent))
+        self.assertFalse(any(isinstance(query, BatchStatement) for query in self.sent))
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual([], self.timers)
+
+    def test_cancelled_writes(self):
+        buf = self.make_buffer(batch_size=3)
+        futures = [buf.add(self.statement(b'a')) for _ in range(2)]
+        self.assertTrue(futures[0].cancel())
+        futures.append(buf.add(self.statement(b'a')))
+
+        self.assertTrue(futures[0].cancelled())
+        self.assertEqual(['applied'], futures[1].result())
+        self.assertEqual(['applied'], futures[2].result())
+
+    def test_close(self):
+        buf = self.make_buffer(batch_size=10)
+        with buf:
+            futures = [buf.add(self.statement(key)) for key in (b'a', b'b', b'b')]
+        self.assertEqual(2, len(self.sent))
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertRaises(Exception, buf.add, self.statement(b'a'))
+
+    def test_errors(self):
+        buf = self.make_buffer(batch_size=2)
+        error = OperationTimedOut()
+        buf.session.execute_async.side_effect = lambda *args, **kwargs: FakePagedFuture([error])
+        futures = [buf.add(self.statement(b'a')) for _ in range(2)]
+        for future in futures:
+            self.assertIs(error, future.exception())
+
+        self.assertRaises(ValueError, self.make_buffer, batch_size=0)
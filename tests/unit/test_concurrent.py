@@ -17,13 +17,26 @@ try:
     import unittest2 as unittest
 except ImportError:
     import unittest  # noqa
+from concurrent.futures import CancelledError, Future
 from itertools import cycle
 from mock import Mock
+from multiprocessing.pool import MaybeEncodingError
+import os
+import random
 import time
 import threading
-from six.moves.queue import PriorityQueue
+from six.moves.queue import Empty, PriorityQueue, Queue
 
-from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+from cassandra import ConsistencyLevel, InvalidRequest, WriteTimeout
+from cassandra.cluster import NoHostAvailable
+from cassandra.concurrent import (execute_concurrent, execute_concurrent_with_args, execute_concurrent_batches,
+                                  execute_concurrent_multiprocess, bulk_load, all_of, any_of, DeadlineExceeded,
+                                  _RateLimiter, _next_chunk_results)
+from cassandra.cqltypes import Int32Type, UTF8Type
+from cassandra.protocol import ColumnMetadata, OverloadedErrorMessage
+from cassandra.util import OrderedDict
+from cassandra.query import (BatchStatement, BatchType, BoundStatement, PreparedStatement, SimpleStatement,
+                             named_tuple_factory)
 
 
 class MockResponseResponseFuture():
@@ -51,9 +64,12 @@ class MockResponseResponseFuture():
         """
         This is used to add a callback our pending list of callbacks.
         If reverse is specified we will invoke the callback in the opposite order that we added it
+
+        Statements may be sent, and their callbacks added, out of order by concurrent callbacks,
+        so the result of each query is the index of its statement (the last callback argument)
         """
-        time_added = time.time()
-        self.pending_callbacks.put((self.priority, (fn, args, kwargs, time_added)))
+        submitted = args[-1]
+        self.pending_callbacks.put((self.priority, (fn, args, kwargs, submitted)))
         if not reversed:
             self.priority += 1
         else:
@@ -103,8 +119,8 @@ class TimedCallableInvoker(threading.Thread):
                 if (priority_num % 10) == 0 and self.slowdown:
                     self._stopper.wait(.1)
                 callback_args = pending_callback[1]
-                fn, args, kwargs, time_added = callback_args
-                fn(time_added, *args, **kwargs)
+                fn, args, kwargs, submitted = callback_args
+                fn(submitted, *args, **kwargs)
             self._stopper.wait(.001)
         return
 
@@ -215,13 +231,579 @@ class ConcurrencyTest((unittest.TestCase)):
 
     def validate_result_ordering(self, results):
         """
-        This method will validate that the timestamps returned from the result are in order. This indicates that the
-        results were returned in the order they were submitted for execution
+        This method will validate that the statement indexes returned from the result are in order. This indicates
+        that the results were returned in the order they were submitted for execution
         :param results:
         """
-        last_time_added = 0
+        last_submitted = -1
         for result in results:
-            current_time_added = result[1]
-            self.assertLess(last_time_added, current_time_added)
-            last_time_added = current_time_added
+            current_submitted = result[1]
+            self.assertLess(last_submitted, current_submitted)
+            last_submitted = current_submitted
+
+
+class ImmediateResponseFuture(object):
+
+    has_more_pages = False
+
+    def __init__(self, result):
+        self.result = result
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        if isinstance(self.result, Exception):
+            errback(self.result, *errback_args, **(errback_kwargs or {}))
+        else:
+            callback(self.result, *callback_args, **(callback_kwargs or {}))
+
+
+class ConcurrentBatchesTest(unittest.TestCase):
+
+    def make_session(self):
+        session = Mock(keyspace=None)
+        session.execute_async.side_effect = lambda batch, *args, **kwargs: ImmediateResponseFuture(batch)
+        return session
+
+    def make_statements(self, keys):
+        return [(SimpleStatement("INSERT INTO t (k, v) VALUES (%s, %s)", routing_key=key, keyspace='ks'), (key, i))
+                for i, key in enumerate(keys)]
+
+    def test_group_by_partition(self):
+        session = self.make_session()
+        statements = self.make_statements([b'a', b'b', b'a', b'a', b'b'])
+        results = execute_concurrent_batches(session, statements, batch_size=2)
+
+        batches = [batch for success, batch in results]
+        self.assertTrue(all(success for success, _ in results))
+        self.assertEqual([(b'a', 2), (b'b', 2), (b'a', 1)],
+                         [(b.routing_key, len(b._statements_and_parameters)) for b in batches])
+        self.assertTrue(all(b.batch_type == BatchType.UNLOGGED for b in batches))
+
+    def test_group_by_replicas(self):
+        session = self.make_session()
+        replicas = {b'a': ['host1'], b'b': ['host2'], b'c': ['host1']}
+        session.cluster.metadata.get_replicas.side_effect = lambda keyspace, key: replicas[key]
+
+        statements = self.make_statements([b'a', b'b', b'c'])
+        results = execute_concurrent_batches(session, statements, batch_size=10, group_by_replicas=True)
+        self.assertEqual(sorted([1, 2]), sorted(len(batch._statements_and_parameters) for _, batch in results))
+
+    def test_max_buffered(self):
+        session = self.make_session()
+        statements = self.make_statements([b'a', b'a', b'b', b'c', b'c'])
+        results = execute_concurrent_batches(session, statements, batch_size=10, max_buffered=2)
+
+        # every group is flushed once too many statements are held
+        self.assertEqual([(b'a', 2), (b'b', 1), (b'c', 2)],
+                         [(b.routing_key, len(b._statements_and_parameters)) for _, b in results])
+
+    def test_statements_without_routing_key(self):
+        session = self.make_session()
+        statements = [("INSERT INTO t (k) VALUES (%s)", (i,)) for i in range(3)]
+        statements.append(("INSERT INTO t (k) VALUES (3)", None))
+        statements.extend(self.make_statements([b'a', b'a']))
+        results = execute_concurrent_batches(session, statements, batch_size=2)
+
+        # each write to an unknown partition is sent on its own
+        self.assertEqual([(None, 1)] * 4 + [(b'a', 2)],
+                         [(b.routing_key, len(b._statements_and_parameters)) for _, b in results])
+
+        self.assertRaises(ValueError, execute_concurrent_batches, session, statements, batch_size=0)
+
+    def test_with_statements(self):
+        session = self.make_session()
+        session.execute_async.side_effect = lambda batch, *args, **kwargs: ImmediateResponseFuture(
+            WriteTimeout("timed out") if batch.routing_key == b'b' else batch)
+        statements = self.make_statements([b'a', b'b', b'a'])
+        results = execute_concurrent_batches(session, statements, batch_size=10, raise_on_first_error=False,
+                                             with_statements=True)
+
+        self.assertEqual([True, False], [success for success, _, _ in results])
+        self.assertEqual([statements[0], statements[2]], results[0][2])
+        self.assertEqual([statements[1]], results[1][2])
+        self.assertIsInstance(results[1][1], WriteTimeout)
+
+
+class ThreadedResponseFuture(object):
+
+    has_more_pages = False
+
+    def __init__(self, result, complete):
+        self.result = result
+        self._complete = complete
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        if isinstance(self.result, Exception):
+            self._complete(errback, self.result, errback_args)
+        else:
+            self._complete(callback, self.result, callback_args)
+
+
+class PagedResponseFuture(object):
+    """
+    Returns `pages` one at a time, keeping its callbacks across pages.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    @property
+    def has_more_pages(self):
+        return len(self.pages) > 1
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        self.callback = lambda page: callback(page, *callback_args)
+        self.errback = lambda exc: errback(exc, *errback_args)
+        self._deliver()
+
+    def start_fetching_next_page(self):
+        self.pages.pop(0)
+        self._deliver()
+
+    def clear_callbacks(self):
+        pass
+
+    def _deliver(self):
+        page = self.pages[0]
+        if isinstance(page, Exception):
+            self.errback(page)
+        else:
+            self.callback(page)
+
+
+class ConcurrentExecutorTest(unittest.TestCase):
+
+    def make_session(self, complete=None):
+        session = Mock()
+
+        def execute_async(statement, params, timeout=None):
+            result = params[0]
+            if complete is None:
+                return ImmediateResponseFuture(result)
+            return ThreadedResponseFuture(result, complete)
+        session.execute_async.side_effect = execute_async
+        return session
+
+    def test_empty_iterator(self):
+        session = self.make_session()
+        self.assertEqual([], execute_concurrent(session, iter([])))
+        self.assertEqual([], list(execute_concurrent(session, iter([]), results_generator=True)))
+
+    def test_synchronous_completion(self):
+        session = self.make_session()
+        statements = [("INSERT", (i,)) for i in range(10)]
+        for results_generator in (False, True):
+            results = execute_concurrent(session, iter(statements), concurrency=3,
+                                         results_generator=results_generator)
+            self.assertEqual([(True, i) for i in range(10)], list(results))
+
+    def test_completion_from_many_threads(self):
+        completions = PriorityQueue()
+        session = self.make_session(lambda fn, result, args: completions.put((random.random(), (fn, result, args))))
+
+        stop = threading.Event()
+
+        def complete():
+            while not stop.is_set():
+                try:
+                    _, (fn, result, args) = completions.get(timeout=0.01)
+                except Empty:
+                    continue
+                fn(result, *args)
+        threads = [threading.Thread(target=complete) for _ in range(4)]
+        for t in threads:
+            t.start()
+
+        try:
+            statements = [("INSERT", (i,)) for i in range(2000)]
+            for results_generator in (False, True):
+                results = execute_concurrent(session, iter(statements), concurrency=200,
+                                             results_generator=results_generator)
+                self.assertEqual([(True, i) for i in range(2000)], list(results))
+            results = execute_concurrent(session, iter(statements), concurrency=200, ordered=False,
+                                         results_generator=True)
+            self.assertEqual([(i, True, i) for i in range(2000)], sorted(results))
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+
+    def test_fail_fast(self):
+        session = self.make_session()
+        error = ValueError("failed")
+        statements = [("INSERT", (i,)) for i in range(5)] + [("INSERT", (error,))] + \
+                     [("INSERT", (i,)) for i in range(6, 10)]
+
+        self.assertRaises(ValueError, execute_concurrent, session, statements, concurrency=2)
+        # no statement is started after the error
+        self.assertEqual(6, session.execute_async.call_count)
+
+        results = execute_concurrent(session, statements, concurrency=2, results_generator=True)
+        self.assertEqual([(True, i) for i in range(5)], [next(results) for _ in range(5)])
+        self.assertRaises(ValueError, next, results)
+
+        results = execute_concurrent(session, statements, raise_on_first_error=False)
+        self.assertEqual((False, error), results[5])
+        self.assertEqual(10, len(results))
+
+    def test_unordered(self):
+        session = self.make_session()
+        statements = [("INSERT", (i,)) for i in range(10)]
+        results = execute_concurrent(session, statements, concurrency=3, ordered=False)
+        self.assertEqual([(i, True, i) for i in range(10)], sorted(results))
+
+        pending = []
+        session = self.make_session(lambda fn, result, args: pending.append((fn, result, args)))
+        results = execute_concurrent(session, iter(statements), concurrency=4, ordered=False,
+                                     results_generator=True)
+        self.assertEqual(4, len(pending))
+
+        # results are yielded as they complete, not in order
+        fn, result, args = pending.pop()
+        fn(result, *args)
+        self.assertEqual((3, True, 3), next(results))
+
+        # results not consumed yet count against concurrency
+        while pending:
+            fn, result, args = pending.pop()
+            fn(result, *args)
+        self.assertEqual(5, session.execute_async.call_count)
+        received = [next(results)]
+        self.assertEqual(6, session.execute_async.call_count)
+
+        while len(received) < 9:
+            while pending:
+                fn, result, args = pending.pop()
+                fn(result, *args)
+            received.append(next(results))
+        self.assertRaises(StopIteration, next, results)
+        self.assertEqual([(i, True, i) for i in range(10) if i != 3], sorted(received))
+
+    def test_unordered_fail_fast(self):
+        session = self.make_session()
+        error = ValueError("failed")
+        statements = [("INSERT", (i,)) for i in range(3)] + [("INSERT", (error,))] + \
+                     [("INSERT", (i,)) for i in range(4, 10)]
+        self.assertRaises(ValueError, execute_concurrent, session, statements, concurrency=2, ordered=False)
+
+        results = execute_concurrent(session, statements, raise_on_first_error=False, ordered=False)
+        self.assertEqual((3, False, error), sorted(results)[3])
+
+    def test_fetch_all_pages(self):
+        session = Mock()
+        pages = {0: [[0, 1], [2, 3], [4]], 1: [[5]], 2: [[6, 7], ValueError("failed")]}
+        session.execute_async.side_effect = lambda statement, params, timeout=None: \
+            PagedResponseFuture(list(pages[params[0]]))
+        statements = [("SELECT", (i,)) for i in range(3)]
+
+        def submit(fn, *args, **kwargs):
+            future = Future()
+            future.set_result(fn(*args, **kwargs))
+            return future
+        session.submit.side_effect = submit
+
+        results = execute_concurrent(session, statements, fetch_all_pages=True, raise_on_first_error=False)
+        self.assertEqual((True, [0, 1, 2, 3, 4]), results[0])
+        self.assertEqual((True, [5]), results[1])
+        self.assertFalse(results[2][0])
+        # later pages are requested from the executor
+        self.assertEqual(3, session.submit.call_count)
+
+        results = execute_concurrent(session, statements[:2], max_rows=3)
+        self.assertEqual([(True, [0, 1, 2]), (True, [5])], results)
+
+
+class BulkLoadTest(unittest.TestCase):
+
+    prepared = PreparedStatement([ColumnMetadata('ks', 't', 'k', Int32Type), ColumnMetadata('ks', 't', 'v', UTF8Type)],
+                                 b'id', [0], "INSERT INTO t (k, v) VALUES (?, ?)", 'ks', 4)
+
+    def make_session(self, fail=lambda statement: None):
+        session = Mock(keyspace='ks')
+        session.cluster.metadata.get_replicas.side_effect = \
+            lambda keyspace, key: ['host%d' % (Int32Type.deserialize(key, 4) % 2)]
+        session.execute_async.side_effect = lambda statement, params, timeout=None: \
+            ImmediateResponseFuture(fail(statement) or [])
+        return session
+
+    def test_load(self):
+        session = self.make_session()
+        rows = [(i, 'v%d' % i) for i in range(10)] + [('not an int', 'v')]
+        stats = bulk_load(session, self.prepared, iter(rows), batch_size=3, bind_chunk_size=4)
+
+        self.assertEqual(10, stats.rows)
+        self.assertEqual(1, stats.failed_rows)
+        self.assertEqual({'TypeError': 1}, stats.errors)
+        # five rows for each of the two replicas
+        self.assertEqual(4, stats.requests)
+        self.assertEqual(10 * 4 + 10 * 2, stats.bytes)
+        sent = [call[0][0] for call in session.execute_async.call_args_list]
+        self.assertTrue(all(isinstance(s, BatchStatement) and s.batch_type == BatchType.UNLOGGED for s in sent))
+
+        session = self.make_session()
+        stats = bulk_load(session, self.prepared, rows[:10], batch_size=1, consistency_level=ConsistencyLevel.ONE)
+        self.assertEqual(10, stats.requests)
+        sent = [call[0][0] for call in session.execute_async.call_args_list]
+        self.assertTrue(all(s.consistency_level == ConsistencyLevel.ONE for s in sent))
+
+    def test_retries(self):
+        failures = {}
+
+        def fail(statement):
+            attempt = failures[id(statement)] = failures.get(id(statement), 0) + 1
+            key = statement.raw_values[0]
+            if key == 3:
+                return InvalidRequest("invalid")
+            if key == 4 or (key == 5 and attempt == 1):
+                return WriteTimeout("timed out")
+
+        session = self.make_session(fail)
+        stats = bulk_load(session, self.prepared, [(i, 'v') for i in range(10)], batch_size=1, max_retries=2)
+        self.assertEqual(8, stats.rows)
+        self.assertEqual(2, stats.failed_rows)
+        self.assertEqual({'InvalidRequest': 1, 'WriteTimeout': 1}, stats.errors)
+        # key 4 twice, key 5 once
+        self.assertEqual(3, stats.retries)
+        self.assertIn("8 rows written (2 failed)", str(stats))
+
+        # timeouts are only retried for idempotent statements
+        not_idempotent = PreparedStatement(self.prepared.column_metadata, b'id', [0],
+                                           self.prepared.query_string, 'ks', 4)
+        not_idempotent.is_idempotent = False
+        failures.clear()
+        stats = bulk_load(self.make_session(fail), not_idempotent, [(i, 'v') for i in range(10)],
+                          batch_size=1, max_retries=2)
+        self.assertEqual(7, stats.rows)
+        self.assertEqual({'InvalidRequest': 1, 'WriteTimeout': 2}, stats.errors)
+        self.assertEqual(0, stats.retries)
+
+
+class FutureCompositionTest(unittest.TestCase):
+
+    def test_all_of(self):
+        futures = [Future() for _ in range(3)]
+        combined = all_of(futures)
+        for i in (2, 0, 1):
+            self.assertFalse(combined.done())
+            futures[i].set_result(i)
+        self.assertEqual([0, 1, 2], combined.result())
+
+        futures = [Future() for _ in range(3)]
+        combined = all_of(futures)
+        futures[1].set_exception(ValueError("failed"))
+        self.assertRaises(ValueError, combined.result)
+        futures[0].set_result(0)
+
+        self.assertEqual([], all_of([]).result())
+
+    def test_any_of(self):
+        futures = [Future() for _ in range(3)]
+        combined = any_of(futures)
+        futures[1].set_exception(ValueError("failed"))
+        self.assertFalse(combined.done())
+        futures[2].set_result(2)
+        futures[0].set_result(0)
+        self.assertEqual(2, combined.result())
+
+        futures = [Future() for _ in range(2)]
+        combined = any_of(futures)
+        futures[0].set_exception(ValueError("failed"))
+        futures[1].cancel()
+        self.assertRaises(CancelledError, combined.result)
+
+        self.assertRaises(ValueError, any_of, [])
+
+    def test_chaining(self):
+        first = Future()
+        chained = all_of([first]).then(lambda results: any_of([Future(), all_of(results)]))
+        first.set_result(Future())
+        self.assertFalse(chained.done())
+        first.result().set_result(1)
+        self.assertEqual([1], chained.result())
+
+
+class ThrottledExecutorTest(unittest.TestCase):
+
+    def make_session(self, complete=None):
+        session = Mock()
+        session.timers = []
+
+        def execute_async(statement, params, timeout=None):
+            if complete is None:
+                return ImmediateResponseFuture(params[0])
+            return ThreadedResponseFuture(params[0], complete)
+        session.execute_async.side_effect = execute_async
+        session.cluster.connection_class.create_timer.side_effect = \
+            lambda delay, callback: session.timers.append((delay, callback))
+        return session
+
+    def test_rate_limiter(self):
+        limiter = _RateLimiter(100)
+        delays = [limiter.reserve() for _ in range(30)]
+        # a burst of 0.1s worth of operations is let through
+        self.assertEqual([0.0] * 10, delays[:10])
+        self.assertAlmostEqual(0.2, delays[-1], places=1)
+        self.assertTrue(all(a <= b for a, b in zip(delays, delays[1:])))
+
+    def test_max_rate(self):
+        session = self.make_session()
+        statements = [("INSERT", (i,)) for i in range(30)]
+        results = execute_concurrent(session, statements, max_rate=100, results_generator=True)
+
+        # statements over the burst are sent from timers
+        self.assertEqual(30, len(session.timers) + session.execute_async.call_count)
+        self.assertTrue(len(session.timers) > 10)
+        for _, callback in session.timers:
+            callback()
+        self.assertEqual([(True, i) for i in range(30)], list(results))
+
+        self.assertRaises(ValueError, execute_concurrent, session, statements, max_rate=0)
+
+    def test_max_bytes_rate(self):
+        session = self.make_session()
+        statements = [("INSERT", (i, b'x' * 100)) for i in range(5)]
+        results = execute_concurrent(session, statements, max_bytes_rate=1000, results_generator=True)
+        self.assertEqual(4, len(session.timers))
+        self.assertTrue(all(delay > 0 for delay, _ in session.timers))
+        for _, callback in session.timers:
+            callback()
+        self.assertEqual([(True, i) for i in range(5)], list(results))
+
+    def test_deadline(self):
+        session = self.make_session()
+        statements = [("INSERT", (i,)) for i in range(5)]
+
+        results = execute_concurrent(session, statements, deadline=0, raise_on_first_error=False)
+        self.assertEqual(5, len(results))
+        self.assertTrue(all(not success and isinstance(exc, DeadlineExceeded) for success, exc in results))
+        self.assertEqual(0, session.execute_async.call_count)
+
+        self.assertRaises(DeadlineExceeded, execute_concurrent, session, statements, deadline=0)
+
+        # the remaining time is used as the request timeout
+        results = execute_concurrent(session, statements, deadline=60)
+        self.assertEqual([(True, i) for i in range(5)], results)
+        timeout = session.execute_async.call_args[1]['timeout']
+        self.assertTrue(0 < timeout <= 60)
+
+    def test_adaptive_concurrency(self):
+        pending = []
+        session = self.make_session(lambda fn, result, args: pending.append((fn, result, args)))
+        overloaded = NoHostAvailable("overloaded", {'host': OverloadedErrorMessage(0x1001, "overloaded", None)})
+        statements = [("INSERT", (overloaded,))] + [("INSERT", (i,)) for i in range(1, 10)]
+
+        results = execute_concurrent(session, statements, concurrency=4, raise_on_first_error=False,
+                                     results_generator=True, adaptive_concurrency=True)
+        self.assertEqual(4, len(pending))
+
+        # the failure halves concurrency, which then grows back slowly
+        fn, result, args = pending.pop(0)
+        fn(result, *args)
+        self.assertEqual(4, session.execute_async.call_count)
+        for _ in range(2):
+            fn, result, args = pending.pop(0)
+            fn(result, *args)
+            self.assertEqual(3, len(pending))
+        self.assertEqual(6, session.execute_async.call_count)
+
+        while pending:
+            fn, result, args = pending.pop(0)
+            fn(result, *args)
+        self.assertEqual([(False, overloaded)] + [(True, i) for i in range(1, 10)], list(results))
+
+
+class FakeWorkerCluster(object):
+    """
+    Stands for the Cluster of a worker process.  Queries return the process
+    id and their first parameter; prepared queries also their query string.
+    """
 
+    connection_class = Mock()
+
+    def connect(self, keyspace=None):
+        session = Mock(keyspace=keyspace)
+
+        def execute_async(statement, params, timeout=None):
+            if isinstance(params[0], Exception):
+                return ImmediateResponseFuture(params[0])
+            if isinstance(statement, PreparedStatement):
+                return ImmediateResponseFuture(session.row_factory(
+                    ['pid', 'k', 'query'], [(os.getpid(), params[0], statement.query_string)]))
+            return ImmediateResponseFuture(session.row_factory(['pid', 'k'], [(os.getpid(), params[0])]))
+        session.execute_async.side_effect = execute_async
+        session.prepare.side_effect = lambda query: PreparedStatement(None, b'id', [], query, keyspace, 4)
+        return session
+
+
+class UnreachableCluster(FakeWorkerCluster):
+
+    def connect(self, keyspace=None):
+        raise NoHostAvailable("Unable to connect to any servers", {})
+
+
+class MultiprocessTest(unittest.TestCase):
+
+    def test_ordered(self):
+        statements = [("SELECT", (i,)) for i in range(100)]
+        results = execute_concurrent_multiprocess(FakeWorkerCluster, statements, processes=2, chunk_size=10)
+
+        self.assertEqual(list(range(100)), [rows[0][1] for _, rows in results])
+        self.assertTrue(all(success for success, _ in results))
+        self.assertNotIn(os.getpid(), set(rows[0][0] for _, rows in results))
+
+    def test_unordered(self):
+        statements = [("SELECT", (i,)) for i in range(100)]
+        results = execute_concurrent_multiprocess(FakeWorkerCluster, iter(statements), processes=3, chunk_size=7,
+                                                  ordered=False, results_generator=True)
+        results = list(results)
+        self.assertEqual(list(range(100)), sorted(idx for idx, _, _ in results))
+        self.assertTrue(all(idx == rows[0][1] for idx, _, rows in results))
+
+    def test_prepared_statements(self):
+        prepared = PreparedStatement(None, b'id', [], "INSERT INTO t (k) VALUES (?)", 'ks', 4)
+        statements = [(prepared, (i,)) for i in range(10)]
+        results = execute_concurrent_multiprocess(FakeWorkerCluster, statements, processes=2, chunk_size=3)
+        self.assertEqual([(i, prepared.query_string) for i in range(10)], [rows[0][1:] for _, rows in results])
+
+        self.assertRaises(ValueError, execute_concurrent_multiprocess, FakeWorkerCluster,
+                          [(BoundStatement(prepared), None)], processes=1)
+
+    def test_errors(self):
+        statements = [("SELECT", (i,)) for i in range(5)] + [("SELECT", (ValueError("failed"),))]
+        self.assertRaises(ValueError, execute_concurrent_multiprocess, FakeWorkerCluster, statements,
+                          processes=2, chunk_size=2)
+
+        results = execute_concurrent_multiprocess(FakeWorkerCluster, statements, processes=2, chunk_size=2,
+                                                  raise_on_first_error=False)
+        success, exc = results[-1]
+        self.assertFalse(success)
+        self.assertIsInstance(exc, ValueError)
+
+    def test_unpicklable_rows(self):
+        statements = [("SELECT", (i,)) for i in range(10)]
+        for ordered in (True, False):
+            results = execute_concurrent_multiprocess(FakeWorkerCluster, statements, processes=2, chunk_size=3,
+                                                      ordered=ordered, row_factory=named_tuple_factory)
+            self.assertEqual(10, len(results))
+            self.assertTrue(all(result[-2] for result in results))
+            self.assertTrue(all(result[-1][0][1] in range(10) for result in results))
+
+        # results which could not be sent back fail their statements
+        async_result = Mock()
+        async_result.ready.return_value = True
+        async_result.successful.return_value = False
+        async_result.get.side_effect = MaybeEncodingError("unpicklable", "value")
+        pending = OrderedDict([(0, ([3, 4], async_result))])
+        results = _next_chunk_results(pending, Queue())
+        self.assertEqual([3, 4], [idx for idx, _, _ in results])
+        self.assertTrue(all(not success and isinstance(exc, MaybeEncodingError) for _, success, exc in results))
+        self.assertFalse(pending)
+
+    def test_worker_setup_error(self):
+        statements = [("SELECT", (i,)) for i in range(5)]
+        results = execute_concurrent_multiprocess(UnreachableCluster, statements, processes=2, chunk_size=2,
+                                                  raise_on_first_error=False)
+        self.assertEqual(5, len(results))
+        self.assertTrue(all(not success and isinstance(exc, NoHostAvailable) for success, exc in results))
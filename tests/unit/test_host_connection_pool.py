@@ -21,8 +21,8 @@ from mock import Mock, NonCallableMagicMock
 from threading import Thread, Event, Lock
 
 from cassandra.cluster import Session
-from cassandra.connection import Connection
-from cassandra.pool import Host, HostConnectionPool, NoConnectionsAvailable
+from cassandra.connection import Connection, ConnectionException
+from cassandra.pool import Host, HostConnection, HostConnectionPool, NoConnectionsAvailable
 from cassandra.policies import HostDistance, SimpleConvictionPolicy
 
 
@@ -240,3 +240,161 @@ class HostConnectionPoolTests(unittest.TestCase):
         self.assertEqual(a, b, 'Two Host instances should be equal when sharing.')
         self.assertNotEqual(a, c, 'Two Host instances should NOT be equal when using two different addresses.')
         self.assertNotEqual(b, c, 'Two Host instances should NOT be equal when using two different addresses.')
+
+
+class HostConnectionTests(unittest.TestCase):
+
+    def make_session(self, connections_per_host=2):
+        session = NonCallableMagicMock(spec=Session, keyspace='foobarkeyspace')
+        session.cluster.get_connections_per_host.return_value = connections_per_host
+        return session
+
+    def make_connection(self):
+        return NonCallableMagicMock(spec=Connection, in_flight=0, is_defunct=False, is_closed=False,
+                                    max_request_id=100, lock=Lock(), signaled_error=False)
+
+    def test_borrow_least_busy(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session()
+        conns = [self.make_connection(), self.make_connection()]
+        session.cluster.connection_factory.side_effect = conns
+
+        pool = HostConnection(host, HostDistance.LOCAL, session)
+        self.assertEqual(2, session.cluster.connection_factory.call_count)
+        for conn in conns:
+            conn.set_keyspace_blocking.assert_called_once_with('foobarkeyspace')
+
+        c1, _ = pool.borrow_connection(timeout=0.01)
+        c2, _ = pool.borrow_connection(timeout=0.01)
+        self.assertEqual(set(conns), set([c1, c2]))
+
+        pool.return_connection(c1)
+        c3, _ = pool.borrow_connection(timeout=0.01)
+        self.assertIs(c1, c3)
+
+        state = pool.get_state()
+        self.assertEqual(2, state['open_count'])
+        self.assertEqual([1, 1], state['in_flights'])
+        self.assertFalse(state['shutdown'])
+
+    def test_all_request_ids_in_use(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session()
+        conns = [self.make_connection(), self.make_connection()]
+        session.cluster.connection_factory.side_effect = conns
+
+        pool = HostConnection(host, HostDistance.LOCAL, session)
+        for conn in conns:
+            conn.in_flight = conn.max_request_id
+
+        self.assertRaises(NoConnectionsAvailable, pool.borrow_connection, 0)
+
+    def test_return_defunct_connection(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session()
+        conns = [self.make_connection(), self.make_connection()]
+        session.cluster.connection_factory.side_effect = conns
+
+        pool = HostConnection(host, HostDistance.LOCAL, session)
+        conn, _ = pool.borrow_connection(timeout=0.01)
+        conn.is_defunct = True
+        session.cluster.signal_connection_failure.return_value = False
+        pool.return_connection(conn)
+
+        # the defunct connection is dropped and a replacement scheduled
+        self.assertEqual(1, session.submit.call_count)
+        self.assertNotIn(conn, pool.get_connections())
+        self.assertEqual(1, pool.open_count)
+        self.assertFalse(pool.is_shutdown)
+
+        # the remaining connection keeps serving requests
+        other, _ = pool.borrow_connection(timeout=0.01)
+        self.assertIsNot(conn, other)
+
+    def test_failed_init_closes_connections(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session(connections_per_host=3)
+        opened = self.make_connection()
+        session.cluster.connection_factory.side_effect = [opened, ConnectionException("failed")]
+
+        self.assertRaises(ConnectionException, HostConnection, host, HostDistance.LOCAL, session)
+        opened.close.assert_called_once_with()
+
+    def test_failed_replacement_rescheduled(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session(connections_per_host=1)
+        conn = self.make_connection()
+        session.cluster.connection_factory.side_effect = [conn, ConnectionException("failed")]
+        session.cluster.reconnection_policy.new_schedule.return_value = [1.0]
+
+        pool = HostConnection(host, HostDistance.LOCAL, session)
+        conn.is_defunct = True
+        session.cluster.signal_connection_failure.return_value = False
+        pool.return_connection(conn)
+        self.assertEqual(0, len(pool.get_connections()))
+
+        # the replacement fails and is tried again later
+        pool._replace(conn)
+        create_timer = session.cluster.connection_class.create_timer
+        delay, retry = create_timer.call_args[0]
+        self.assertEqual(1.0, delay)
+        self.assertEqual(1, pool._scheduled_for_creation)
+
+        replacement = self.make_connection()
+        session.cluster.connection_factory.side_effect = [replacement]
+        replace = retry.args[0]
+        replace(*retry.args[1:])
+        self.assertEqual([replacement], pool.get_connections())
+        self.assertEqual(0, pool._scheduled_for_creation)
+
+    def test_ensure_core_connections(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session(connections_per_host=1)
+        session.cluster.connection_factory.return_value = self.make_connection()
+
+        pool = HostConnection(host, HostDistance.LOCAL, session)
+        self.assertEqual(1, len(pool.get_connections()))
+
+        session.cluster.get_connections_per_host.return_value = 3
+        pool.ensure_core_connections()
+        self.assertEqual(2, session.submit.call_count)
+
+    def test_ensure_core_connections_skips_excluded_distances(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session()
+
+        pool = HostConnection(host, HostDistance.IGNORED, session)
+        pool.ensure_core_connections()
+        self.assertFalse(session.cluster.get_connections_per_host.called)
+        self.assertFalse(session.submit.called)
+
+        session.cluster.connect_to_remote_hosts = False
+        pool = HostConnection(host, HostDistance.REMOTE, session)
+        pool.ensure_core_connections()
+        self.assertFalse(session.submit.called)
+        self.assertEqual([], pool.get_connections())
+
+    def test_ensure_core_connections_shrinks_pool(self):
+        host = Mock(spec=Host, address='ip1')
+        session = self.make_session(connections_per_host=3)
+        conns = [self.make_connection() for _ in range(3)]
+        session.cluster.connection_factory.side_effect = conns
+
+        pool = HostConnection(host, HostDistance.LOCAL, session)
+        busy, _ = pool.borrow_connection(timeout=0.01)
+        busy.in_flight = 5
+        idle = [c for c in conns if c is not busy]
+        idle[0].in_flight = 1
+
+        session.cluster.get_connections_per_host.return_value = 1
+        pool.ensure_core_connections()
+        self.assertEqual([busy], pool.get_connections())
+        self.assertFalse(session.submit.called)
+
+        # the idle connection is closed right away, the other once its request completes
+        idle[1].close.assert_called_once_with()
+        self.assertFalse(idle[0].close.called)
+        pool.return_connection(idle[0])
+        idle[0].close.assert_called_once_with()
+        self.assertFalse(busy.close.called)
+        self.assertEqual(1, pool.open_count)
@@ -20,7 +20,8 @@ except ImportError:
 from cassandra.encoder import Encoder
 from cassandra.protocol import ColumnMetadata
 from cassandra.query import (bind_params, ValueSequence, PreparedStatement,
-                             BoundStatement, UNSET_VALUE)
+                             BoundStatement, UNSET_VALUE, SimpleStatement,
+                             BatchStatement, BatchType)
 from cassandra.cqltypes import Int32Type
 from cassandra.util import OrderedDict
 
@@ -178,6 +179,19 @@ class BoundStatementTestV1(unittest.TestCase):
         self.assertRaises(ValueError, self.bound.bind, {'rk0': 0, 'rk1': 0, 'ck0': 0, 'v0': UNSET_VALUE})
         self.assertRaises(ValueError, self.bound.bind, (0, 0, 0, UNSET_VALUE))
 
+    def test_bind_many(self):
+        rows = [(0, 1, 2, 3), (4, 5, 6, None), {'rk0': 7, 'rk1': 8, 'ck0': 9, 'v0': 10}]
+        bound = self.prepared.bind_many(rows)
+        expected = [self.prepared.bind(row) for row in rows]
+
+        self.assertEqual([b.values for b in expected], [b.values for b in bound])
+        self.assertEqual([b.routing_key for b in expected], [b.routing_key for b in bound])
+        self.assertEqual(rows[0], bound[0].raw_values)
+        self.assertIsNot(bound[0].values, bound[1].values)
+
+        self.assertRaises(TypeError, self.prepared.bind_many, [(0, 0, 0, 'string not int')])
+        self.assertRaises(ValueError, self.prepared.bind_many, [(0, 0, 0, 0, 123)])
+
 
 class BoundStatementTestV2(BoundStatementTestV1):
     protocol_version=2
@@ -213,3 +227,54 @@ class BoundStatementTestV4(BoundStatementTestV1):
         old_values = self.bound.values
         self.bound.bind((0, 0, 0, UNSET_VALUE))
         self.assertEqual(self.bound.values[-1], UNSET_VALUE)
+
+
+class IdempotenceTest(unittest.TestCase):
+
+    def test_inferred(self):
+        idempotent = [
+            "SELECT * FROM t WHERE k = 1",
+            "INSERT INTO t (k, v) VALUES (?, ?)",
+            "UPDATE t USING TTL 10 SET v = 'now()', s = s + {1} WHERE k = %s",
+            "DELETE FROM t WHERE k = 1",
+            "BEGIN BATCH INSERT INTO t (k, v) VALUES (1, 'if') APPLY BATCH"]
+        not_idempotent = [
+            "INSERT INTO t (k, v) VALUES (1, 1) IF NOT EXISTS",
+            "UPDATE t SET v = 2 WHERE k = 1 IF v = 1",
+            "UPDATE t SET c = c + 1 WHERE k = 1",
+            "UPDATE t SET l = l + [1] WHERE k = 1",
+            "UPDATE t SET l = ? + l WHERE k = ?",
+            "DELETE l[0] FROM t WHERE k = 1",
+            "INSERT INTO t (k, v) VALUES (1, now())",
+            "INSERT INTO t (k, v) VALUES (uuid(), 1)",
+            "TRUNCATE t",
+            "CREATE TABLE t (k int PRIMARY KEY)"]
+        for query in idempotent:
+            self.assertTrue(SimpleStatement(query).is_idempotent, query)
+        for query in not_idempotent:
+            self.assertFalse(SimpleStatement(query).is_idempotent, query)
+
+    def test_explicit(self):
+        statement = SimpleStatement("UPDATE t SET c = c + 1 WHERE k = 1", is_idempotent=True)
+        self.assertTrue(statement.is_idempotent)
+        del statement.is_idempotent
+        self.assertFalse(statement.is_idempotent)
+
+        prepared = PreparedStatement(column_metadata=[], query_id=None, routing_key_indexes=[],
+                                     query="SELECT * FROM t", keyspace='ks', protocol_version=4)
+        bound = prepared.bind(())
+        self.assertTrue(bound.is_idempotent)
+        prepared.is_idempotent = False
+        self.assertFalse(bound.is_idempotent)
+        bound.is_idempotent = True
+        self.assertTrue(bound.is_idempotent)
+
+    def test_batch(self):
+        batch = BatchStatement()
+        batch.add("INSERT INTO t (k, v) VALUES (%s, %s)", (1, 'IF'))
+        batch.add(SimpleStatement("DELETE FROM t WHERE k = 2"))
+        self.assertTrue(batch.is_idempotent)
+        batch.add(SimpleStatement("UPDATE t SET l = l + [1] WHERE k = 1"))
+        self.assertFalse(batch.is_idempotent)
+
+        self.assertFalse(BatchStatement(BatchType.COUNTER).is_idempotent)
@@ -27,13 +27,14 @@ from threading import Thread
 
 from cassandra import ConsistencyLevel
 from cassandra.cluster import Cluster
-from cassandra.metadata import Metadata
+from cassandra.metadata import Metadata, Murmur3Token
 from cassandra.policies import (RoundRobinPolicy, DCAwareRoundRobinPolicy,
                                 TokenAwarePolicy, SimpleConvictionPolicy,
                                 HostDistance, ExponentialReconnectionPolicy,
                                 RetryPolicy, WriteType,
                                 DowngradingConsistencyRetryPolicy, ConstantReconnectionPolicy,
-                                LoadBalancingPolicy, ConvictionPolicy, ReconnectionPolicy, FallthroughRetryPolicy)
+                                LoadBalancingPolicy, ConvictionPolicy, ReconnectionPolicy, FallthroughRetryPolicy,
+                                ConcurrencyLimiter, AIMDConcurrencyLimiter)
 from cassandra.pool import Host
 from cassandra.query import Statement
 
@@ -730,6 +731,94 @@ class TokenAwarePolicyTest(unittest.TestCase):
         self.assertEqual(replicas + hosts[:2], qplan)
         cluster.metadata.get_replicas.assert_called_with(statement_keyspace, routing_key)
 
+    def _make_replica_cluster(self, replicas):
+        cluster = Mock(spec=Cluster)
+        cluster.metadata = Mock(spec=Metadata)
+        cluster.metadata.get_replicas.return_value = replicas
+        cluster.sessions = []
+        return cluster
+
+    def test_shuffle_replicas(self):
+        hosts = [Host(str(i), SimpleConvictionPolicy) for i in range(4)]
+        for host in hosts:
+            host.set_up()
+        replicas = hosts[:3]
+        cluster = self._make_replica_cluster(replicas)
+
+        policy = TokenAwarePolicy(RoundRobinPolicy(), shuffle_replicas=True)
+        policy.populate(cluster, hosts)
+
+        query = Statement(routing_key='routing_key', keyspace='keyspace_name')
+        seen_first = set()
+        for i in range(100):
+            qplan = list(policy.make_query_plan(None, query))
+            self.assertEqual(set(replicas), set(qplan[:3]))
+            self.assertEqual([hosts[3]], qplan[3:])
+            seen_first.add(qplan[0])
+
+        # all replicas should have been tried first at some point
+        self.assertEqual(set(replicas), seen_first)
+
+    def test_power_of_two_choices(self):
+        hosts = [Host(str(i), SimpleConvictionPolicy) for i in range(3)]
+        for host in hosts:
+            host.set_up()
+        replicas = hosts[:2]
+        cluster = self._make_replica_cluster(replicas)
+
+        busy_conn = Mock(in_flight=50)
+        idle_conn = Mock(in_flight=1)
+        session = Mock()
+        pools = {hosts[0]: Mock(), hosts[1]: Mock()}
+        pools[hosts[0]].get_connections.return_value = [busy_conn]
+        pools[hosts[1]].get_connections.return_value = [idle_conn]
+        session._pools = pools
+        cluster.sessions = [session]
+
+        policy = TokenAwarePolicy(RoundRobinPolicy(), power_of_two_choices=True)
+        policy.populate(cluster, hosts)
+
+        query = Statement(routing_key='routing_key', keyspace='keyspace_name')
+        for i in range(20):
+            qplan = list(policy.make_query_plan(None, query))
+            self.assertEqual([hosts[1], hosts[0], hosts[2]], qplan)
+
+        # once the load flips, so does the preferred replica
+        busy_conn.in_flight = 0
+        qplan = list(policy.make_query_plan(None, query))
+        self.assertEqual([hosts[0], hosts[1], hosts[2]], qplan)
+
+        # sessions created while the plan is built do not break it
+        cluster.sessions = set([session])
+        pools[hosts[0]].get_connections.side_effect = lambda: cluster.sessions.add(Mock(_pools={})) or [busy_conn]
+        qplan = list(policy.make_query_plan(None, query))
+        self.assertEqual([hosts[0], hosts[1], hosts[2]], qplan)
+
+    def test_routing_token(self):
+        hosts = [Host(str(i), SimpleConvictionPolicy) for i in range(4)]
+        for host in hosts:
+            host.set_up()
+        replicas = hosts[2:]
+        cluster = self._make_replica_cluster([])
+        cluster.metadata.token_map = Mock()
+        cluster.metadata.token_map.get_replicas.return_value = replicas
+
+        policy = TokenAwarePolicy(RoundRobinPolicy())
+        policy.populate(cluster, hosts)
+
+        query = Statement(keyspace='keyspace_name')
+        query.routing_token = Murmur3Token(10)
+        qplan = list(policy.make_query_plan(None, query))
+        self.assertEqual(replicas, qplan[:2])
+        self.assertEqual(set(hosts[:2]), set(qplan[2:]))
+        cluster.metadata.token_map.get_replicas.assert_called_once_with('keyspace_name', query.routing_token)
+        self.assertFalse(cluster.metadata.get_replicas.called)
+
+        # no token map yet
+        cluster.metadata.token_map = None
+        qplan = list(policy.make_query_plan(None, query))
+        self.assertEqual(set(hosts), set(qplan))
+
 
 class ConvictionPolicyTest(unittest.TestCase):
     def test_not_implemented(self):
@@ -753,6 +842,80 @@ class SimpleConvictionPolicyTest(unittest.TestCase):
         self.assertEqual(conviction_policy.reset(), None)
 
 
+class ConcurrencyLimiterTest(unittest.TestCase):
+    def test_not_implemented(self):
+        """
+        Code coverage for interface-style base class
+        """
+
+        limiter = ConcurrencyLimiter(1)
+        self.assertRaises(NotImplementedError, limiter.try_acquire)
+        self.assertRaises(NotImplementedError, limiter.release)
+
+
+class AIMDConcurrencyLimiterTest(unittest.TestCase):
+
+    def test_bad_vals(self):
+        self.assertRaises(ValueError, AIMDConcurrencyLimiter, 1, initial_limit=0, min_limit=0)
+        self.assertRaises(ValueError, AIMDConcurrencyLimiter, 1, initial_limit=4, min_limit=8)
+        self.assertRaises(ValueError, AIMDConcurrencyLimiter, 1, initial_limit=16, max_limit=8)
+        self.assertRaises(ValueError, AIMDConcurrencyLimiter, 1, backoff_ratio=1)
+
+    def test_acquire_up_to_limit(self):
+        limiter = AIMDConcurrencyLimiter(1, initial_limit=2, min_limit=1)
+        self.assertTrue(limiter.try_acquire())
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        self.assertEqual(limiter.in_flight, 2)
+
+        # a request that was never sent frees its slot without adapting
+        limiter.release()
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.limit, 2)
+        self.assertTrue(limiter.try_acquire())
+
+    def test_additive_increase(self):
+        limiter = AIMDConcurrencyLimiter(1, initial_limit=8, min_limit=1, max_limit=9)
+        for _ in range(8):
+            limiter.try_acquire()
+        for _ in range(8):
+            limiter.release(0.001)
+        self.assertEqual(int(limiter.limit), 8)
+        self.assertTrue(8 < limiter.limit <= 9)
+
+        # not grown while most of the limit is unused
+        limit = limiter.limit
+        limiter.try_acquire()
+        limiter.release(0.001)
+        self.assertEqual(limiter.limit, limit)
+
+        # bounded by max_limit
+        for _ in range(100):
+            for _ in range(9):
+                limiter.try_acquire()
+            for _ in range(9):
+                limiter.release(0.001)
+        self.assertEqual(limiter.limit, 9)
+
+    def test_multiplicative_decrease(self):
+        limiter = AIMDConcurrencyLimiter(1, initial_limit=100, min_limit=10, backoff_ratio=0.5)
+        limiter.try_acquire()
+        limiter.release(0.001, dropped=True)
+        self.assertEqual(limiter.limit, 50)
+
+        limiter = AIMDConcurrencyLimiter(1, initial_limit=100, min_limit=10, backoff_ratio=0.5,
+                                         latency_threshold=0.1)
+        limiter.try_acquire()
+        limiter.release(0.5)
+        self.assertEqual(limiter.limit, 50)
+
+        # bounded by min_limit
+        for _ in range(10):
+            limiter.try_acquire()
+            limiter.release(0.001, dropped=True)
+        self.assertEqual(limiter.limit, 10)
+
+
 class ReconnectionPolicyTest(unittest.TestCase):
     def test_basic_responses(self):
         """
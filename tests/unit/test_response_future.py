@@ -17,10 +17,13 @@ try:
 except ImportError:
     import unittest # noqa
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from mock import Mock, MagicMock, ANY
+import threading
+import time
 
-from cassandra import ConsistencyLevel, Unavailable
-from cassandra.cluster import Session, ResponseFuture, NoHostAvailable
+from cassandra import ConsistencyLevel, Unavailable, OperationTimedOut
+from cassandra.cluster import Session, ResponseFuture, NoHostAvailable, PagedResult
 from cassandra.connection import Connection, ConnectionException
 from cassandra.protocol import (ReadTimeoutErrorMessage, WriteTimeoutErrorMessage,
                                 UnavailableErrorMessage, ResultMessage, QueryMessage,
@@ -36,7 +39,8 @@ from cassandra.query import SimpleStatement
 class ResponseFutureTests(unittest.TestCase):
 
     def make_basic_session(self):
-        return Mock(spec=Session, row_factory=lambda *x: list(x))
+        return Mock(spec=Session, row_factory=lambda *x: list(x),
+                    request_queue_timeout=Session.request_queue_timeout)
 
     def make_session(self):
         session = self.make_basic_session()
@@ -44,6 +48,11 @@ class ResponseFutureTests(unittest.TestCase):
         session._pools.get.return_value.is_shutdown = False
         return session
 
+    def make_connected_session(self):
+        session = self.make_session()
+        session._pools.get.return_value.borrow_connection.return_value = (Mock(spec=Connection), 1)
+        return session
+
     def make_response_future(self, session):
         query = SimpleStatement("SELECT * FROM foo")
         message = QueryMessage(query=query, consistency_level=ConsistencyLevel.ONE)
@@ -322,6 +331,133 @@ class ResponseFutureTests(unittest.TestCase):
         # make sure the exception is recorded correctly
         self.assertEqual(rf._errors, {'ip1': exc})
 
+    def test_queue_when_all_hosts_busy(self):
+        session = self.make_basic_session()
+        session._load_balancer.make_query_plan.return_value = ['ip1', 'ip2']
+        session._enqueue_request.return_value = True
+
+        busy_pool = Mock(is_shutdown=False)
+        busy_pool.borrow_connection.side_effect = NoConnectionsAvailable()
+        session._pools.get.return_value = busy_pool
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        # the request is parked instead of failing
+        session._enqueue_request.assert_called_once_with(rf, False)
+        self.assertIsNotNone(rf._queue_timer)
+        self.assertIsNone(rf._final_exception)
+
+        # a slot frees up and the request is sent with a new query plan
+        connection = Mock(spec=Connection)
+        busy_pool.borrow_connection.side_effect = None
+        busy_pool.borrow_connection.return_value = (connection, 1)
+        queue_timer = rf._queue_timer
+        rf._send_queued_request()
+        connection.send_msg.assert_called_once_with(rf.message, 1, cb=ANY, encoder=ANY, decoder=ANY)
+        queue_timer.cancel.assert_called_once_with()
+        self.assertIsNone(rf._queue_timer)
+
+        rf._set_result(self.make_mock_response([{'col': 'val'}]))
+        self.assertEqual(rf.result(), [{'col': 'val'}])
+
+    def test_queue_timeout(self):
+        session = self.make_basic_session()
+        session._load_balancer.make_query_plan.return_value = ['ip1']
+        session._enqueue_request.return_value = True
+        session._dequeue_request.return_value = True
+        session._pools.get.return_value.is_shutdown = False
+        session._pools.get.return_value.borrow_connection.side_effect = NoConnectionsAvailable()
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+        rf._on_queue_timeout()
+        session._dequeue_request.assert_called_once_with(rf)
+        self.assertRaises(OperationTimedOut, rf.result)
+
+    def test_queue_timeout_while_resending(self):
+        session = self.make_basic_session()
+        session._load_balancer.make_query_plan.return_value = ['ip1']
+        session._enqueue_request.return_value = True
+        session._pools.get.return_value.is_shutdown = False
+        session._pools.get.return_value.borrow_connection.side_effect = NoConnectionsAvailable()
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        # the queue timer fires while the request is out of the queue
+        session._dequeue_request.return_value = False
+        rf._on_queue_timeout()
+        self.assertIsNone(rf._final_exception)
+
+        # hosts are still busy, and the request is timed out when parked again
+        rf._queue_deadline = time.time() - 1
+        session._dequeue_request.return_value = True
+        rf._send_queued_request()
+        session._enqueue_request.assert_called_with(rf, True)
+        self.assertRaises(OperationTimedOut, rf.result)
+
+    def test_no_queue_unless_all_hosts_busy(self):
+        session = self.make_basic_session()
+        session._load_balancer.make_query_plan.return_value = ['ip1', 'ip2']
+        session._enqueue_request.return_value = True
+        busy_pool = Mock(is_shutdown=False)
+        busy_pool.borrow_connection.side_effect = NoConnectionsAvailable()
+        session._pools.get.side_effect = lambda host: busy_pool if host == 'ip1' else None
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+        self.assertFalse(session._enqueue_request.called)
+        self.assertRaises(NoHostAvailable, rf.result)
+
+    def test_queue_full(self):
+        session = self.make_basic_session()
+        session._load_balancer.make_query_plan.return_value = ['ip1']
+        session._enqueue_request.return_value = False
+        session._pools.get.return_value.is_shutdown = False
+        session._pools.get.return_value.borrow_connection.side_effect = NoConnectionsAvailable()
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+        self.assertRaises(NoHostAvailable, rf.result)
+
+    def test_concurrency_limit_reached(self):
+        session = self.make_basic_session()
+        session._load_balancer.make_query_plan.return_value = ['ip1', 'ip2']
+
+        # the first host is at its concurrency limit
+        first_pool = Mock(is_shutdown=False)
+        first_pool.limiter.try_acquire.return_value = False
+
+        second_pool = Mock(is_shutdown=False)
+        second_pool.limiter.try_acquire.return_value = True
+        connection = Mock(spec=Connection)
+        second_pool.borrow_connection.return_value = (connection, 1)
+
+        session._pools.get.side_effect = [first_pool, second_pool]
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+        first_pool.borrow_connection.assert_not_called()
+        self.assertIsInstance(rf._errors['ip1'], NoConnectionsAvailable)
+
+        rf._set_result(self.make_mock_response([{'col': 'val'}]))
+        self.assertEqual(rf.result(), [{'col': 'val'}])
+        second_pool.limiter.release.assert_called_once_with(ANY, False)
+
+    def test_concurrency_limiter_overloaded(self):
+        session = self.make_session()
+        pool = session._pools.get.return_value
+        pool.limiter.try_acquire.return_value = True
+        connection = Mock(spec=Connection)
+        pool.borrow_connection.return_value = (connection, 1)
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        rf._set_result(Mock(spec=OverloadedErrorMessage, info={}))
+        pool.limiter.release.assert_any_call(ANY, True)
+
     def test_callback(self):
         session = self.make_session()
         rf = self.make_response_future(session)
@@ -501,3 +637,278 @@ class ResponseFutureTests(unittest.TestCase):
         result = Mock(spec=PreparedQueryNotFound, info='a' * 16)
         rf._set_result(result)
         self.assertRaises(ValueError, rf.result)
+
+    def test_paging_state(self):
+        session = self.make_session()
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        response = self.make_mock_response([{'col': 'val'}])
+        response.paging_state = b'next page'
+        rf._set_result(response)
+        self.assertEqual(b'next page', rf.paging_state)
+        self.assertTrue(rf.has_more_pages)
+
+    def test_adaptive_fetch_size(self):
+        session = self.make_session()
+        rf = self.make_response_future(session)
+        rf.message.fetch_size = 5000
+        rf._page_byte_budget = 1000
+        rf._fetch_size_bounds = (10, 150)
+        rf.send_request()
+
+        def page(row_count, body_size, paging_state=b'next'):
+            response = self.make_mock_response((['col'], [('val',)] * row_count))
+            response.paging_state = paging_state
+            response.body_size = body_size
+            return response
+
+        # 10 bytes per row
+        rf._set_result(page(50, 500))
+        self.assertEqual(100, rf.message.fetch_size)
+
+        # kept within bounds
+        rf._set_result(page(10, 10))
+        self.assertEqual(150, rf.message.fetch_size)
+        rf._set_result(page(10, 100000))
+        self.assertEqual(10, rf.message.fetch_size)
+
+        # nothing to learn from an empty or last page
+        rf._set_result(page(0, 10))
+        rf._set_result(page(10, 10, paging_state=None))
+        self.assertEqual(10, rf.message.fetch_size)
+
+    def test_then(self):
+        session = self.make_connected_session()
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        chained = rf.then(lambda rows: rows + [{'col': 'added'}]).then(len)
+        self.assertFalse(chained.done())
+
+        response = self.make_mock_response([{'col': 'val'}])
+        response.paging_state = b'next page'
+        rf._set_result(response)
+        self.assertEqual(2, chained.result())
+
+        # callbacks are kept for the next pages, which do not run the chain again
+        response.paging_state = None
+        rf._set_result(response)
+        self.assertEqual(2, chained.result())
+
+        # steps added after completion run immediately
+        self.assertEqual([{'col': 'val'}], rf.then(lambda rows: rows).result(timeout=0))
+
+    def test_then_returns_future(self):
+        session = self.make_connected_session()
+        first = self.make_response_future(session)
+        second = self.make_response_future(session)
+        first.send_request()
+        second.send_request()
+
+        chained = first.then(lambda rows: second)
+        first._set_result(self.make_mock_response([{'col': 'first'}]))
+        self.assertFalse(chained.done())
+        second._set_result(self.make_mock_response([{'col': 'second'}]))
+        self.assertEqual([{'col': 'second'}], chained.result())
+
+    def test_then_errors(self):
+        session = self.make_connected_session()
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        fn = Mock()
+        chained = rf.then(fn)
+        rf._set_final_exception(Unavailable("unavailable"))
+        self.assertRaises(Unavailable, chained.result)
+        self.assertFalse(fn.called)
+
+        rf = self.make_response_future(session)
+        rf.send_request()
+        rf._set_result(self.make_mock_response([]))
+        self.assertRaises(IndexError, rf.then(lambda rows: rows[0]).result)
+
+    def test_then_executor(self):
+        session = self.make_connected_session()
+        rf = self.make_response_future(session)
+        rf.send_request()
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            chained = rf.then(lambda rows: threading.current_thread(), executor=executor)
+            rf._set_result(self.make_mock_response([]))
+            self.assertIsNot(threading.current_thread(), chained.result())
+        finally:
+            executor.shutdown()
+
+    def test_timeout_retry(self):
+        session = self.make_connected_session()
+        session.submit.side_effect = lambda fn, *args, **kwargs: fn(*args, **kwargs)
+        pool = session._pools.get.return_value
+        connection = pool.borrow_connection.return_value[0]
+        rf = self.make_response_future(session)
+        rf._timeout_retries = 1
+        rf.send_request()
+        first_attempt = connection.send_msg.call_args[1]['cb']
+
+        # idempotent requests are sent to the next host
+        rf._on_timeout()
+        session._pools.get.assert_called_with('ip2')
+        self.assertEqual(2, connection.send_msg.call_count)
+        self.assertIsInstance(rf._errors['ip1'], OperationTimedOut)
+        second_attempt = connection.send_msg.call_args[1]['cb']
+
+        # the late response to the abandoned attempt is ignored
+        first_attempt(self.make_mock_response([{'col': 'late'}]))
+        self.assertFalse(rf._event.is_set())
+        pool.return_connection.assert_called_once_with(connection)
+
+        second_attempt(self.make_mock_response([{'col': 'val'}]))
+        self.assertEqual([{'col': 'val'}], rf.result())
+
+    def test_timeout_retries_exhausted(self):
+        session = self.make_connected_session()
+        session.submit.side_effect = lambda fn, *args, **kwargs: fn(*args, **kwargs)
+        rf = self.make_response_future(session)
+        rf._timeout_retries = 1
+        rf.send_request()
+
+        rf._on_timeout()
+        rf._on_timeout()
+        self.assertRaises(OperationTimedOut, rf.result)
+
+        # requests are not retried unless enabled
+        rf = self.make_response_future(session)
+        rf.send_request()
+        rf._on_timeout()
+        self.assertRaises(OperationTimedOut, rf.result)
+        self.assertEqual(1, session.submit.call_count)
+
+
+class PagedResultTests(unittest.TestCase):
+
+    def make_response_future(self):
+        response_future = Mock(spec=ResponseFuture, has_more_pages=True)
+        response_future.session.paging_prefetch_pages = 0
+        response_future.session.submit.side_effect = self.submit
+        return response_future
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+    def page_callbacks(self, response_future):
+        args, _ = response_future.add_callbacks.call_args
+        return args
+
+    def test_no_prefetch(self):
+        response_future = self.make_response_future()
+        response_future.result.return_value = [3, 4]
+
+        def last_page():
+            response_future.has_more_pages = False
+        response_future.start_fetching_next_page.side_effect = last_page
+
+        paged = PagedResult(response_future, [1, 2])
+        self.assertEqual(list(paged), [1, 2, 3, 4])
+        response_future.start_fetching_next_page.assert_called_once_with()
+        response_future.add_callbacks.assert_not_called()
+
+    def test_prefetch_at_threshold(self):
+        response_future = self.make_response_future()
+        paged = PagedResult(response_future, [1, 2, 3, 4], prefetch_pages=1, prefetch_threshold=0.5)
+
+        self.assertEqual(next(paged), 1)
+        response_future.start_fetching_next_page.assert_not_called()
+        self.assertEqual(next(paged), 2)
+        response_future.start_fetching_next_page.assert_called_once_with()
+
+        # the next page arrives while the current one is being consumed
+        on_page, _ = self.page_callbacks(response_future)
+        response_future.has_more_pages = False
+        on_page([5, 6])
+
+        self.assertEqual(list(paged), [3, 4, 5, 6])
+        self.assertEqual(response_future.start_fetching_next_page.call_count, 1)
+        response_future.result.assert_not_called()
+
+    def test_prefetch_bounded_pages(self):
+        response_future = self.make_response_future()
+        paged = PagedResult(response_future, [1, 2], prefetch_pages=2, prefetch_threshold=0)
+
+        self.assertEqual(next(paged), 1)
+        on_page, _ = self.page_callbacks(response_future)
+
+        # keeps fetching until two pages are buffered, from the executor
+        on_page([3, 4])
+        self.assertEqual(response_future.start_fetching_next_page.call_count, 2)
+        self.assertEqual(response_future.session.submit.call_count, 1)
+        on_page([5, 6])
+        self.assertEqual(response_future.start_fetching_next_page.call_count, 2)
+
+        # consuming a page makes room for another one
+        self.assertEqual([next(paged) for _ in range(2)], [2, 3])
+        self.assertEqual(response_future.start_fetching_next_page.call_count, 3)
+        response_future.has_more_pages = False
+        on_page([7])
+        self.assertEqual(list(paged), [4, 5, 6, 7])
+
+    def test_prefetch_after_shutdown(self):
+        response_future = self.make_response_future()
+        paged = PagedResult(response_future, [1], prefetch_pages=2, prefetch_threshold=0)
+
+        self.assertEqual(next(paged), 1)
+        on_page, _ = self.page_callbacks(response_future)
+
+        # the executor is gone, the page is fetched when the consumer needs it
+        response_future.session.submit.side_effect = None
+        response_future.session.submit.return_value = None
+        on_page([2])
+        self.assertEqual(response_future.start_fetching_next_page.call_count, 1)
+        self.assertEqual(next(paged), 2)
+        self.assertEqual(response_future.start_fetching_next_page.call_count, 2)
+
+    def test_prefetch_error(self):
+        response_future = self.make_response_future()
+        paged = PagedResult(response_future, [1, 2], prefetch_pages=1, prefetch_threshold=0)
+
+        self.assertEqual(next(paged), 1)
+        _, on_error = self.page_callbacks(response_future)
+        on_error(OperationTimedOut())
+
+        # rows already received are returned before the error is raised
+        self.assertEqual(next(paged), 2)
+        self.assertRaises(OperationTimedOut, next, paged)
+
+    def test_paging_state(self):
+        response_future = self.make_response_future()
+        response_future.paging_state = b'page 2'
+        response_future.result.return_value = [3]
+
+        def last_page():
+            response_future.has_more_pages = False
+            response_future.paging_state = None
+        response_future.start_fetching_next_page.side_effect = last_page
+
+        paged = PagedResult(response_future, [1, 2])
+        self.assertEqual([next(paged) for _ in range(2)], [1, 2])
+        self.assertEqual(paged.paging_state, b'page 2')
+        self.assertEqual(list(paged), [3])
+        self.assertIsNone(paged.paging_state)
+
+    def test_prefetch_paging_state(self):
+        response_future = self.make_response_future()
+        response_future.paging_state = b'page 2'
+        paged = PagedResult(response_future, [1, 2], prefetch_pages=1, prefetch_threshold=0)
+
+        self.assertEqual(next(paged), 1)
+        on_page, _ = self.page_callbacks(response_future)
+        response_future.paging_state = b'page 3'
+        on_page([3, 4])
+
+        # the state follows the page being iterated, not the prefetched one
+        self.assertEqual(next(paged), 2)
+        self.assertEqual(paged.paging_state, b'page 2')
+        self.assertEqual(next(paged), 3)
+        self.assertEqual(paged.paging_state, b'page 3')
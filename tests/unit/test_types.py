@@ -17,6 +17,7 @@ except ImportError:
     import unittest  # noqa
 
 from binascii import unhexlify
+from mock import patch
 import datetime
 import tempfile
 import six
@@ -32,7 +33,8 @@ from cassandra.encoder import cql_quote
 from cassandra.protocol import (write_string, read_longstring, write_stringmap,
                                 read_stringmap, read_inet, write_inet,
                                 read_string, write_longstring)
-from cassandra.query import named_tuple_factory
+from cassandra.query import (named_tuple_factory, dict_factory, ordered_dict_factory,
+                             class_factory)
 
 
 class TypeTests(unittest.TestCase):
@@ -140,6 +142,59 @@ class TypeTests(unittest.TestCase):
         self.assertEqual(result[3], result.foo_bar)
         self.assertEqual(result[4], result.foo_bar_)
 
+    def test_named_tuple_class_cached(self):
+        first = named_tuple_factory(['a', 'b'], [(1, 2)])[0]
+        second = named_tuple_factory(('a', 'b'), [(3, 4)])[0]
+        self.assertIs(type(first), type(second))
+        self.assertEqual(second.b, 4)
+
+        other = named_tuple_factory(['a', 'c'], [(1, 2)])[0]
+        self.assertIsNot(type(first), type(other))
+
+    def test_row_factories_lazy(self):
+        for factory in (named_tuple_factory, dict_factory, ordered_dict_factory):
+            consumed = []
+
+            def rows():
+                for row in [(1, 2), (3, 4)]:
+                    consumed.append(row)
+                    yield row
+
+            result = factory(['a', 'b'], rows())
+            self.assertEqual(consumed, [])
+            first = next(result)
+            self.assertEqual(consumed, [(1, 2)])
+            self.assertEqual(first[1] if factory is named_tuple_factory else first['b'], 2)
+            self.assertEqual(len(list(result)), 1)
+
+            # sequences are still returned as lists
+            self.assertIsInstance(factory(['a', 'b'], [(1, 2)]), list)
+            self.assertIsInstance(factory(['a', 'b'], ((1, 2), (3, 4))), list)
+
+    def test_class_factory(self):
+        class Point(object):
+            __slots__ = ('x', 'y_value')
+
+            def __init__(self):
+                raise AssertionError("rows are created without __init__")
+
+        factory = class_factory(Point)
+        self.assertIs(factory.row_class, Point)
+
+        rows = factory(['x', 'y value'], [(1, 2), (3, None)])
+        self.assertIsInstance(rows, list)
+        self.assertEqual([(p.x, p.y_value) for p in rows], [(1, 2), (3, None)])
+        self.assertEqual(next(factory(['x', 'y value'], iter([(5, 6)]))).x, 5)
+
+    def test_named_tuple_class_cache_bounded(self):
+        with patch.object(cassandra.query, '_ROW_CLASS_CACHE_SIZE', 2):
+            cassandra.query._row_class_cache.clear()
+            named_tuple_factory(['a'], [])
+            named_tuple_factory(['b'], [])
+            named_tuple_factory(['a'], [])  # now most recently used
+            named_tuple_factory(['c'], [])
+            self.assertEqual(list(cassandra.query._row_class_cache), [('a',), ('c',)])
+
     def test_parse_casstype_args(self):
         class FooType(CassandraType):
             typename = 'org.apache.cassandra.db.marshal.FooType'